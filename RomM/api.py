@@ -1,19 +1,42 @@
 import base64
+import heapq
+import http.client
+import itertools
 import json
 import math
 import os
 import re
+import resource
+import sys
+import threading
+import time
 import zipfile
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
 from urllib.error import HTTPError, URLError
 from urllib.parse import quote
-from urllib.request import Request, urlopen
+from urllib.request import Request
 
 import platform_maps
+from assets import AssetCache
+from cache import CachedItems, CacheItemsWriter, CatalogCache
+from catalog import Catalog, list_key
+from checksum import ChecksumMismatch, RomChecksum
 from filesystem import Filesystem
+from http_client import HttpClient
+from jsonstream import JsonItemStream
 from models import Collection, Platform, Rom
 from PIL import Image
-from status import Status, View
+from status import DownloadProgress, DownloadState, Status, View
+from streamcopy import StreamCopier
+from tasks import TaskScheduler
+from zipstream import UnsupportedArchive, ZipStreamReader
+
+
+class IncompleteDownload(OSError):
+    """The server closed the connection before the whole ROM was received."""
 
 # Source - https://stackoverflow.com/a
 # Posted by Jahid, modified by community. See post 'Timeline' for change history
@@ -27,10 +50,57 @@ class API:
     _roms_endpoint = "api/roms"
     _user_me_endpoint = "api/users/me"
     _user_profile_picture_url = "assets/romm/assets"
+    _icon_fetch_workers = 4
+    _download_workers = max(1, int(os.getenv("DOWNLOAD_WORKERS", "2")))
+    _resume_checkpoint_bytes = 8 * 1024 * 1024
+    # Compression accepted on JSON responses; images and ROM files are
+    # already compressed and are fetched as is
+    _accept_encoding = "gzip, deflate"
+
+    # ROM list paging: the first page is small so the list shows up quickly,
+    # the following ones are sized from the measured throughput
+    _roms_first_page_size = 50
+    _roms_min_page_size = 50
+    _roms_max_page_size = 1000
+    _roms_page_target_seconds = 1.0
+    # ROMs handed on at a time to the catalog and the cache as a list is read
+    _roms_write_batch = 500
+    # ROM IDs fetched per request when checking a synced list for deletions
+    _roms_id_page_size = 10000
+    # Seconds before the high water mark of a cached ROM list asked for again
+    # when it is synced
+    _roms_sync_overlap_seconds = 60
+    # Fields of the ROM list items that are kept: the ones Rom is built from,
+    # the legacy multi-file flag and the timestamp compared on revalidation
+    _rom_item_fields = frozenset((*Rom._fields, "multi", "updated_at"))
+    # Wait before probing the server capabilities again after a failed probe,
+    # unless the server answers another request first
+    _capabilities_retry_seconds = 300
 
     def __init__(self):
         self.status = Status()
         self.file_system = Filesystem()
+        self.assets = AssetCache()
+        self.http = HttpClient()
+        self.copier = StreamCopier()
+        self.cache = CatalogCache()
+        self.catalog = Catalog()
+        self.tasks = TaskScheduler()
+        self._icon_executor = ThreadPoolExecutor(
+            max_workers=self._icon_fetch_workers, thread_name_prefix="icon"
+        )
+        self._icons_lock = threading.Lock()
+        self._pending_icons: set[str] = set()
+        self._roms_page_size = self._roms_first_page_size
+        # Optional ROM query parameters the server supports, None until probed
+        self._capabilities: Optional[set[str]] = None
+        self._capabilities_lock = threading.Lock()
+        # Set once the probe in progress is done, None when none is running
+        self._capabilities_probed: Optional[threading.Event] = None
+        # Monotonic time before which a failed probe is not run again
+        self._capabilities_retry_at = 0.0
+        self._stored_platform_ids: set[int] = set()
+        self._platform_rom_counts: dict[int, int] = {}
 
         self.host = os.getenv("HOST", "")
         self.username = os.getenv("USERNAME", "")
@@ -88,7 +158,7 @@ class API:
                 self.status.valid_host = False
                 self.status.valid_credentials = False
                 return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
+            response = self.http.urlopen(request, timeout=60)
         except HTTPError as e:
             print(e)
             if e.code == 403:
@@ -112,14 +182,13 @@ class API:
         icon = Image.open(self.status.profile_pic_path)
         icon = icon.resize((26, 26))
         icon.save(self.status.profile_pic_path)
+        self.assets.invalidate(self.status.profile_pic_path)
         self.status.valid_host = True
         self.status.valid_credentials = True
 
     def fetch_me(self) -> None:
         try:
-            request = Request(
-                f"{self.host}/{self._user_me_endpoint}", headers=self.headers
-            )
+            request = self._json_request(f"{self.host}/{self._user_me_endpoint}")
         except ValueError as e:
             print(e)
             self.status.valid_host = False
@@ -130,7 +199,7 @@ class API:
                 self.status.valid_host = False
                 self.status.valid_credentials = False
                 return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
+            response = self.http.urlopen(request, timeout=60)
         except HTTPError as e:
             print(e)
             if e.code == 403:
@@ -171,7 +240,7 @@ class API:
                 self.status.valid_host = False
                 self.status.valid_credentials = False
                 return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
+            response = self.http.urlopen(request, timeout=60)
         except HTTPError as e:
             print(e)
             if e.code == 403:
@@ -196,83 +265,265 @@ class API:
         if not os.path.exists(self.file_system.resources_path):
             os.makedirs(self.file_system.resources_path)
 
-        with open(f"{self.file_system.resources_path}/{platform_slug}.ico", "wb") as f:
-            f.write(response.read())
-
-        icon = Image.open(f"{self.file_system.resources_path}/{platform_slug}.ico")
+        # Write to a temporary file first so the UI never opens a partial icon
+        icon_path = f"{self.file_system.resources_path}/{platform_slug}.ico"
+        icon = Image.open(BytesIO(response.read()))
         icon = icon.resize((30, 30))
-        icon.save(f"{self.file_system.resources_path}/{platform_slug}.ico")
+        icon.save(f"{icon_path}.tmp", format="ICO")
+        os.replace(f"{icon_path}.tmp", icon_path)
+        # Drawn on the redraw the icon task asks for, not a second later
+        self.assets.invalidate(icon_path)
         self.status.valid_host = True
         self.status.valid_credentials = True
 
-    def fetch_platforms(self) -> None:
+    def _queue_platform_icon(self, platform_slug: str) -> None:
+        with self._icons_lock:
+            if platform_slug in self._pending_icons:
+                return
+            self._pending_icons.add(platform_slug)
+        self._icon_executor.submit(self._fetch_platform_icon_task, platform_slug)
+
+    def _fetch_platform_icon_task(self, platform_slug: str) -> None:
         try:
-            request = Request(
-                f"{self.host}/{self._platforms_endpoint}", headers=self.headers
+            self._fetch_platform_icon(platform_slug)
+        except (HTTPError, OSError) as e:
+            print(f"Error fetching icon for {platform_slug}: {e}")
+        finally:
+            with self._icons_lock:
+                self._pending_icons.discard(platform_slug)
+            # The icon shows up in the platform list
+            self.status.mark_dirty()
+
+    def _json_request(self, url: str, headers: Optional[dict[str, str]] = None) -> Request:
+        """Build an API request whose JSON response may come compressed."""
+        return Request(
+            url,
+            headers={
+                **self.headers,
+                "Accept-Encoding": self._accept_encoding,
+                **(headers or {}),
+            },
+        )
+
+    def _cache_key(self, url: str) -> str:
+        return f"{self.username}@{url}"
+
+    def _fetch_catalog_json(self, url: str, timeout: float) -> tuple[Any, bool]:
+        """Fetch a catalog endpoint, revalidating the cached copy if there is one.
+
+        Returns the payload and whether it changed since it was cached.
+        """
+        key = self._cache_key(url)
+        entry = self.cache.get(key)
+        request = self._json_request(url, self.cache.conditional_headers(entry))
+        if request.type not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {request.type}")
+        response = self.http.urlopen(request, timeout=timeout)
+        if response.status == 304 and entry:
+            response.read()
+            return entry["data"], False
+
+        data = json.loads(response.read().decode("utf-8"))
+        self.cache.put(
+            key,
+            data,
+            etag=response.getheader("ETag"),
+            last_modified=response.getheader("Last-Modified"),
+        )
+        return data, True
+
+    def _platforms_url(self) -> str:
+        return f"{self.host}/{self._platforms_endpoint}"
+
+    def _collections_urls(self) -> tuple[str, str]:
+        return (
+            f"{self.host}/{self._collections_endpoint}",
+            f"{self.host}/{self._virtual_collections_endpoint}?type={self._collection_type}",
+        )
+
+    def _roms_url(self, view: str, id: int) -> str:
+        return (
+            f"{self.host}/{self._roms_endpoint}?{view}_id={id}&order_by=name&order_dir=asc"
+            + self._roms_filter_params(view)
+        )
+
+    def _roms_filter_params(
+        self, view: str, fields: Optional[frozenset[str]] = None
+    ) -> str:
+        """Return the query parameters that let the server drop what `_filter_roms`
+        would, for the capabilities it has. Items are trimmed to `fields`, by
+        default the ones kept from a ROM list."""
+        capabilities = self._server_capabilities()
+        params = ""
+        # Platform lists are already limited to one platform by the server
+        if (
+            "platform_ids" in capabilities
+            and view != View.PLATFORMS
+            and self._stored_platform_ids
+        ):
+            params += "".join(
+                f"&platform_ids={id}" for id in sorted(self._stored_platform_ids)
             )
-        except ValueError:
-            self.status.platforms = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
+        if "fields" in capabilities:
+            params += f"&fields={','.join(sorted(fields or self._rom_item_fields))}"
+        return params
+
+    def _server_capabilities(self) -> set[str]:
+        """Return the optional ROM query parameters the server understands,
+        probed once per session as soon as the platform list is known.
+
+        The probe runs outside the lock, callers arriving meanwhile wait for
+        its result instead of probing again. After a failed probe none of the
+        capabilities are used until the server answers the platform list again
+        or `_capabilities_retry_seconds` have passed.
+        """
+        with self._capabilities_lock:
+            if (
+                self._capabilities is not None
+                or not self._platform_rom_counts
+                or time.monotonic() < self._capabilities_retry_at
+            ):
+                return self._capabilities or set()
+            probed = self._capabilities_probed
+            if probed is None:
+                self._capabilities_probed = threading.Event()
+        if probed is not None:
+            probed.wait()
+            return self._capabilities or set()
+
+        capabilities = None
         try:
-            if request.type not in ("http", "https"):
-                self.status.platforms = []
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            print(f"HTTP Error in fetching platforms: {e}")
-            if e.code == 403:
-                self.status.platforms = []
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError:
-            print("URLError in fetching platforms")
-            self.status.platforms = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-        platforms = json.loads(response.read().decode("utf-8"))
-        _platforms: list[Platform] = []
+            capabilities = self._probe_capabilities()
+            print(f"Server capabilities: {', '.join(sorted(capabilities)) or 'none'}")
+        except (HTTPError, URLError, ValueError, KeyError) as e:
+            print(f"Error probing server capabilities: {e}")
+        finally:
+            with self._capabilities_lock:
+                self._capabilities = capabilities
+                if capabilities is None:
+                    self._capabilities_retry_at = (
+                        time.monotonic() + self._capabilities_retry_seconds
+                    )
+                self._capabilities_probed.set()
+                self._capabilities_probed = None
+        return capabilities or set()
+
+    def _probe_roms(self, params: str) -> dict:
+        request = self._json_request(f"{self.host}/{self._roms_endpoint}?limit=1{params}")
+        response = self.http.urlopen(request, timeout=60)
+        return json.loads(response.read().decode("utf-8"))
+
+    def _probe_capabilities(self) -> set[str]:
+        capabilities = set()
+        # A server ignoring the filter reports every ROM as the total
+        platform_id, rom_count = min(
+            self._platform_rom_counts.items(), key=lambda item: item[1]
+        )
+        probe = self._probe_roms(f"&platform_ids={platform_id}")
+        if isinstance(probe, dict) and probe.get("total") == rom_count:
+            capabilities.add("platform_ids")
 
-        # Get the list of subfolders in the ROMs directory for non-muOS filtering
+        # A server ignoring the projection returns every field
+        probe = self._probe_roms("&fields=id,name")
+        items = probe.get("items") if isinstance(probe, dict) else probe
+        if items and set(items[0]) <= {"id", "name"}:
+            capabilities.add("fields")
+
+        # A server ignoring the filter still returns ROMs updated before
+        # the far future; an empty library tells nothing
+        if items:
+            probe = self._probe_roms("&updated_after=9999-12-31T00%3A00%3A00%2B00%3A00")
+            if isinstance(probe, dict) and probe.get("total") == 0:
+                capabilities.add("updated_after")
+        return capabilities
+
+    def _roms_query(self) -> Optional[tuple[str, int, Optional[str]]]:
+        """Return the (view, id, platform slug) of the ROM list being browsed."""
+        if self.status.selected_platform:
+            return (
+                View.PLATFORMS,
+                self.status.selected_platform.id,
+                self.status.selected_platform.slug.lower(),
+            )
+        elif self.status.selected_collection:
+            return View.COLLECTIONS, self.status.selected_collection.id, None
+        elif self.status.selected_virtual_collection:
+            return (
+                View.VIRTUAL_COLLECTIONS,
+                self.status.selected_virtual_collection.id,
+                None,
+            )
+        return None
+
+    def _get_roms_subfolders(self) -> set[str]:
+        """Return the lowercased subfolders of the ROMs directory for non-muOS filtering."""
         roms_subfolders = set()
         if not self.file_system.is_muos:
             roms_path = self.file_system.get_roms_storage_path()
-            print(f"ROMs path: {roms_path}")
             if os.path.exists(roms_path):
                 roms_subfolders = {
                     d.lower()
                     for d in os.listdir(roms_path)
                     if os.path.isdir(os.path.join(roms_path, d))
                 }
+        return roms_subfolders
+
+    def load_cached_catalog(self) -> None:
+        """Publish the cached platforms and collections, if any, so the lists
+        show up immediately while the network refresh runs in the background."""
+        platforms_entry = self.cache.get(self._cache_key(self._platforms_url()))
+        if platforms_entry:
+            self._publish_platforms(platforms_entry["data"])
+
+        collections_url, v_collections_url = self._collections_urls()
+        collections_entry = self.cache.get(self._cache_key(collections_url))
+        v_collections_entry = self.cache.get(self._cache_key(v_collections_url))
+        if collections_entry and v_collections_entry:
+            self._publish_collections(
+                collections_entry["data"], v_collections_entry["data"]
+            )
+
+    def _is_platform_stored(self, platform_slug: str, roms_subfolders: set[str]) -> bool:
+        """Whether ROMs of the platform have somewhere to go on this device."""
+        if self.file_system.is_muos:
+            # Check if platform is supported (either in MUOS map or CUSTOM_MAPS)
+            if platform_slug in platform_maps.MUOS_SUPPORTED_PLATFORMS:
+                return True
+            if platform_maps._env_maps is None:
+                platform_maps.init_env_maps()
+            return platform_slug in (platform_maps._env_platforms or set())
+
+        # Map the slug to the folder name for non-muOS, using Filesystem method
+        mapped_folder = self.file_system._get_platform_storage_dir_from_mapping(platform_slug)
+        # Extract just the folder name (remove the full path)
+        mapped_folder = os.path.basename(mapped_folder) if os.path.sep in mapped_folder else mapped_folder
+        return mapped_folder.lower() in roms_subfolders
+
+    def _publish_platforms(self, platforms: list[dict]) -> None:
+        _platforms: list[Platform] = []
+        missing_icons: list[str] = []
+        roms_subfolders = self._get_roms_subfolders()
+
+        # Platforms whose ROMs are kept in ROM lists, to filter them server side
+        self._stored_platform_ids = {
+            platform["id"]
+            for platform in platforms
+            if self._is_platform_stored(platform["slug"].lower(), roms_subfolders)
+        }
+        self._platform_rom_counts = {
+            platform["id"]: platform["rom_count"]
+            for platform in platforms
+            if platform["rom_count"] > 0
+        }
 
         for platform in platforms:
             if platform["rom_count"] > 0:
                 platform_slug = platform["slug"].lower()
-                if self.file_system.is_muos:
-                    # Check if platform is supported (either in MUOS map or CUSTOM_MAPS)
-                    if (
-                        platform_slug not in platform_maps.MUOS_SUPPORTED_PLATFORMS
-                        and platform_slug not in (platform_maps._env_platforms or set())
-                        or platform_slug in self._exclude_platforms
-                    ):
-                        continue
-                else:
-                    # Map the slug to the folder name for non-muOS, using Filesystem method
-                    mapped_folder = self.file_system._get_platform_storage_dir_from_mapping(platform_slug)
-                    # Extract just the folder name (remove the full path)
-                    mapped_folder = os.path.basename(mapped_folder) if os.path.sep in mapped_folder else mapped_folder
-                    if (
-                        mapped_folder.lower() not in roms_subfolders
-                        or platform_slug in self._exclude_platforms
-                    ):
-                        continue
+                if (
+                    platform["id"] not in self._stored_platform_ids
+                    or platform_slug in self._exclude_platforms
+                ):
+                    continue
 
                 _platforms.append(
                     Platform(
@@ -286,59 +537,56 @@ class API:
                 self.file_system.resources_path = os.getcwd() + "/resources"
                 icon_path = f"{self.file_system.resources_path}/{platform['slug']}.ico"
                 if not os.path.exists(icon_path):
-                    self._fetch_platform_icon(platform["slug"])
+                    missing_icons.append(platform["slug"])
 
+        self.catalog.replace_platforms(_platforms)
         self.status.platforms = _platforms
-        print(f"Fetched {len(_platforms)} platforms")
-        self.status.valid_host = True
-        self.status.valid_credentials = True
         self.status.platforms_ready.set()
 
-    def fetch_collections(self) -> None:
+        # Icons are fetched in the background and show up in the list as they land
+        for platform_slug in missing_icons:
+            self._queue_platform_icon(platform_slug)
+
+    def fetch_platforms(self) -> None:
+        print(f"ROMs path: {self.file_system.get_roms_storage_path()}")
         try:
-            collections_request = Request(
-                f"{self.host}/{self._collections_endpoint}", headers=self.headers
-            )
-            v_collections_request = Request(
-                f"{self.host}/{self._virtual_collections_endpoint}?type={self._collection_type}",
-                headers=self.headers,
+            platforms, changed = self._fetch_catalog_json(
+                self._platforms_url(), timeout=60
             )
         except ValueError:
-            self.status.collections = []
+            self.status.platforms = []
             self.status.valid_host = False
             self.status.valid_credentials = False
             return
-
-        try:
-            if collections_request.type not in ("http", "https"):
-                self.status.collections = []
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-
-            collections_response = urlopen(  # trunk-ignore(bandit/B310)
-                collections_request, timeout=60
-            )
-            v_collections_response = urlopen(  # trunk-ignore(bandit/B310)
-                v_collections_request, timeout=60
-            )
         except HTTPError as e:
+            print(f"HTTP Error in fetching platforms: {e}")
             if e.code == 403:
-                self.status.collections = []
+                self.status.platforms = []
                 self.status.valid_host = True
                 self.status.valid_credentials = False
                 return
             else:
                 raise
         except URLError:
-            self.status.collections = []
+            print("URLError in fetching platforms")
+            self.status.platforms = []
             self.status.valid_host = False
             self.status.valid_credentials = False
             return
 
-        collections = json.loads(collections_response.read().decode("utf-8"))
-        v_collections = json.loads(v_collections_response.read().decode("utf-8"))
+        # The server is reachable again, a failed capability probe can be retried
+        self._capabilities_retry_at = 0.0
+        self._publish_platforms(platforms)
+        print(
+            f"Fetched {len(self.status.platforms)} platforms"
+            + ("" if changed else " (not modified)")
+        )
+        self.status.valid_host = True
+        self.status.valid_credentials = True
 
+    def _publish_collections(
+        self, collections: list[dict] | dict, v_collections: list[dict] | dict
+    ) -> None:
         if isinstance(collections, dict):
             collections = collections["items"]
         if isinstance(v_collections, dict):
@@ -380,281 +628,843 @@ class API:
                     )
                 )
 
+        self.catalog.replace_collections(_collections)
         self.status.collections = _collections
-        self.status.valid_host = True
-        self.status.valid_credentials = True
         self.status.collections_ready.set()
 
-    def fetch_roms(self) -> None:
-        if self.status.selected_platform:
-            view = View.PLATFORMS
-            id = self.status.selected_platform.id
-            selected_platform_slug = self.status.selected_platform.slug.lower()
-        elif self.status.selected_collection:
-            view = View.COLLECTIONS
-            id = self.status.selected_collection.id
-            selected_platform_slug = None
-        elif self.status.selected_virtual_collection:
-            view = View.VIRTUAL_COLLECTIONS
-            id = self.status.selected_virtual_collection.id
-            selected_platform_slug = None
-        else:
-            return
-
+    def fetch_collections(self) -> None:
+        collections_url, v_collections_url = self._collections_urls()
         try:
-            request = Request(
-                f"{self.host}/{self._roms_endpoint}?{view}_id={id}&order_by=name&order_dir=asc&limit=1000",
-                headers=self.headers,
+            collections, _changed = self._fetch_catalog_json(
+                collections_url, timeout=60
+            )
+            v_collections, _changed = self._fetch_catalog_json(
+                v_collections_url, timeout=60
             )
         except ValueError:
-            self.status.roms = []
+            self.status.collections = []
             self.status.valid_host = False
             self.status.valid_credentials = False
             return
-        try:
-            if request.type not in ("http", "https"):
-                self.status.roms = []
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=1800)  # trunk-ignore(bandit/B310)
         except HTTPError as e:
             if e.code == 403:
-                self.status.roms = []
+                self.status.collections = []
                 self.status.valid_host = True
                 self.status.valid_credentials = False
                 return
             else:
                 raise
         except URLError:
-            self.status.roms = []
+            self.status.collections = []
             self.status.valid_host = False
             self.status.valid_credentials = False
             return
 
-        # { 'items': list[dict], 'total': number, 'limit': number, 'offset': number }
-        roms = json.loads(response.read().decode("utf-8"))
-        if isinstance(roms, dict):
-            roms = roms["items"]
+        self._publish_collections(collections, v_collections)
+        self.status.valid_host = True
+        self.status.valid_credentials = True
 
-        # Get the list of subfolders in the ROMs directory for non-muOS filtering
-        roms_subfolders = set()
-        if not self.file_system.is_muos:
-            roms_path = self.file_system.get_roms_storage_path()
-            if os.path.exists(roms_path):
-                roms_subfolders = {
-                    d.lower()
-                    for d in os.listdir(roms_path)
-                    if os.path.isdir(os.path.join(roms_path, d))
-                }
+    def _build_rom(self, rom: dict) -> Rom:
+        fields = {field: rom.get(field) for field in Rom._fields}
+        fields["fs_size"] = self._human_readable_size(rom["fs_size_bytes"])
+        # Older RomM versions flag multi-file ROMs as `multi`
+        fields["has_multiple_files"] = rom.get(
+            "has_multiple_files", rom.get("multi", False)
+        )
+        return Rom(**fields)
+
+    def _filter_roms(
+        self, roms: Iterable[dict], query: tuple[str, int, Optional[str]]
+    ) -> Iterator[Rom]:
+        view, _id, selected_platform_slug = query
+        roms_subfolders = self._get_roms_subfolders()
 
-        _roms = []
+        # Also applied to lists the server already filtered, which may have
+        # been cached before a ROMs folder was added or removed
+        stored: dict[str, bool] = {}
         for rom in roms:
             platform_slug = rom["platform_slug"].lower()
-            if self.file_system.is_muos:
-                if platform_slug not in platform_maps.MUOS_SUPPORTED_PLATFORMS:
-                    # Check if it's in CUSTOM_MAPS
-                    if platform_maps._env_maps is None:
-                        platform_maps.init_env_maps()
-                    if platform_slug not in (platform_maps._env_platforms or set()):
-                        continue
-            else:
-                # Map the slug to the folder name for non-muOS, using Filesystem method
-                mapped_folder = self.file_system._get_platform_storage_dir_from_mapping(platform_slug)
-                # Extract just the folder name (remove the full path)
-                mapped_folder = os.path.basename(mapped_folder) if os.path.sep in mapped_folder else mapped_folder
-                if mapped_folder.lower() not in roms_subfolders:
-                    continue
+            if platform_slug not in stored:
+                stored[platform_slug] = self._is_platform_stored(
+                    platform_slug, roms_subfolders
+                )
+            if not stored[platform_slug]:
+                continue
             if view == View.PLATFORMS and platform_slug != selected_platform_slug:
                 continue
-            _roms.append(
-                Rom(
-                    id=rom["id"],
-                    name=rom["name"],
-                    fs_name=rom["fs_name"],
-                    platform_slug=rom["platform_slug"],
-                    fs_extension=rom["fs_extension"],
-                    fs_size=self._human_readable_size(rom["fs_size_bytes"]),
-                    fs_size_bytes=rom["fs_size_bytes"],
-                    multi=rom["multi"],
-                    languages=rom["languages"],
-                    regions=rom["regions"],
-                    revision=rom["revision"],
-                    tags=rom["tags"],
-                )
+            yield self._build_rom(rom)
+
+    def _publish_roms(
+        self, roms: Iterable[dict], query: tuple[str, int, Optional[str]]
+    ) -> None:
+        # The list is paged from the catalog rather than kept in memory, and
+        # stored in batches so the view can read it in between
+        list_id = self.catalog.new_list(list_key(query[0], query[1]))
+        roms = iter(roms)
+        while batch := list(itertools.islice(roms, self._roms_write_batch)):
+            self.catalog.append_roms(list_id, self._filter_roms(batch, query))
+        self.status.roms = self.catalog.list_roms(list_id)
+        self.status.roms_ready.set()
+
+    def _project_rom_item(self, rom: dict) -> dict:
+        return {key: value for key, value in rom.items() if key in self._rom_item_fields}
+
+    @staticmethod
+    def _max_rss_kib() -> int:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS, in KiB elsewhere
+        return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+    def _adapt_roms_page_size(self, n_items: int, elapsed: float) -> None:
+        """Size the next page so it takes about `_roms_page_target_seconds` at
+        the throughput measured on the last one."""
+        items_per_second = n_items / max(elapsed, 0.001)
+        self._roms_page_size = int(
+            min(
+                max(
+                    items_per_second * self._roms_page_target_seconds,
+                    self._roms_min_page_size,
+                ),
+                self._roms_max_page_size,
             )
+        )
+
+    def _fetch_roms_pages(
+        self,
+        url: str,
+        query: tuple[str, int, Optional[str]],
+        on_items: Callable[[list[dict]], None],
+    ) -> Optional[int]:
+        """Walk the ROM list with offset/limit until `total` is reached.
+
+        Items are handed to `on_items` in batches as they are decoded.
+        Returns the ROM count, or None if the user left the list before it
+        was complete.
+        """
+        count = 0
+        total = None
+        page_size = self._roms_first_page_size
+        parse_seconds = 0.0
+        peak_buffer = 0
+
+        while total is None or count < total:
+            request = self._json_request(f"{url}&limit={page_size}&offset={count}")
+            if request.type not in ("http", "https"):
+                raise ValueError(f"Unsupported URL scheme: {request.type}")
+
+            start = time.monotonic()
+            handling = 0.0
+            response = self.http.urlopen(request, timeout=60)
+            # Items are decoded one at a time, trimmed to the fields in use
+            # and handed on a batch at a time, so the page is never held in
+            # memory whole
+            page = JsonItemStream(response)
+            items = (self._project_rom_item(item) for item in page)
+            n_items = 0
+            left = False
+            while batch := list(itertools.islice(items, self._roms_write_batch)):
+                n_items += len(batch)
+                left = left or self._roms_query() != query or self.tasks.cancelled()
+                # Once the user left, the rest of the page is only read so
+                # the connection can be reused
+                if not left:
+                    handled = time.monotonic()
+                    on_items(batch)
+                    handling += time.monotonic() - handled
+            count += n_items
+            parse_seconds += page.parse_seconds
+            peak_buffer = max(peak_buffer, page.peak_buffer)
+            # Servers without pagination return the whole list at once
+            if page.is_list:
+                break
+
+            self._adapt_roms_page_size(n_items, time.monotonic() - start - handling)
+            page_size = self._roms_page_size
+            total = page.fields.get("total", count)
+
+            if left or self._roms_query() != query or self.tasks.cancelled():
+                return None
+            if not n_items:
+                break
+
+        print(
+            f"Fetched {count} roms (parsed in {parse_seconds:.2f}s, "
+            f"peak buffer {peak_buffer // 1024} KiB, max RSS {self._max_rss_kib() // 1024} MiB)"
+        )
+        return count if total is None else total
+
+    @staticmethod
+    def _roms_fingerprint(roms: list[dict] | dict) -> Optional[list]:
+        """Return the ROM count and newest updated_at of a ROM list payload."""
+        items = roms["items"] if isinstance(roms, dict) else roms
+        total = roms.get("total", len(items)) if isinstance(roms, dict) else len(items)
+        updated_at = [rom["updated_at"] for rom in items if rom.get("updated_at")]
+        return [total, max(updated_at)] if updated_at else None
+
+    def _probe_roms_list(self, view: str, id: int) -> list[dict] | dict:
+        """Fetch the ROM count and the newest ROM of a list in a single-ROM query,
+        so an unchanged list is not walked again."""
+        # Same filters as the list, so the totals can be compared
+        request = self._json_request(
+            f"{self.host}/{self._roms_endpoint}?{view}_id={id}&order_by=updated_at&order_dir=desc&limit=1"
+            + self._roms_filter_params(view)
+        )
+        response = self.http.urlopen(request, timeout=60)
+        return json.loads(response.read().decode("utf-8"))
+
+    @staticmethod
+    def _roms_high_water_mark(
+        roms: Iterable[dict], mark: Optional[str] = None
+    ) -> Optional[str]:
+        """Return the newest updated_at of ROMs, or `mark` if it is newer."""
+        updated_at = [rom["updated_at"] for rom in roms if rom.get("updated_at")]
+        if mark:
+            updated_at.append(mark)
+        return max(updated_at) if updated_at else None
+
+    def _fetch_rom_ids(self, view: str, id: int) -> Optional[set[int]]:
+        """Return the IDs of every ROM in the list, or None if the user left it."""
+        url = (
+            f"{self.host}/{self._roms_endpoint}?{view}_id={id}&order_by=id&order_dir=asc"
+            + self._roms_filter_params(view, fields=frozenset(("id",)))
+        )
+        ids: set[int] = set()
+        offset = 0
+        total = None
+        query = self._roms_query()
+        while total is None or offset < total:
+            request = self._json_request(
+                f"{url}&limit={self._roms_id_page_size}&offset={offset}"
+            )
+            response = self.http.urlopen(request, timeout=60)
+            page = JsonItemStream(response)
+            n_items = 0
+            for item in page:
+                ids.add(item["id"])
+                n_items += 1
+            if page.is_list:
+                break
+            if self._roms_query() != query or self.tasks.cancelled():
+                return None
+            offset += n_items
+            total = page.fields.get("total", offset)
+            if not n_items:
+                break
+        return ids
+
+    @classmethod
+    def _roms_sync_since(cls, mark: str) -> str:
+        """Return the high water mark moved back by `_roms_sync_overlap_seconds`."""
+        try:
+            since = datetime.fromisoformat(mark)
+        except ValueError:
+            return mark
+        return (since - timedelta(seconds=cls._roms_sync_overlap_seconds)).isoformat()
+
+    @staticmethod
+    def _roms_updated_in_place(cached: CachedItems, changed: dict[int, dict]) -> set[int]:
+        """Return the IDs of the updated ROMs that keep their place in the
+        cached list, the ones that were not renamed."""
+        return {
+            rom["id"]
+            for rom in cached
+            if rom["id"] in changed and changed[rom["id"]].get("name") == rom.get("name")
+        }
+
+    @staticmethod
+    def _merge_roms(
+        cached: CachedItems,
+        changed: dict[int, dict],
+        in_place: set[int],
+        ids: Optional[set[int]],
+    ) -> Iterator[dict]:
+        """Merge updated ROMs into a cached list, streamed from disk, dropping
+        the ROMs missing from `ids` when given.
+
+        The cached list keeps the server's order, whatever collation it sorts
+        names with: the ROMs in `in_place` are replaced where they are, new
+        and renamed ones go before the first ROM whose name sorts after theirs.
+        """
+
+        def name(rom: dict) -> str:
+            return (rom.get("name") or "").lower()
+
+        def kept() -> Iterator[dict]:
+            for rom in cached:
+                if ids is not None and rom["id"] not in ids:
+                    continue
+                if rom["id"] in in_place:
+                    yield changed[rom["id"]]
+                elif rom["id"] not in changed:
+                    yield rom
+
+        # Merging only compares the heads of both streams, so the cached ROMs
+        # are never reordered even if the server sorted them differently
+        return heapq.merge(
+            kept(),
+            sorted(
+                (
+                    rom
+                    for rom in changed.values()
+                    if rom["id"] not in in_place and (ids is None or rom["id"] in ids)
+                ),
+                key=name,
+            ),
+            key=name,
+        )
+
+    def _sync_roms(
+        self,
+        url: str,
+        query: tuple[str, int, Optional[str]],
+        cached: CachedItems,
+        total: Optional[int],
+        list_id: int,
+        writer: CacheItemsWriter,
+    ) -> Optional[dict]:
+        """Bring a cached ROM list up to date with the ROMs updated since it was
+        stored, and drop the ones the server no longer lists.
+
+        `total` is the ROM count the server reports for the list. The merged
+        list goes to the catalog list `list_id` and to `writer`; returns the
+        fields to store with it, or None, before writing anything, if it has
+        to be fetched again in full.
+        """
+        view, id, _selected_platform_slug = query
+        mark = cached.fields.get("high_water_mark")
+        if mark is None or total is None:
+            return None
+
+        # ROMs stamped just before the mark may be committed after the list
+        # was read, so the last moments are asked for again; the ROMs fetched
+        # twice are merged by ID
+        changed: dict[int, dict] = {}
+        if (
+            self._fetch_roms_pages(
+                f"{url}&updated_after={quote(self._roms_sync_since(mark), safe='')}",
+                query,
+                lambda items: changed.update((rom["id"], rom) for rom in items),
+            )
+            is None
+        ):
+            return None
+
+        in_place = self._roms_updated_in_place(cached, changed)
+        # Counted on the cached list as it is read back, rather than loaded
+        count = sum(1 for _rom in self._merge_roms(cached, changed, in_place, None))
+        removed = 0
+        ids = None
+        # Only deletions leave more ROMs than the server counts; the ID set
+        # tells which ones, and is small enough to fetch in a request or two
+        if count != total and "fields" in self._server_capabilities():
+            ids = self._fetch_rom_ids(view, id)
+            if ids is None:
+                return None
+            removed = count
+            count = sum(1 for _rom in self._merge_roms(cached, changed, in_place, ids))
+            removed -= count
+        # The entry may have been replaced while it was read again
+        if count != total or not cached.valid:
+            print("ROM count differs from the server, fetching the full list")
+            return None
+
+        roms = self._merge_roms(cached, changed, in_place, ids)
+        while batch := list(itertools.islice(roms, self._roms_write_batch)):
+            writer.write(batch)
+            self.catalog.append_roms(list_id, self._filter_roms(batch, query))
+        print(f"Synced roms: {len(changed)} updated, {removed} removed")
+        return {
+            "total": count,
+            "high_water_mark": self._roms_high_water_mark(changed.values(), mark),
+        }
+
+    def _fetch_all_roms(
+        self,
+        url: str,
+        query: tuple[str, int, Optional[str]],
+        list_id: int,
+        writer: CacheItemsWriter,
+        publish: bool,
+    ) -> Optional[dict]:
+        """Fetch a ROM list in full into the catalog list `list_id` and `writer`.
+
+        When `publish` is set every batch is shown in `Status.roms` as soon
+        as it arrives. Returns the fields to store with the list, or None if
+        the user left it before it was complete.
+        """
+        mark = None
+
+        def on_items(items: list[dict]) -> None:
+            nonlocal mark
+            writer.write(items)
+            self.catalog.append_roms(list_id, self._filter_roms(items, query))
+            if publish:
+                self.status.roms = self.catalog.list_roms(list_id)
+            mark = self._roms_high_water_mark(items, mark)
+
+        if publish:
+            self.status.roms = []
+        total = self._fetch_roms_pages(url, query, on_items)
+        if total is None:
+            return None
+        return {"total": total, "high_water_mark": mark}
+
+    def fetch_roms(self) -> None:
+        try:
+            self._fetch_roms_list()
+        finally:
+            # Every way out ends the loading state, except for a fetch that
+            # was superseded: the one replacing it owns the event then
+            if not self.tasks.cancelled():
+                self.status.roms_ready.set()
+
+    def _fetch_roms_list(self) -> None:
+        query = self._roms_query()
+        if not query:
+            return
+        view, id, _selected_platform_slug = query
+
+        try:
+            url = self._roms_url(view, id)
+            key = self._cache_key(url)
+            cached = self.cache.get_items(key)
+            probe = None
+            if cached:
+                # Serve the cached list right away, then revalidate it
+                self._publish_roms(cached, query)
+                if not cached.valid:
+                    cached = None
+            if cached:
+                fingerprint = [
+                    cached.fields.get("total"),
+                    cached.fields.get("high_water_mark"),
+                ]
+                probe = self._probe_roms_list(view, id)
+                if fingerprint[1] is not None and self._roms_fingerprint(probe) == fingerprint:
+                    self.status.valid_host = True
+                    self.status.valid_credentials = True
+                    return
+
+            # Written as it comes in, the list is never held in memory
+            with self.cache.items_writer(key) as writer:
+                list_id = self.catalog.new_list(list_key(view, id))
+                fields = None
+                # Fetch only what changed since the list was cached
+                if (
+                    cached
+                    and "updated_after" in self._server_capabilities()
+                    and isinstance(probe, dict)
+                ):
+                    fields = self._sync_roms(
+                        url, query, cached, probe.get("total"), list_id, writer
+                    )
+                if fields is None and self._roms_query() == query and not self.tasks.cancelled():
+                    # Without a cached list, ROMs are shown as they arrive
+                    fields = self._fetch_all_roms(
+                        url, query, list_id, writer, publish=not cached
+                    )
+
+                # The user may have left this list while it was being fetched
+                if fields is None or self._roms_query() != query or self.tasks.cancelled():
+                    return
+                writer.commit(**fields)
+            self.status.roms = self.catalog.list_roms(list_id)
+        except ValueError:
+            self.status.roms = []
+            self.status.valid_host = False
+            self.status.valid_credentials = False
+            return
+        except HTTPError as e:
+            if e.code == 403:
+                self.status.roms = []
+                self.status.valid_host = True
+                self.status.valid_credentials = False
+                return
+            else:
+                raise
+        except URLError:
+            self.status.roms = []
+            self.status.valid_host = False
+            self.status.valid_credentials = False
+            return
 
-        self.status.roms = _roms
         self.status.valid_host = True
         self.status.valid_credentials = True
-        self.status.roms_ready.set()
 
     def _reset_download_status(
         self, valid_host: bool = False, valid_credentials: bool = False
     ) -> None:
-        self.status.total_downloaded_bytes = 0
-        self.status.downloaded_percent = 0
         self.status.valid_host = valid_host
         self.status.valid_credentials = valid_credentials
-        self.status.downloading_rom = None
-        self.status.extracting_rom = False
         self.status.multi_selected_roms = []
         self.status.download_queue = []
+        self.status.downloads = {}
         self.status.download_rom_ready.set()
         self.status.abort_download.set()
 
+    def _ensure_dir(self, path: str) -> Optional[str]:
+        """Create a directory if needed and return its path.
+
+        On case-insensitive filesystems the directory might already exist with a
+        different casing, in which case that directory is returned instead.
+        """
+        try:
+            os.makedirs(path, exist_ok=True)
+            return path
+        except OSError:
+            parent_dir = os.path.dirname(path)
+            if not os.path.isdir(parent_dir):
+                return None
+            dir_name = os.path.basename(path).lower()
+            try:
+                for item in os.listdir(parent_dir):
+                    item_path = os.path.join(parent_dir, item)
+                    if item.lower() == dir_name and os.path.isdir(item_path):
+                        return item_path
+            except OSError:
+                pass
+            return None
+
+    @staticmethod
+    def _resume_validator(response) -> Optional[str]:
+        """Return the strong ETag or Last-Modified date used as If-Range validator."""
+        etag = response.getheader("ETag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return response.getheader("Last-Modified")
+
+    def _load_resume_state(self, part_path: str, rom: Rom) -> tuple[int, Optional[str]]:
+        """Return the byte offset and validator of a previous partial download."""
+        try:
+            with open(f"{part_path}.json", "r", encoding="utf-8") as f:
+                state = json.load(f)
+            part_size = os.path.getsize(part_path)
+        except (OSError, ValueError):
+            return 0, None
+        # Without a validator the server can't tell us whether the file changed
+        if state.get("size") != rom.fs_size_bytes or not state.get("validator"):
+            return 0, None
+        return min(state.get("offset", 0), part_size), state["validator"]
+
+    def _save_resume_state(
+        self, part_path: str, rom: Rom, out_file, offset: int, validator: Optional[str]
+    ) -> None:
+        # Make sure the data is on the card before recording its offset
+        out_file.flush()
+        os.fsync(out_file.fileno())
+        state = {"offset": offset, "size": rom.fs_size_bytes, "validator": validator}
+        with open(f"{part_path}.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(f"{part_path}.json.tmp", f"{part_path}.json")
+
+    @staticmethod
+    def _clear_resume_state(part_path: str) -> None:
+        if os.path.exists(f"{part_path}.json"):
+            os.remove(f"{part_path}.json")
+
+    @staticmethod
+    def _expected_content_size(response, offset: int, rom: Rom) -> Optional[int]:
+        """Return the size the ROM file has once `response` is fully read."""
+        content_range = response.getheader("Content-Range") or ""
+        _unit, _, total = content_range.rpartition("/")
+        if response.status == 206 and total.isdigit():
+            return int(total)
+        content_length = response.getheader("Content-Length") or ""
+        # The length of an encoded body says nothing about the file
+        if content_length.isdigit() and not response.getheader("Content-Encoding"):
+            return offset + int(content_length)
+        return rom.fs_size_bytes or None
+
+    def _open_rom_content(self, url: str, offset: int, validator: Optional[str]):
+        """Request ROM content, asking for the bytes after `offset` when resuming.
+
+        A 206 response continues the partial file; anything else restarts it.
+        """
+        headers = dict(self.headers)
+        if offset and validator:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        request = Request(url, headers=headers)
+        if request.type not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {request.type}")
+
+        try:
+            response = self.http.urlopen(request, timeout=60)
+        except HTTPError as e:
+            # The partial file no longer matches the remote one, start over
+            if e.code == 416 and "Range" in headers:
+                return self._open_rom_content(url, 0, None)
+            raise
+        content_range = response.getheader("Content-Range") or ""
+        if response.status == 206 and not content_range.startswith(f"bytes {offset}-"):
+            response.close()
+            return self._open_rom_content(url, 0, None)
+        return response
+
+    def _stream_extract_rom(
+        self, rom: Rom, url: str, dest_dir: str, progress: DownloadProgress
+    ) -> None:
+        """Download a multi-file ROM, writing archive members as they arrive.
+
+        Raises `UnsupportedArchive` once any written member has been removed
+        again, so the caller can fall back to downloading the archive first.
+        """
+        print(f"Fetching: {url}")
+        response = self._open_rom_content(url, 0, None)
+        print(f"Downloading and extracting {rom.name} to {dest_dir}")
+        progress.state = DownloadState.DOWNLOADING
+        written: list[str] = []
+        try:
+            with response:
+                reader = ZipStreamReader(response)
+
+                def on_progress(_n: int) -> None:
+                    progress.downloaded_bytes = reader.bytes_read
+
+                for member in reader:
+                    if self.status.abort_download.is_set():
+                        break
+                    file_path = os.path.join(dest_dir, self._sanitize_filename(member.filename))
+                    # Fix: Handle case-insensitive filesystems - ensure directory exists
+                    file_dir = self._ensure_dir(
+                        file_path if member.is_dir else os.path.dirname(file_path)
+                    )
+                    if file_dir is None:
+                        print(f"Error: Cannot create directory {os.path.dirname(file_path)}. Skipping file.")
+                        continue
+                    if member.is_dir:
+                        continue
+                    file_path = os.path.join(file_dir, os.path.basename(file_path))
+                    written.append(file_path)
+                    with open(file_path, "wb") as target:
+                        self.copier.copy(
+                            member, target, on_progress, self.status.abort_download.is_set
+                        )
+                if not self.status.abort_download.is_set():
+                    # Read the central directory so the connection can be reused
+                    response.read()
+        except BaseException:
+            self._remove_files(written)
+            raise
+        if self.status.abort_download.is_set():
+            # A partly extracted ROM would otherwise look installed
+            self._remove_files(written)
+            return
+
+        progress.downloaded_bytes = reader.bytes_read
+        self.status.valid_host = True
+        self.status.valid_credentials = True
+        print(f"Extracted {rom.name} at {dest_dir}")
+        progress.state = DownloadState.DONE
+
+    @staticmethod
+    def _remove_files(paths: list[str]) -> None:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
     def download_rom(self) -> None:
-        self.status.download_queue.sort(key=lambda rom: rom.name)
-        for i, rom in enumerate(self.status.download_queue):
-            self.status.downloading_rom = rom
-            self.status.downloading_rom_position = i + 1
-            dest_path = os.path.join(
-                self.file_system.get_platforms_storage_path(rom.platform_slug),
-                self._sanitize_filename(rom.fs_name),
+        queue = sorted(self.status.download_queue, key=lambda rom: rom.name)
+        self.status.downloads = {rom.id: DownloadProgress(rom) for rom in queue}
+        self.status.download_queue = queue
+        self.status.download_started_at = time.monotonic()
+
+        errors: list[Optional[str]] = []
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self._download_workers, thread_name_prefix="download"
+            ) as executor:
+                errors = list(executor.map(self._download_queued_rom, queue))
+
+            failed = [
+                progress.rom.name
+                for progress in self.status.downloads.values()
+                if progress.state == DownloadState.FAILED
+            ]
+            if failed:
+                print(f"Failed to download {len(failed)} rom(s): {', '.join(failed)}")
+        finally:
+            # End of download, also after an unexpected error so that the
+            # next download can start
+            self._reset_download_status(
+                valid_host="host" not in errors,
+                valid_credentials="credentials" not in errors,
             )
-            url = f"{self.host}/{self._roms_endpoint}/{rom.id}/content/{quote(rom.fs_name)}?hidden_folder=true"
-            
-            # Fix: Handle case-insensitive filesystems - ensure directory exists
-            dest_dir = os.path.dirname(dest_path)
+
+    def _download_queued_rom(self, rom: Rom) -> Optional[str]:
+        """Download one queue item, returning the kind of error that made it fail.
+
+        Errors only fail their own item so the rest of the queue keeps going.
+        """
+        progress = self.status.downloads[rom.id]
+        try:
             try:
-                os.makedirs(dest_dir, exist_ok=True)
-            except (FileExistsError, OSError):
-                # On case-insensitive filesystems, the directory might exist with different casing
-                # Try to verify it's actually a directory and not a file
-                parent_dir = os.path.dirname(dest_dir)
-                if os.path.exists(parent_dir) and os.path.isdir(parent_dir):
-                    # Check if any subdirectory matches (case-insensitive)
-                    dest_dir_name = os.path.basename(dest_dir)
-                    found_dir = None
-                    try:
-                        for item in os.listdir(parent_dir):
-                            if item.lower() == dest_dir_name.lower():
-                                item_path = os.path.join(parent_dir, item)
-                                if os.path.isdir(item_path):
-                                    found_dir = item_path
-                                    break
-                    except (OSError, PermissionError):
-                        pass
-                    
-                    if found_dir:
-                        # Use the existing directory with correct casing
-                        dest_path = os.path.join(found_dir, os.path.basename(dest_path))
-                    else:
-                        print(f"Error: Cannot create or access directory {dest_dir}. Skipping {rom.name}")
-                        continue
-                else:
-                    print(f"Error: Cannot create directory {dest_dir}. Skipping {rom.name}")
-                    continue
+                self._download_single_rom(rom, progress)
+            except ChecksumMismatch as e:
+                # Most likely corrupted in transit, try once more before failing
+                print(f"{e}, downloading again")
+                progress.downloaded_bytes = progress.resumed_bytes = 0
+                self._download_single_rom(rom, progress)
+            except IncompleteDownload as e:
+                # Resumed from where the connection dropped
+                print(f"{e}, resuming")
+                self._download_single_rom(rom, progress)
+        except HTTPError as e:
+            print(f"Error downloading {rom.name}: {e}")
+            progress.state = DownloadState.FAILED
+            return "credentials" if e.code == 403 else "error"
+        except URLError as e:
+            print(f"Error downloading {rom.name}: {e}")
+            progress.state = DownloadState.FAILED
+            return "host"
+        except (OSError, ValueError, zipfile.BadZipFile, http.client.HTTPException) as e:
+            print(f"Error downloading {rom.name}: {e}")
+            progress.state = DownloadState.FAILED
+            return "error"
+        if progress.state == DownloadState.DONE:
+            self.file_system.mark_rom_presence(rom, True)
+        return None
+
+    def _download_single_rom(self, rom: Rom, progress: DownloadProgress) -> None:
+        if self.status.abort_download.is_set():
+            return
 
+        dest_path = os.path.join(
+            self.file_system.get_platforms_storage_path(rom.platform_slug),
+            self._sanitize_filename(rom.fs_name),
+        )
+        url = f"{self.host}/{self._roms_endpoint}/{rom.id}/content/{quote(rom.fs_name)}?hidden_folder=true"
+
+        # Fix: Handle case-insensitive filesystems - ensure directory exists
+        dest_dir = self._ensure_dir(os.path.dirname(dest_path))
+        if dest_dir is None:
+            raise OSError(f"Cannot create or access directory {os.path.dirname(dest_path)}")
+        dest_path = os.path.join(dest_dir, os.path.basename(dest_path))
+
+        # Data goes to a .part file that is only renamed once complete, so an
+        # interrupted download can be resumed with a Range request
+        part_path = f"{dest_path}.part"
+
+        # Archives are extracted while they download unless a previous attempt
+        # left a partial archive behind to resume
+        if rom.has_multiple_files and not os.path.exists(part_path):
             try:
-                print(f"Fetching: {url}")
-                request = Request(url, headers=self.headers)
-            except ValueError:
-                self._reset_download_status()
+                self._stream_extract_rom(rom, url, dest_dir, progress)
                 return
+            except UnsupportedArchive as e:
+                print(f"Cannot extract {rom.name} while downloading ({e}), downloading archive first")
+                progress.downloaded_bytes = 0
+
+        offset, validator = self._load_resume_state(part_path, rom)
+
+        # The server hashes are for the ROM file, not for multi-file archives
+        checksum = None if rom.has_multiple_files else RomChecksum.for_rom(rom)
+        if checksum and offset:
+            progress.state = DownloadState.VERIFYING
+            checksum.update_from_file(part_path, offset)
+
+        print(f"Fetching: {url}")
+        response = self._open_rom_content(url, offset, validator)
+        if response.status != 206:
+            offset = 0
+            if checksum:
+                checksum.reset()
+        validator = self._resume_validator(response) or (validator if offset else None)
+        expected_size = self._expected_content_size(response, offset, rom)
+        if offset:
+            print(f"Resuming {rom.name} at {offset} bytes")
+
+        print(f"Downloading {rom.name} to {dest_path}")
+        progress.state = DownloadState.DOWNLOADING
+        progress.downloaded_bytes = progress.resumed_bytes = offset
+        with response, open(part_path, "r+b" if offset else "wb") as out_file:
+            out_file.truncate(offset)
+            out_file.seek(offset)
+            checkpoint = offset
+
+            def on_progress(n: int) -> None:
+                nonlocal checkpoint
+                progress.downloaded_bytes += n
+                if progress.downloaded_bytes - checkpoint >= self._resume_checkpoint_bytes:
+                    checkpoint = progress.downloaded_bytes
+                    self._save_resume_state(part_path, rom, out_file, checkpoint, validator)
+
             try:
-                if request.type not in ("http", "https"):
-                    self._reset_download_status()
-                    return
-                print(f"Downloading {rom.name} to {dest_path}")
-                with (
-                    urlopen(request) as response,  # trunk-ignore(bandit/B310)
-                    open(dest_path, "wb") as out_file,
-                ):
-                    self.status.total_downloaded_bytes = 0
-                    chunk_size = 1024
-                    while True:
-                        if not self.status.abort_download.is_set():
-                            chunk = response.read(chunk_size)
-                            if not chunk:
-                                print("Finalized download")
-                                break
-                            out_file.write(chunk)
-                            self.status.valid_host = True
-                            self.status.valid_credentials = True
-                            self.status.total_downloaded_bytes += len(chunk)
-                            self.status.downloaded_percent = (
-                                self.status.total_downloaded_bytes
-                                / (
-                                    self.status.downloading_rom.fs_size_bytes + 1
-                                )  # Add 1 virtual byte to avoid division by zero
-                            ) * 100
-                        else:
-                            self._reset_download_status(True, True)
-                            os.remove(dest_path)
-                            return
-                # Handle multi-file (ZIP) ROMs
-                if rom.multi:
-                    self.status.extracting_rom = True
-                    print("Multi file rom detected. Extracting...")
-                    with zipfile.ZipFile(dest_path, "r") as zip_ref:
-                        total_size = sum(file.file_size for file in zip_ref.infolist())
-                        extracted_size = 0
-                        chunk_size = 1024
-                        for file in zip_ref.infolist():
-                            if not self.status.abort_download.is_set():
-                                file_path = os.path.join(
-                                    os.path.dirname(dest_path),
-                                    self._sanitize_filename(file.filename),
-                                )
-                                # Fix: Handle case-insensitive filesystems - ensure directory exists
-                                file_dir = os.path.dirname(file_path)
-                                try:
-                                    os.makedirs(file_dir, exist_ok=True)
-                                except (FileExistsError, OSError):
-                                    # Check if directory exists with different casing
-                                    parent_dir = os.path.dirname(file_dir)
-                                    if os.path.exists(parent_dir) and os.path.isdir(parent_dir):
-                                        file_dir_name = os.path.basename(file_dir)
-                                        found_dir = None
-                                        try:
-                                            for item in os.listdir(parent_dir):
-                                                if item.lower() == file_dir_name.lower():
-                                                    item_path = os.path.join(parent_dir, item)
-                                                    if os.path.isdir(item_path):
-                                                        found_dir = item_path
-                                                        break
-                                        except (OSError, PermissionError):
-                                            pass
-                                        
-                                        if found_dir:
-                                            # Use the existing directory with correct casing
-                                            file_path = os.path.join(found_dir, os.path.basename(file_path))
-                                        else:
-                                            print(f"Error: Cannot create directory {file_dir}. Skipping file.")
-                                            continue
-                                    else:
-                                        print(f"Error: Cannot create directory {file_dir}. Skipping file.")
-                                        continue
-                                with (
-                                    zip_ref.open(file) as source,
-                                    open(file_path, "wb") as target,
-                                ):
-                                    while True:
-                                        chunk = source.read(chunk_size)
-                                        if not chunk:
-                                            break
-                                        target.write(chunk)
-                                        extracted_size += len(chunk)
-                                        self.status.extracted_percent = (
-                                            extracted_size / total_size
-                                        ) * 100
-                            else:
-                                self._reset_download_status(True, True)
-                                os.remove(dest_path)
-                                return
-                    self.status.extracting_rom = False
-                    self.status.downloading_rom = None
-                    os.remove(dest_path)
-                    print(f"Extracted {rom.name} at {os.path.dirname(dest_path)}")
-            except HTTPError as e:
-                if e.code == 403:
-                    self._reset_download_status(valid_host=True)
-                    return
-                else:
-                    raise
-            except URLError:
-                self._reset_download_status(valid_host=True)
+                self.copier.copy(
+                    response,
+                    out_file,
+                    on_progress,
+                    self.status.abort_download.is_set,
+                    checksum,
+                )
+            finally:
+                # Record how far we got so an interrupted download can resume
+                self._save_resume_state(
+                    part_path, rom, out_file, progress.downloaded_bytes, validator
+                )
+        if self.status.abort_download.is_set():
+            return
+        # A connection closed early ends the body without an error; the .part
+        # file and its resume state are kept to continue from there
+        if expected_size is not None and progress.downloaded_bytes < expected_size:
+            raise IncompleteDownload(
+                f"Received {progress.downloaded_bytes} of {expected_size} bytes of {rom.name}"
+            )
+
+        if checksum:
+            progress.state = DownloadState.VERIFYING
+            verified = checksum.matches()
+            progress.verify_seconds = checksum.seconds
+            if not verified:
+                os.remove(part_path)
+                self._clear_resume_state(part_path)
+                raise ChecksumMismatch(f"{checksum.algorithm} mismatch for {rom.name}")
+            print(f"Verified {rom.name} ({checksum.algorithm}) in {checksum.seconds:.2f}s")
+
+        os.replace(part_path, dest_path)
+        self._clear_resume_state(part_path)
+        self.status.valid_host = True
+        self.status.valid_credentials = True
+
+        # Handle multi-file (ZIP) ROMs
+        if rom.has_multiple_files:
+            progress.state = DownloadState.EXTRACTING
+            print("Multi file rom detected. Extracting...")
+            with zipfile.ZipFile(dest_path, "r") as zip_ref:
+                total_size = sum(file.file_size for file in zip_ref.infolist())
+                extracted_size = 0
+
+                def on_extract_progress(n: int) -> None:
+                    nonlocal extracted_size
+                    extracted_size += n
+                    progress.extracted_percent = (extracted_size / (total_size or 1)) * 100
+
+                for file in zip_ref.infolist():
+                    if self.status.abort_download.is_set():
+                        break
+                    file_path = os.path.join(
+                        os.path.dirname(dest_path),
+                        self._sanitize_filename(file.filename),
+                    )
+                    # Fix: Handle case-insensitive filesystems - ensure directory exists
+                    file_dir = self._ensure_dir(os.path.dirname(file_path))
+                    if file_dir is None:
+                        print(f"Error: Cannot create directory {os.path.dirname(file_path)}. Skipping file.")
+                        continue
+                    file_path = os.path.join(file_dir, os.path.basename(file_path))
+                    with (
+                        zip_ref.open(file) as source,
+                        open(file_path, "wb") as target,
+                    ):
+                        self.copier.copy(
+                            source,
+                            target,
+                            on_extract_progress,
+                            self.status.abort_download.is_set,
+                        )
+            os.remove(dest_path)
+            if self.status.abort_download.is_set():
                 return
-        # End of download
-        self._reset_download_status(valid_host=True, valid_credentials=True)
\ No newline at end of file
+            print(f"Extracted {rom.name} at {os.path.dirname(dest_path)}")
+
+        progress.state = DownloadState.DONE
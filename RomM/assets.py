@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image
+
+
+class _Asset:
+    """A decoded image and the file mtime it was decoded at."""
+
+    def __init__(self, mtime: Optional[int], image: Optional[Image.Image]) -> None:
+        self.mtime = mtime
+        self.image = image
+        # Decoded images are RGBA, 4 bytes per pixel
+        self.nbytes = image.width * image.height * 4 if image else 0
+        self.checked_at = time.monotonic()
+
+
+class AssetCache:
+    """In-memory cache of decoded images drawn every frame (icons, logo, avatar).
+
+    Images are decoded once and converted to RGBA so they can be pasted with
+    their own alpha as mask. Entries are keyed by path and revalidated against
+    the file mtime at most once per `revalidate_seconds`. The least recently
+    used entries are evicted once the cache grows past `max_bytes`.
+    """
+
+    _instance: Optional["AssetCache"] = None
+    _initialized: bool = False
+
+    max_bytes = int(os.getenv("ASSET_CACHE_BYTES", str(8 * 1024 * 1024)))
+    revalidate_seconds = 1.0
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(AssetCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        self._assets: OrderedDict[str, _Asset] = OrderedDict()
+        self._bytes = 0
+
+        # Cache counters
+        self.hits = 0
+        self.misses = 0
+        self._initialized = True
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _load(self, path: str, mtime: Optional[int]) -> _Asset:
+        image = None
+        if mtime is not None:
+            try:
+                with Image.open(path) as f:
+                    image = f.convert("RGBA")
+            except (OSError, ValueError) as e:
+                print(f"Error loading image {path}: {e}")
+        return _Asset(mtime, image)
+
+    def _store(self, path: str, asset: _Asset) -> None:
+        previous = self._assets.pop(path, None)
+        if previous:
+            self._bytes -= previous.nbytes
+        self._assets[path] = asset
+        self._bytes += asset.nbytes
+        while self._bytes > self.max_bytes and len(self._assets) > 1:
+            _path, evicted = self._assets.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def get(self, path: str) -> Optional[Image.Image]:
+        """Return the decoded RGBA image at `path`, or None if it can't be read."""
+        now = time.monotonic()
+        with self._lock:
+            asset = self._assets.get(path)
+            if asset and now - asset.checked_at < self.revalidate_seconds:
+                self._assets.move_to_end(path)
+                self.hits += 1
+                return asset.image
+
+        try:
+            mtime: Optional[int] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with self._lock:
+            if asset and asset.mtime == mtime:
+                asset.checked_at = now
+                self._assets.move_to_end(path)
+                self.hits += 1
+                return asset.image
+            self.misses += 1
+
+        asset = self._load(path, mtime)
+        with self._lock:
+            self._store(path, asset)
+        return asset.image
+
+    def invalidate(self, path: str) -> None:
+        """Forget the image at `path`, so the next `get` reads the file again.
+
+        Called when a file has just been written, which a cached miss or an
+        mtime checked less than `revalidate_seconds` ago would not notice.
+        """
+        with self._lock:
+            asset = self._assets.pop(path, None)
+            if asset:
+                self._bytes -= asset.nbytes
+
+    def stats(self) -> dict[str, int | float]:
+        """Return the hit/miss counters and the memory used by decoded images."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._assets),
+                "bytes": self._bytes,
+            }
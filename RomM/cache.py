@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Iterable, Iterator, Optional
+
+from jsonstream import JsonItemStream
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class CachedItems:
+    """A list stored in the cache, decoded from disk an item at a time each
+    time it is iterated rather than loaded whole.
+
+    Once iterated, `fields` holds the members stored with the items and
+    `valid` tells whether the entry could be read to the end.
+    """
+
+    def __init__(self, path: str, key: str) -> None:
+        self._path = path
+        self._key = key
+        self.fields: dict[str, Any] = {}
+        self.valid = False
+
+    def __iter__(self) -> Iterator[dict]:
+        self.valid = False
+        try:
+            with open(self._path, "rb") as f:
+                stream = JsonItemStream(f)
+                for item in stream:
+                    # The key is stored ahead of the items
+                    if stream.fields.get("key") != self._key:
+                        return
+                    yield item
+                self.fields = stream.fields
+                self.valid = stream.fields.get("key") == self._key
+        except (OSError, ValueError) as e:
+            print(f"Error reading catalog cache for {self._key}: {e}")
+
+
+class CacheItemsWriter:
+    """Writes a list to the cache as its items come in, see
+    `CatalogCache.items_writer`.
+
+    The entry replaces the previous one on `commit`; leaving the `with`
+    block without committing discards it.
+    """
+
+    def __init__(self, cache: "CatalogCache", key: str, path: str) -> None:
+        self._cache = cache
+        self._key = key
+        self._path = path
+        self._tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        self._file = None
+        self._count = 0
+        try:
+            self._file = open(self._tmp_path, "w", encoding="utf-8")
+            self._file.write(
+                f'{{"key":{_encode(key)},"stored_at":{_encode(time.time())},"items":['
+            )
+        except OSError as e:
+            self._fail(e)
+
+    def __enter__(self) -> "CacheItemsWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _fail(self, error: OSError) -> None:
+        print(f"Error writing catalog cache for {self._key}: {error}")
+        self.__exit__()
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def write(self, items: Iterable[dict]) -> None:
+        """Append items to the list."""
+        if self._file is None:
+            return
+        try:
+            for item in items:
+                self._file.write(f",{_encode(item)}" if self._count else _encode(item))
+                self._count += 1
+        except OSError as e:
+            self._fail(e)
+
+    def commit(self, **fields: Any) -> None:
+        """Store `fields` after the items and replace the previous entry."""
+        if self._file is None:
+            return
+        try:
+            self._file.write("]")
+            for name, value in fields.items():
+                self._file.write(f",{_encode(name)}:{_encode(value)}")
+            self._file.write("}")
+            self._file.close()
+            self._file = None
+            self._cache._replace(self._tmp_path, self._path)
+        except OSError as e:
+            self._fail(e)
+
+
+class CatalogCache:
+    """On-disk cache of catalog API responses, keyed by endpoint and query.
+
+    Each entry stores the decoded JSON payload together with the ETag and
+    Last-Modified headers the server sent, so it can be revalidated with a
+    conditional request. Long lists, such as ROM lists, are written and read
+    an item at a time through `items_writer` and `get_items`. The cache is
+    kept under `max_bytes` and `max_entries`, dropping the least recently
+    used entries first; an entry's mtime is its last use.
+    """
+
+    _instance: Optional["CatalogCache"] = None
+    _initialized: bool = False
+
+    cache_path = os.path.join(os.getcwd(), "cache")
+    max_bytes = int(os.getenv("CATALOG_CACHE_BYTES", str(32 * 1024 * 1024)))
+    max_entries = int(os.getenv("CATALOG_CACHE_ENTRIES", "200"))
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(CatalogCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_path, exist_ok=True)
+        self._initialized = True
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _entry_path(self, key: str, suffix: str = ".json") -> str:
+        digest = hashlib.sha1(key.encode("utf-8"), usedforsecurity=False).hexdigest()
+        return os.path.join(self.cache_path, f"{digest}{suffix}")
+
+    def _replace(self, tmp_path: str, path: str) -> None:
+        with self._lock:
+            os.replace(tmp_path, path)
+            self._prune(keep=path)
+
+    def _prune(self, keep: str) -> None:
+        """Remove the least recently used entries beyond the size and count caps."""
+        entries = []
+        try:
+            with os.scandir(self.cache_path) as it:
+                for entry in it:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError as e:
+            print(f"Error scanning catalog cache: {e}")
+            return
+
+        total = sum(size for _mtime, size, _path in entries)
+        count = len(entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            count -= 1
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        """Return the cached entry for a key, or None if missing or unreadable."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key:
+            return None
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(
+        self,
+        key: str,
+        data: Any,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Store a payload and its validators, replacing any previous entry."""
+        entry = {
+            "key": key,
+            "stored_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "data": data,
+        }
+        path = self._entry_path(key)
+        with self._lock:
+            try:
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(entry, f, separators=(",", ":"))
+                os.replace(f"{path}.tmp", path)
+            except OSError as e:
+                print(f"Error writing catalog cache for {key}: {e}")
+                return
+            self._prune(keep=path)
+
+    def get_items(self, key: str) -> Optional[CachedItems]:
+        """Return the list cached for a key, or None if missing."""
+        path = self._entry_path(key, ".items.json")
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return CachedItems(path, key)
+
+    def items_writer(self, key: str) -> CacheItemsWriter:
+        """Return a writer storing a list for a key an item at a time, so
+        a long list is never held in memory to be cached."""
+        return CacheItemsWriter(self, key, self._entry_path(key, ".items.json"))
+
+    def conditional_headers(self, entry: Optional[dict[str, Any]]) -> dict[str, str]:
+        """Return the revalidation headers for a cached entry."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
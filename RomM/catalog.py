@@ -0,0 +1,515 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import weakref
+from collections.abc import Sequence
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from models import Collection, Platform, Rom
+from status import View
+
+_FS_SIZE = Rom._fields.index("fs_size")
+# ROMs written per batch of statements
+_WRITE_BATCH = 500
+_encode_rom = json.JSONEncoder(separators=(",", ":"), check_circular=False).encode
+
+_SCHEMA = """
+CREATE TABLE platforms (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    rom_count INTEGER NOT NULL
+);
+CREATE INDEX platforms_slug ON platforms (slug);
+
+CREATE TABLE collections (
+    id TEXT NOT NULL,
+    virtual INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    rom_count INTEGER NOT NULL,
+    PRIMARY KEY (virtual, id)
+);
+
+CREATE TABLE roms (
+    id INTEGER PRIMARY KEY,
+    platform_id INTEGER,
+    platform_slug TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    fs_name TEXT NOT NULL,
+    has_multiple_files INTEGER NOT NULL,
+    -- Whether the ROM is on the device, see `Catalog.update_presence`
+    present INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX roms_platform ON roms (platform_id, name);
+CREATE INDEX roms_name ON roms (name);
+CREATE INDEX roms_present ON roms (present, name);
+
+CREATE TABLE rom_regions (
+    rom_id INTEGER NOT NULL,
+    region TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (rom_id, region)
+) WITHOUT ROWID;
+CREATE INDEX rom_regions_region ON rom_regions (region);
+
+CREATE TABLE rom_languages (
+    rom_id INTEGER NOT NULL,
+    language TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (rom_id, language)
+) WITHOUT ROWID;
+CREATE INDEX rom_languages_language ON rom_languages (language);
+
+-- Every fetch of a ROM list (platform, collection or virtual collection)
+-- gets a new generation, so the ones still on screen stay readable
+CREATE TABLE lists (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL
+);
+CREATE INDEX lists_key ON lists (key, id);
+
+CREATE TABLE list_roms (
+    list_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    rom_id INTEGER NOT NULL,
+    PRIMARY KEY (list_id, position)
+) WITHOUT ROWID;
+CREATE INDEX list_roms_rom ON list_roms (rom_id, list_id);
+"""
+
+
+def list_key(view: str, id: int | str) -> str:
+    """Return the key the ROM list of a platform or collection is stored under."""
+    return f"{view}:{id}"
+
+
+def _load_rom(data: str) -> Rom:
+    values = json.loads(data)
+    values[_FS_SIZE] = tuple(values[_FS_SIZE])
+    return Rom._make(values)
+
+
+class CatalogRoms(Sequence):
+    """ROMs of a catalog query, read a page at a time with LIMIT/OFFSET.
+
+    Behaves like a read-only list of `Rom`, so it can stand in for the ones
+    the views page through; only the pages read recently are kept in memory.
+    """
+
+    _page_size = 64
+    _max_pages = 4
+
+    def __init__(
+        self,
+        catalog: "Catalog",
+        joins: str,
+        where: list[str],
+        params: list[Any],
+        order_by: str,
+        list_id: Optional[int] = None,
+    ) -> None:
+        self._catalog = catalog
+        self._joins = joins
+        self._where = where
+        self._params = params
+        self._order_by = order_by
+        # The list generation the query reads, if any
+        self.list_id = list_id
+        # A whole list generation: positions run from 0 without gaps, so
+        # pages are read by position rather than skipping rows with OFFSET
+        self._dense = list_id is not None and len(where) == 1
+        self._len: Optional[int] = None
+        self._pages: dict[int, list[Rom]] = {}
+        if list_id is not None:
+            catalog._readers.add(self)
+
+    def __len__(self) -> int:
+        if self._len is None and self._dense:
+            self._len = self._catalog._query_one(
+                "SELECT COUNT(*) FROM list_roms WHERE list_id = ?", [self.list_id]
+            )[0]
+        elif self._len is None:
+            self._len = self._catalog._query_one(
+                f"SELECT COUNT(*) FROM roms r {self._joins}{self._where_sql()}",
+                self._params,
+            )[0]
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # A range with explicit bounds doesn't need the length, which
+            # takes a scan of every match to count
+            if (
+                index.step in (None, 1)
+                and (index.start or 0) >= 0
+                and index.stop is not None
+                and index.stop >= 0
+            ):
+                return self._slice(index.start or 0, index.stop)
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._slice(start, stop)
+
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("ROM index out of range")
+        page_index, offset = divmod(index, self._page_size)
+        page = self._page(page_index)
+        if offset >= len(page):
+            raise IndexError("ROM index out of range")
+        return page[offset]
+
+    def __iter__(self) -> Iterator[Rom]:
+        for start in range(0, len(self), self._page_size):
+            yield from self._read(start, self._page_size)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _where_sql(self) -> str:
+        return f" WHERE {' AND '.join(self._where)}" if self._where else ""
+
+    def _page(self, page_index: int) -> list[Rom]:
+        page = self._pages.get(page_index)
+        if page is None:
+            page = self._read(page_index * self._page_size, self._page_size)
+            if len(self._pages) >= self._max_pages:
+                self._pages.clear()
+            self._pages[page_index] = page
+        return page
+
+    def _slice(self, start: int, stop: int) -> list[Rom]:
+        # Assembled from the cached pages, the views ask for the same
+        # rows on every frame
+        roms: list[Rom] = []
+        while start < stop:
+            page_index, offset = divmod(start, self._page_size)
+            page = self._page(page_index)
+            roms.extend(page[offset : offset + stop - start])
+            if len(page) < self._page_size:
+                break
+            start = (page_index + 1) * self._page_size
+        return roms
+
+    def _read(self, offset: int, limit: int) -> list[Rom]:
+        if self._dense:
+            rows = self._catalog._query(
+                "SELECT r.data FROM list_roms l JOIN roms r ON r.id = l.rom_id"
+                " WHERE l.list_id = ? AND l.position >= ? AND l.position < ?"
+                " ORDER BY l.position",
+                [self.list_id, offset, offset + limit],
+            )
+            return [_load_rom(data) for (data,) in rows]
+        rows = self._catalog._query(
+            f"SELECT r.data FROM roms r {self._joins}{self._where_sql()} "
+            f"ORDER BY {self._order_by} LIMIT ? OFFSET ?",
+            [*self._params, limit, offset],
+        )
+        return [_load_rom(data) for (data,) in rows]
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def index_of(self, rom_id: int) -> Optional[int]:
+        """Return the position of a ROM in a list generation, or None if absent."""
+        if self.list_id is None:
+            return next((i for i, rom in enumerate(self) if rom.id == rom_id), None)
+        row = self._catalog._query_one(
+            f"SELECT l.position FROM roms r {self._joins}{self._where_sql()} AND r.id = ?",
+            [*self._params, rom_id],
+        )
+        if row is None or self._dense:
+            return None if row is None else row[0]
+        # The rows before it that match the query
+        return self._catalog._query_one(
+            f"SELECT COUNT(*) FROM roms r {self._joins}{self._where_sql()} AND l.position < ?",
+            [*self._params, row[0]],
+        )[0]
+
+    def where_present(self, present: bool) -> "CatalogRoms":
+        """Return the same query limited to the ROMs on (or not on) the device."""
+        return CatalogRoms(
+            self._catalog,
+            self._joins,
+            [*self._where, "r.present = ?"],
+            [*self._params, int(present)],
+            self._order_by,
+            self.list_id,
+        )
+
+
+class Catalog:
+    """Local SQLite catalog of the platforms, collections and ROM lists fetched
+    this session.
+
+    ROM lists are stored as they are fetched and read back a page at a time
+    through `CatalogRoms`, so a list of tens of thousands of ROMs is never
+    held in memory; the indexes on platform, name, region, language and
+    presence keep queries across lists fast. The database is rebuilt on every
+    start, the `CatalogCache` remains the copy kept between sessions.
+    """
+
+    _instance: Optional["Catalog"] = None
+    _initialized: bool = False
+
+    db_path = os.path.join(os.getcwd(), "cache", "catalog.db")
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(Catalog, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        # Lists read by the generations they were opened on; the published
+        # ROM list and the filtered views of it keep theirs from being dropped
+        self._readers: weakref.WeakSet[CatalogRoms] = weakref.WeakSet()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        for suffix in ("", "-journal"):
+            try:
+                os.remove(self.db_path + suffix)
+            except FileNotFoundError:
+                pass
+        self._db = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None
+        )
+        # Rebuilt from the server on every start, durability is not needed
+        self._db.execute("PRAGMA journal_mode = MEMORY")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.executescript(_SCHEMA)
+        self._initialized = True
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _query(self, sql: str, params: Iterable[Any] = ()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, list(params)).fetchall()
+
+    def _query_one(self, sql: str, params: Iterable[Any] = ()) -> Optional[tuple]:
+        with self._lock:
+            return self._db.execute(sql, list(params)).fetchone()
+
+    def _delete_lists(self, list_ids: list[int]) -> None:
+        """Drop list generations and the ROMs no list refers to anymore."""
+        marks = ",".join("?" * len(list_ids))
+        self._db.execute(f"DELETE FROM list_roms WHERE list_id IN ({marks})", list_ids)
+        self._db.execute(f"DELETE FROM lists WHERE id IN ({marks})", list_ids)
+        orphans = "SELECT id FROM roms WHERE id NOT IN (SELECT rom_id FROM list_roms)"
+        self._db.execute(f"DELETE FROM rom_regions WHERE rom_id IN ({orphans})")
+        self._db.execute(f"DELETE FROM rom_languages WHERE rom_id IN ({orphans})")
+        self._db.execute(f"DELETE FROM roms WHERE id IN ({orphans})")
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def replace_platforms(self, platforms: list[Platform]) -> None:
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM platforms")
+            self._db.executemany(
+                "INSERT INTO platforms (id, slug, display_name, rom_count) VALUES (?, ?, ?, ?)",
+                [(p.id, p.slug, p.display_name, p.rom_count) for p in platforms],
+            )
+
+    def replace_collections(self, collections: list[Collection]) -> None:
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM collections")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO collections (id, virtual, name, rom_count) VALUES (?, ?, ?, ?)",
+                [(str(c.id), int(c.virtual), c.name, c.rom_count) for c in collections],
+            )
+
+    def new_list(self, key: str) -> int:
+        """Start a new, empty generation of a ROM list and return its ID."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            list_id = self._db.execute(
+                "INSERT INTO lists (key) VALUES (?)", [key]
+            ).lastrowid
+            # Older generations go as soon as nothing reads them anymore
+            read = {roms.list_id for roms in list(self._readers)}
+            old = [
+                id
+                for (id,) in self._db.execute(
+                    "SELECT id FROM lists WHERE key = ? AND id < ?", [key, list_id]
+                )
+                if id not in read
+            ]
+            if old:
+                self._delete_lists(old)
+        return list_id
+
+    def append_roms(self, list_id: int, roms: Iterable[Rom]) -> None:
+        """Add ROMs at the end of a list generation, updating the stored ROMs.
+
+        Does nothing if the generation was dropped, as happens to one still
+        being fetched when a newer fetch of the same list starts.
+        """
+        roms = iter(roms)
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            if not self._db.execute("SELECT 1 FROM lists WHERE id = ?", [list_id]).fetchone():
+                return
+            (position,) = self._db.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM list_roms WHERE list_id = ?",
+                [list_id],
+            ).fetchone()
+            while batch := list(itertools.islice(roms, _WRITE_BATCH)):
+                self._db.executemany(
+                    "INSERT INTO list_roms (list_id, position, rom_id) VALUES (?, ?, ?)",
+                    [(list_id, position + i, rom.id) for i, rom in enumerate(batch)],
+                )
+                position += len(batch)
+
+                # Lists are fetched again and again, only write the ROMs that changed
+                encoded = {rom.id: _encode_rom(rom) for rom in batch}
+                stored = dict(
+                    self._db.execute(
+                        f"SELECT id, data FROM roms WHERE id IN ({','.join('?' * len(encoded))})",
+                        list(encoded),
+                    )
+                )
+                batch = [rom for rom in batch if stored.get(rom.id) != encoded[rom.id]]
+                if not batch:
+                    continue
+                ids = [(rom.id,) for rom in batch]
+                self._db.executemany(
+                    "INSERT INTO roms (id, platform_id, platform_slug, name, fs_name,"
+                    " has_multiple_files, data) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (id) DO UPDATE SET platform_id = excluded.platform_id,"
+                    " platform_slug = excluded.platform_slug, name = excluded.name,"
+                    " fs_name = excluded.fs_name,"
+                    " has_multiple_files = excluded.has_multiple_files, data = excluded.data",
+                    [
+                        (
+                            rom.id,
+                            rom.platform_id,
+                            rom.platform_slug,
+                            rom.name or "",
+                            rom.fs_name,
+                            int(bool(rom.has_multiple_files)),
+                            encoded[rom.id],
+                        )
+                        for rom in batch
+                    ],
+                )
+                self._db.executemany("DELETE FROM rom_regions WHERE rom_id = ?", ids)
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO rom_regions (rom_id, region) VALUES (?, ?)",
+                    [(rom.id, region) for rom in batch for region in rom.regions or ()],
+                )
+                self._db.executemany("DELETE FROM rom_languages WHERE rom_id = ?", ids)
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO rom_languages (rom_id, language) VALUES (?, ?)",
+                    [(rom.id, language) for rom in batch for language in rom.languages or ()],
+                )
+
+    def list_roms(self, list_id: int) -> CatalogRoms:
+        """Return the ROMs of a list generation, in the order they were added."""
+        return CatalogRoms(
+            self,
+            "JOIN list_roms l ON l.rom_id = r.id",
+            ["l.list_id = ?"],
+            [list_id],
+            "l.position",
+            list_id,
+        )
+
+    def update_presence(
+        self, list_id: int, is_present: Callable[[str, str, bool], bool]
+    ) -> int:
+        """Refresh the presence flag of the ROMs of a list generation.
+
+        `is_present` is called with the platform slug, file name and
+        multi-file flag of each ROM. Returns how many flags changed.
+        """
+        rows = self._query(
+            "SELECT r.id, r.platform_slug, r.fs_name, r.has_multiple_files, r.present"
+            " FROM roms r JOIN list_roms l ON l.rom_id = r.id WHERE l.list_id = ?",
+            [list_id],
+        )
+        changed = []
+        for id, platform_slug, fs_name, multi, was_present in rows:
+            present = is_present(platform_slug, fs_name, bool(multi))
+            if present != bool(was_present):
+                changed.append((int(present), id))
+        if changed:
+            with self._lock, self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany("UPDATE roms SET present = ? WHERE id = ?", changed)
+        return len(changed)
+
+    def find_roms(
+        self,
+        name: Optional[str] = None,
+        platform_id: Optional[int] = None,
+        collection: Optional[Collection] = None,
+        region: Optional[str] = None,
+        language: Optional[str] = None,
+        present: Optional[bool] = None,
+    ) -> CatalogRoms:
+        """Query the ROMs of every list fetched this session, sorted by name.
+
+        `name` matches the start of the name, `collection` the last fetched
+        list of that collection; regions and languages match case-insensitively.
+        """
+        where = []
+        params: list[Any] = []
+        if collection is not None:
+            view = View.VIRTUAL_COLLECTIONS if collection.virtual else View.COLLECTIONS
+            where.append(
+                "r.id IN (SELECT rom_id FROM list_roms WHERE list_id ="
+                " (SELECT MAX(id) FROM lists WHERE key = ?))"
+            )
+            params.append(list_key(view, collection.id))
+        # Probed per ROM, so a page sorted by name stops at its last row
+        # instead of sorting every match
+        if region is not None:
+            where.append(
+                "EXISTS (SELECT 1 FROM rom_regions WHERE rom_id = r.id AND region = ?)"
+            )
+            params.append(region)
+        if language is not None:
+            where.append(
+                "EXISTS (SELECT 1 FROM rom_languages WHERE rom_id = r.id AND language = ?)"
+            )
+            params.append(language)
+        if name:
+            # Range on the NOCASE index rather than LIKE, which can't use it
+            where.append("r.name >= ? AND r.name < ?")
+            params.extend((name, name + "\U0010ffff"))
+        if platform_id is not None:
+            where.append("r.platform_id = ?")
+            params.append(platform_id)
+        if present is not None:
+            where.append("r.present = ?")
+            params.append(int(present))
+        return CatalogRoms(self, "", where, params, "r.name, r.id")
+
+    def stats(self) -> dict[str, int]:
+        """Return the row counts of the catalog."""
+        with self._lock:
+            return {
+                table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("platforms", "collections", "roms", "lists", "list_roms")
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,75 @@
+import hashlib
+import time
+import zlib
+from typing import Optional
+
+from models import Rom
+
+
+class ChecksumMismatch(ValueError):
+    """The downloaded data doesn't match the hash reported by the server."""
+
+
+class _Crc32:
+    def __init__(self) -> None:
+        self._crc = 0
+
+    def update(self, data) -> None:
+        self._crc = zlib.crc32(data, self._crc)
+
+    def hexdigest(self) -> str:
+        return f"{self._crc:08x}"
+
+
+class RomChecksum:
+    """Incremental hash of a ROM file, checked against the server's value.
+
+    Uses the strongest hash the server knows for the ROM (SHA-1, then MD5,
+    then CRC-32) and keeps track of the time spent hashing.
+    """
+
+    _read_size = 1024 * 1024
+
+    def __init__(self, algorithm: str, expected: str) -> None:
+        self.algorithm = algorithm
+        self.expected = expected.lower()
+        self.seconds = 0.0
+        self.reset()
+
+    @classmethod
+    def for_rom(cls, rom: Rom) -> Optional["RomChecksum"]:
+        """Return a checksum for the ROM, or None if the server has no hash."""
+        if rom.sha1_hash:
+            return cls("sha1", rom.sha1_hash)
+        if rom.md5_hash:
+            return cls("md5", rom.md5_hash)
+        if rom.crc_hash:
+            return cls("crc32", rom.crc_hash.zfill(8))
+        return None
+
+    def reset(self) -> None:
+        if self.algorithm == "crc32":
+            self._hash = _Crc32()
+        else:
+            self._hash = hashlib.new(self.algorithm, usedforsecurity=False)
+
+    def update(self, data) -> None:
+        started = time.monotonic()
+        self._hash.update(data)
+        self.seconds += time.monotonic() - started
+
+    def update_from_file(self, path: str, length: int) -> None:
+        """Hash the first `length` bytes of a file, e.g. a resumed partial download."""
+        with open(path, "rb") as f:
+            while length > 0:
+                data = f.read(min(self._read_size, length))
+                if not data:
+                    break
+                self.update(data)
+                length -= len(data)
+
+    def matches(self) -> bool:
+        started = time.monotonic()
+        digest = self._hash.hexdigest()
+        self.seconds += time.monotonic() - started
+        return digest == self.expected
@@ -1,10 +1,24 @@
 import os
+import threading
+import time
 from typing import Optional
 
 import platform_maps
 from models import Rom
 
 
+class _DirectoryListing:
+    """Names found in a platform directory, and the mtime they were read at."""
+
+    def __init__(self, mtime: Optional[int], names: set[str]) -> None:
+        self.mtime = mtime
+        self.names = names
+        # Case-folded names, for FAT and exFAT cards that match names
+        # regardless of case
+        self.folded_names = {name.casefold() for name in names}
+        self.checked_at = time.monotonic()
+
+
 class Filesystem:
     _instance: Optional["Filesystem"] = None
 
@@ -18,6 +32,14 @@ class Filesystem:
     # Resources path: Use current working directory + "resources"
     resources_path = os.path.join(os.getcwd(), "resources")
 
+    # Presence index of the platform directories, keyed by path
+    _listings: dict[str, _DirectoryListing] = {}
+    _listings_lock = threading.Lock()
+    # Minimum time between two mtime checks of a platform directory
+    _listing_revalidate_seconds = 1.0
+    # Bumped whenever the set of ROMs on the device may have changed
+    storage_version = 0
+
     def __new__(cls):
         if not cls._instance:
             cls._instance = super(Filesystem, cls).__new__(cls)
@@ -87,6 +109,47 @@ class Filesystem:
             return os.path.join(self._sd2_roms_storage_path, platforms_dir)
         return None
 
+    def _get_directory_listing(self, path: str) -> _DirectoryListing:
+        """Return the entry names of a directory from the presence index.
+
+        The directory is scanned again only when its mtime changed, and the
+        mtime itself is checked at most once per `_listing_revalidate_seconds`.
+        """
+        listing = self._listings.get(path)
+        now = time.monotonic()
+        if listing and now - listing.checked_at < self._listing_revalidate_seconds:
+            return listing
+
+        try:
+            mtime: Optional[int] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if listing and listing.mtime == mtime:
+            listing.checked_at = now
+            return listing
+
+        names: set[str] = set()
+        if mtime is not None:
+            try:
+                with os.scandir(path) as entries:
+                    names = {entry.name for entry in entries}
+            except OSError as e:
+                print(f"Error scanning {path}: {e}")
+
+        previous, listing = listing, _DirectoryListing(mtime, names)
+        with self._listings_lock:
+            self._listings[path] = listing
+            if previous is not None and previous.names != names:
+                self.storage_version += 1
+        return listing
+
+    @staticmethod
+    def _get_entry_name(fs_name: str, has_multiple_files: bool) -> str:
+        return fs_name if not has_multiple_files else f"{fs_name}.m3u"
+
+    def _get_rom_entry_name(self, rom: Rom) -> str:
+        return self._get_entry_name(rom.fs_name, rom.has_multiple_files)
+
     ###
     # PUBLIC METHODS
     ###
@@ -97,6 +160,7 @@ class Filesystem:
             self._current_sd = 2
         else:
             self._current_sd = 1
+        self.storage_version += 1
 
     def get_roms_storage_path(self) -> str:
         """Return the current SD storage path."""
@@ -116,8 +180,40 @@ class Filesystem:
 
     def is_rom_in_device(self, rom: Rom) -> bool:
         """Check if a ROM exists in the storage path."""
-        rom_path = os.path.join(
-            self.get_platforms_storage_path(rom.platform_slug),
-            rom.fs_name if not rom.multi else f"{rom.fs_name}.m3u",
+        return self.is_rom_file_in_device(
+            rom.platform_slug, rom.fs_name, rom.has_multiple_files
         )
-        return os.path.exists(rom_path)
+
+    def is_rom_file_in_device(
+        self, platform_slug: str, fs_name: str, has_multiple_files: bool
+    ) -> bool:
+        """Check if a ROM exists in the storage path, from the fields that name
+        its file."""
+        storage_path = self.get_platforms_storage_path(platform_slug)
+        entry_name = self._get_entry_name(fs_name, has_multiple_files)
+        if os.sep in entry_name:
+            return os.path.exists(os.path.join(storage_path, entry_name))
+        listing = self._get_directory_listing(storage_path)
+        if entry_name in listing.names:
+            return True
+        # Only a name differing in case is left, which case-insensitive
+        # filesystems resolve and case-sensitive ones don't
+        if entry_name.casefold() in listing.folded_names:
+            return os.path.exists(os.path.join(storage_path, entry_name))
+        return False
+
+    def mark_rom_presence(self, rom: Rom, present: bool) -> None:
+        """Record a ROM that was just downloaded or removed in the presence index."""
+        storage_path = self.get_platforms_storage_path(rom.platform_slug)
+        entry_name = self._get_rom_entry_name(rom)
+        with self._listings_lock:
+            listing = self._listings.get(storage_path)
+            if listing is not None:
+                if present:
+                    listing.names.add(entry_name)
+                    listing.folded_names.add(entry_name.casefold())
+                else:
+                    # The folded name may stand for another entry too, and
+                    # a match on it is confirmed on disk anyway
+                    listing.names.discard(entry_name)
+            self.storage_version += 1
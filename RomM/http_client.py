@@ -0,0 +1,414 @@
+import http.client
+import io
+import os
+import re
+import ssl
+import sys
+import threading
+import time
+import zlib
+from typing import Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request
+
+# Errors raised when a kept-alive connection was closed by the server while idle
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# Raw body bytes read at once when decoding a compressed response
+_DECODE_READ_SIZE = 64 * 1024
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class _HostPool:
+    """Idle connections and connection slots for a single scheme/host/port."""
+
+    def __init__(self, max_connections: int) -> None:
+        self.idle: list[tuple[http.client.HTTPConnection, float]] = []
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.tls_session: Optional[ssl.SSLSession] = None
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection that resumes the TLS session shared by its host pool."""
+
+    def __init__(self, host: str, port: int, timeout, context, pool: _HostPool):
+        super().__init__(host, port, timeout=timeout, context=context)
+        self._pool = pool
+        self.session_reused = False
+
+    def connect(self) -> None:
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self._context.wrap_socket(
+            self.sock, server_hostname=server_hostname, session=self._pool.tls_session
+        )
+        self.session_reused = self.sock.session_reused
+        self._pool.tls_session = self.sock.session
+
+
+class _ContentDecoder:
+    """Streaming decoder of gzip and deflate response bodies."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        # Some servers send raw deflate data instead of a zlib stream
+        self._raw_fallback = encoding == "deflate"
+        self._started = False
+        self._decompressor = self._new_decompressor()
+
+    @staticmethod
+    def _new_decompressor(wbits: int = 32 + zlib.MAX_WBITS):
+        # 32 + MAX_WBITS accepts both gzip and zlib headers
+        return zlib.decompressobj(wbits)
+
+    def decompress(self, data: bytes) -> bytes:
+        try:
+            output = self._decompressor.decompress(data)
+        except zlib.error:
+            if self._started or not self._raw_fallback:
+                raise
+            self._decompressor = self._new_decompressor(-zlib.MAX_WBITS)
+            output = self._decompressor.decompress(data)
+        self._started = True
+        # A gzip body may be made of several members
+        while self._decompressor.eof and self._decompressor.unused_data:
+            rest = self._decompressor.unused_data
+            self._decompressor = self._new_decompressor()
+            output += self._decompressor.decompress(rest)
+        return output
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+class PooledResponse:
+    """Response wrapper that hands its connection back to the pool once the body
+    has been fully read, or discards it when closed early.
+
+    gzip and deflate bodies are decompressed as they are read. When
+    `track_transfer` is set, the body bytes received and decoded are added to
+    the client's per-endpoint counters.
+    """
+
+    def __init__(
+        self,
+        client: "HttpClient",
+        pool: _HostPool,
+        conn: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        url: str,
+        track_transfer: bool = False,
+    ) -> None:
+        self._client = client
+        self._pool = pool
+        self._conn: Optional[http.client.HTTPConnection] = conn
+        self._response = response
+        self.url = url
+
+        encoding = (response.getheader("Content-Encoding") or "").strip().lower()
+        self._decoder = (
+            _ContentDecoder(encoding) if encoding in ("gzip", "x-gzip", "deflate") else None
+        )
+        self._decoded = bytearray()
+        self._decoded_eof = False
+        self._track_transfer = track_transfer
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+    @property
+    def status(self) -> int:
+        return self._response.status
+
+    @property
+    def reason(self) -> str:
+        return self._response.reason
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._response.getheader(name, default)
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        if self._decoder is not None:
+            data = self._read_decoded(amt)
+        else:
+            data = self._response.read(amt)
+            self.wire_bytes += len(data)
+            self.decoded_bytes += len(data)
+        if self._response.isclosed():
+            self._finish()
+        return data
+
+    def readinto(self, buffer) -> int:
+        if self._decoder is not None:
+            data = self._read_decoded(len(buffer))
+            n = len(data)
+            buffer[:n] = data
+        else:
+            n = self._response.readinto(buffer)
+            self.wire_bytes += n
+            self.decoded_bytes += n
+        if self._response.isclosed():
+            self._finish()
+        return n
+
+    def _read_decoded(self, amt: Optional[int]) -> bytes:
+        decoded = self._decoded
+        while not self._decoded_eof and (amt is None or len(decoded) < amt):
+            data = self._response.read(_DECODE_READ_SIZE)
+            self.wire_bytes += len(data)
+            try:
+                output = self._decoder.decompress(data) if data else self._decoder.flush()
+            except zlib.error as e:
+                raise URLError(f"Invalid {self._decoder.encoding} body from {self.url}: {e}")
+            self._decoded_eof = not data
+            self.decoded_bytes += len(output)
+            decoded += output
+
+        n = len(decoded) if amt is None else min(amt, len(decoded))
+        data = bytes(decoded[:n])
+        del decoded[:n]
+        return data
+
+    def close(self) -> None:
+        self._finish()
+        self._response.close()
+
+    def _finish(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        if self._track_transfer:
+            self._client._record_transfer(self.url, self.wire_bytes, self.decoded_bytes)
+        if (
+            self._response.isclosed()
+            and not self._response.will_close
+            and conn.sock is not None
+        ):
+            self._client._release(self._pool, conn)
+        else:
+            conn.close()
+            self._client._discard(self._pool)
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self._finish()
+
+
+class HttpClient:
+    """Shared HTTP/1.1 client keeping connections (and TLS sessions) alive per host.
+
+    `urlopen` mirrors `urllib.request.urlopen` for GET requests: it follows
+    redirects and raises `HTTPError`/`URLError`, but responses with a status
+    below 400 (including 304) are returned to the caller.
+    """
+
+    _instance: Optional["HttpClient"] = None
+    _initialized: bool = False
+
+    max_connections_per_host = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "4"))
+    idle_timeout = 30.0
+    max_redirects = 5
+    user_agent = f"Python-urllib/{sys.version_info[0]}.{sys.version_info[1]}"
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(HttpClient, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        self._pools: dict[tuple[str, str, int], _HostPool] = {}
+        self._ssl_context = ssl.create_default_context()
+
+        # Pool counters
+        self.hits = 0
+        self.misses = 0
+        self.retries = 0
+        self.tls_resumed = 0
+        # Body bytes received and decoded per endpoint, for compressed requests
+        self._transfers: dict[str, dict[str, int]] = {}
+        self._initialized = True
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def urlopen(self, request: Request, timeout: Optional[float] = None) -> PooledResponse:
+        """Send the request through the pool and return the response."""
+        for _ in range(self.max_redirects + 1):
+            response = self._send(request, timeout)
+            location = response.getheader("Location")
+            if response.status in _REDIRECT_CODES and location:
+                response.close()
+                request = Request(
+                    urljoin(request.full_url, location),
+                    headers=dict(request.header_items()),
+                )
+                continue
+            if response.status >= 400:
+                body = response.read()
+                raise HTTPError(
+                    request.full_url,
+                    response.status,
+                    response.reason,
+                    response.headers,
+                    io.BytesIO(body),
+                )
+            return response
+
+        raise URLError(f"Too many redirects for {request.full_url}")
+
+    def stats(self) -> dict[str, int]:
+        """Return the pool hit/miss counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "retries": self.retries,
+                "tls_resumed": self.tls_resumed,
+                "idle": sum(len(pool.idle) for pool in self._pools.values()),
+            }
+
+    def transfer_stats(self) -> dict[str, dict[str, int]]:
+        """Return the body bytes received ("wire") and decoded per endpoint.
+
+        Only requests sent with an Accept-Encoding header are counted.
+        """
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._transfers.items()}
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            for pool in self._pools.values():
+                for conn, _released_at in pool.idle:
+                    conn.close()
+                pool.idle = []
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _send(self, request: Request, timeout: Optional[float]) -> PooledResponse:
+        parts = urlsplit(request.full_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise URLError(f"unknown url type: {request.full_url}")
+
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        headers = {"User-agent": self.user_agent, **dict(request.header_items())}
+
+        pool = self._get_pool(parts.scheme, parts.hostname, port)
+        # Long downloads may hold every connection, give up after the request
+        # timeout rather than waiting for one of them to finish
+        if not pool.slots.acquire(timeout=timeout):
+            raise URLError(f"No connection to {parts.hostname} free within {timeout}s")
+        conn, reused = self._checkout(pool, parts.scheme, parts.hostname, port, timeout)
+        try:
+            try:
+                conn.request(request.get_method(), path, body=request.data, headers=headers)
+                response = conn.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # The server dropped the idle connection, retry once on a fresh one
+                conn.close()
+                with self._lock:
+                    self.retries += 1
+                conn = self._connect(pool, parts.scheme, parts.hostname, port, timeout)
+                conn.request(request.get_method(), path, body=request.data, headers=headers)
+                response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            self._discard(pool)
+            raise URLError(e) from e
+
+        if isinstance(conn, _HTTPSConnection) and conn.session_reused:
+            with self._lock:
+                self.tls_resumed += 1
+            conn.session_reused = False
+
+        return PooledResponse(
+            self,
+            pool,
+            conn,
+            response,
+            request.full_url,
+            track_transfer=request.has_header("Accept-encoding"),
+        )
+
+    def _record_transfer(self, url: str, wire_bytes: int, decoded_bytes: int) -> None:
+        # IDs are folded so that e.g. every platform's ROM page adds up
+        endpoint = _NUMERIC_SEGMENT.sub("/{id}", urlsplit(url).path) or "/"
+        with self._lock:
+            counts = self._transfers.setdefault(endpoint, {"wire": 0, "decoded": 0})
+            counts["wire"] += wire_bytes
+            counts["decoded"] += decoded_bytes
+
+    def _get_pool(self, scheme: str, host: str, port: int) -> _HostPool:
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _HostPool(self.max_connections_per_host)
+                self._pools[key] = pool
+            return pool
+
+    def _checkout(
+        self, pool: _HostPool, scheme: str, host: str, port: int, timeout
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            while pool.idle:
+                conn, released_at = pool.idle.pop()
+                if now - released_at > self.idle_timeout:
+                    conn.close()
+                    continue
+                self.hits += 1
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+
+        return self._connect(pool, scheme, host, port, timeout), False
+
+    def _connect(
+        self, pool: _HostPool, scheme: str, host: str, port: int, timeout
+    ) -> http.client.HTTPConnection:
+        with self._lock:
+            self.misses += 1
+        if scheme == "https":
+            return _HTTPSConnection(host, port, timeout, self._ssl_context, pool)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _release(self, pool: _HostPool, conn: http.client.HTTPConnection) -> None:
+        if isinstance(conn, _HTTPSConnection) and conn.sock is not None:
+            # TLS 1.3 tickets arrive after the handshake, keep the latest one
+            pool.tls_session = conn.sock.session or pool.tls_session
+        with self._lock:
+            pool.idle.append((conn, time.monotonic()))
+        pool.slots.release()
+
+    def _discard(self, pool: _HostPool) -> None:
+        pool.slots.release()
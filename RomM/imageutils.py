@@ -2,8 +2,9 @@ import os
 from io import BytesIO
 from typing import Optional
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from urllib.request import Request
 
+from http_client import HttpClient
 from PIL import Image, ImageDraw
 
 
@@ -24,6 +25,7 @@ class ImageUtils:
             return
 
         self.host = os.getenv("HOST", "").strip("/")
+        self.http = HttpClient()
         self.fade_mask = self.generate_fade_mask()
         self._initialized = True
 
@@ -55,7 +57,7 @@ class ImageUtils:
     def load_image_from_url(self, url: str, headers: dict) -> Image.Image | None:
         try:
             req = Request(url.split("?")[0], headers=headers)
-            with urlopen(req, timeout=60) as response:  # trunk-ignore(bandit/B310)
+            with self.http.urlopen(req, timeout=60) as response:
                 data = response.read()
             return Image.open(BytesIO(data)).convert("RGBA")
         except (URLError, HTTPError, IOError) as e:
@@ -1,5 +1,5 @@
 import os
-import time
+import queue
 from threading import Lock
 from typing import Any, Dict, Optional
 
@@ -46,13 +46,19 @@ class Input:
         self._initialized = True
         self._input_lock = Lock()
 
+        # Key presses and releases read by the input thread, as
+        # (is_pressed, key name, SDL timestamp in ms)
+        self._events: queue.SimpleQueue[tuple[bool, str, int]] = queue.SimpleQueue()
+
         # Track the state of all keys
         self._keys_pressed: set[str] = set()
         self._keys_held: set[str] = set()
-        self._keys_held_start_time: Dict[str, float] = {}
+        # SDL tick at which each held key repeats next
+        self._keys_next_repeat: Dict[str, int] = {}
 
-        # Key repeat settings
-        self._initial_delay = 0.35
+        # Key repeat settings, in ms; keys repeat about once per frame
+        self._initial_delay = 350
+        self._repeat_interval = 16
 
         # Enable controller events
         self._load_controller_mappings()
@@ -77,7 +83,9 @@ class Input:
 
         if not self.controllers:
             print("No game controllers found.")
-            raise RuntimeError("No game controllers found.")
+            # Headless runs are driven without a controller
+            if os.getenv("HEADLESS", "0") != "1":
+                raise RuntimeError("No game controllers found.")
 
     def _load_controller_mappings(self) -> None:
         """Load controller mappings from environment variable or fallback file."""
@@ -113,32 +121,34 @@ class Input:
         else:
             print("No controller mappings loaded - using SDL defaults")
 
-    def _add_key_pressed(self, key_name: str) -> None:
+    def _add_key_pressed(self, key_name: str, timestamp: int) -> None:
         """Add a key to the pressed set"""
         with self._input_lock:
             self._keys_pressed.add(key_name)
             self._keys_held.add(key_name)
-            self._keys_held_start_time[key_name] = time.time()
+            self._keys_next_repeat[key_name] = timestamp + self._initial_delay
 
     def _remove_key_held(self, key_name: str) -> None:
         """Remove a key from the pressed set"""
         with self._input_lock:
             self._keys_held.discard(key_name)
-            self._keys_held_start_time.pop(key_name, None)
+            self._keys_next_repeat.pop(key_name, None)
 
     def check_event(self, event=None) -> bool:
         """
-        Check for input events and update key states
-        Returns if an event was processed
+        Check for input events and queue the key state changes, so they can
+        be applied by `process_events` in the render thread
+        Returns if a key press was queued
         """
         if event:
+            timestamp = event.common.timestamp
             # Controller button press
             if event.type == sdl2.SDL_CONTROLLERBUTTONDOWN:
                 button = event.cbutton.button
                 # Map button to key name using the _key_mapping dictionary
                 if button in self._key_mapping:
                     key_name = self._key_mapping[button]
-                    self._add_key_pressed(key_name)
+                    self._events.put((True, key_name, timestamp))
                     return True
 
             # Controller button release
@@ -148,7 +158,7 @@ class Input:
                 # Clear the key if it was pressed
                 if button in self._key_mapping:
                     key_name = self._key_mapping[button]
-                    self._remove_key_held(key_name)
+                    self._events.put((False, key_name, timestamp))
 
             # Controller axis motion
             elif event.type == sdl2.SDL_CONTROLLERAXISMOTION:
@@ -161,16 +171,32 @@ class Input:
                     # Only process significant movements (ignore small values)
                     if abs(value) > 10000:
                         dir = "+" if value > 0 else "-"
-                        self._add_key_pressed(f"{key_name}{dir}")
+                        self._events.put((True, f"{key_name}{dir}", timestamp))
                         return True
 
                     # Reset when axis returns to center
                     elif abs(value) < 5000:
-                        self._remove_key_held(f"{key_name}+")
-                        self._remove_key_held(f"{key_name}-")
+                        self._events.put((False, f"{key_name}+", timestamp))
+                        self._events.put((False, f"{key_name}-", timestamp))
 
         return False
 
+    def process_events(self) -> bool:
+        """Apply the queued key events, returns if there were any"""
+        processed = False
+        while True:
+            try:
+                is_pressed, key_name, timestamp = self._events.get_nowait()
+            except queue.Empty:
+                return processed
+            processed = True
+            if is_pressed:
+                # Axes report motion continuously, only the first one presses
+                if key_name not in self._keys_held:
+                    self._add_key_pressed(key_name, timestamp)
+            else:
+                self._remove_key_held(key_name)
+
     def key(self, key_name: str) -> bool:
         """Check if a specific key is pressed with an optional value check"""
         with self._input_lock:
@@ -178,13 +204,19 @@ class Input:
             self._keys_pressed.discard(key_name)
 
             if key_name in self._keys_held:
-                # Check if the key is held down
-                held_time = time.time() - self._keys_held_start_time[key_name]
-                if held_time >= self._initial_delay:
+                # Repeat held keys on the schedule started by their press event
+                now = sdl2.SDL_GetTicks()
+                if now >= self._keys_next_repeat[key_name]:
                     is_pressed = True
+                    self._keys_next_repeat[key_name] = now + self._repeat_interval
 
             return is_pressed
 
+    def has_held_keys(self) -> bool:
+        """Whether a key is held down, so key repeat may fire."""
+        with self._input_lock:
+            return bool(self._keys_held)
+
     def handle_navigation(
         self, selected_position: int, items_per_page: int, total_items: int
     ) -> int:
@@ -252,6 +284,6 @@ class Input:
             self.controllers = []  # Clear the list of controllers
             self._keys_pressed = set()
             self._keys_held = set()
-            self._keys_held_start_time = {}
+            self._keys_next_repeat = {}
 
         sdl2.SDL_QuitSubSystem(sdl2.SDL_INIT_GAMECONTROLLER)
@@ -0,0 +1,130 @@
+import codecs
+import json
+import time
+from typing import Any, Iterator
+
+_WHITESPACE = " \t\n\r"
+# Characters that can follow a complete value
+_DELIMITERS = _WHITESPACE + ",:]}"
+_READ_SIZE = 64 * 1024
+
+
+class JsonItemStream:
+    """Decodes the items of a JSON response one at a time, as it is read.
+
+    The payload is either an array of items or an object holding them under
+    `items_key`; the other members of that object end up in `fields`. Only
+    the text not decoded yet is kept in memory, so each item can be dropped
+    as soon as the caller is done with it instead of holding the raw body,
+    its decoded text and every parsed item at once.
+    """
+
+    def __init__(self, stream, items_key: str = "items") -> None:
+        self._stream = stream
+        self._items_key = items_key
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+        self.fields: dict[str, Any] = {}
+        # Whether the payload was a bare array rather than an object
+        self.is_list = False
+
+        # Decoding counters
+        self.bytes_read = 0
+        self.peak_buffer = 0
+        self.parse_seconds = 0.0
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._expect("[{") == "[":
+            self.is_list = True
+            yield from self._array()
+        elif self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                key = self._value()
+                self._expect(":")
+                if key == self._items_key and self._peek() == "[":
+                    self._pos += 1
+                    yield from self._array()
+                else:
+                    self.fields[key] = self._value()
+                if self._expect(",}") == "}":
+                    break
+        # Read to the end so the connection can be reused
+        while self._fill():
+            pass
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, returns False at the end of the data."""
+        if self._eof:
+            return False
+        data = self._stream.read(_READ_SIZE)
+        self.bytes_read += len(data)
+        self._eof = not data
+        text = self._utf8.decode(data, final=self._eof)
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        self.peak_buffer = max(self.peak_buffer, len(self._buffer))
+        return not self._eof
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at the end."""
+        while True:
+            buffer = self._buffer
+            while self._pos < len(buffer) and buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(buffer):
+                return buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self._buffer, self._pos
+            )
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            started = time.monotonic()
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                error = None
+            except json.JSONDecodeError as e:
+                value, end, error = None, -1, e
+            self.parse_seconds += time.monotonic() - started
+
+            # A number cut by the end of the chunk decodes fine, so a value
+            # only counts once what follows it has been read
+            if end != -1 and (
+                self._eof
+                or (end < len(self._buffer) and self._buffer[end] in _DELIMITERS)
+            ):
+                self._pos = end
+                return value
+            if not self._fill():
+                if error:
+                    raise error
+                self._pos = end
+                return value
+
+    def _array(self) -> Iterator[Any]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
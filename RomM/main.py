@@ -56,6 +56,17 @@ if not apply_pending_update():
 
 
 def cleanup(romm: RomM, exit_code: int):
+    print(f"HTTP connection pool: {romm.api.http.stats()}")
+    print(f"HTTP transfers: {romm.api.http.transfer_stats()}")
+    print(f"Frames rendered: {romm.frames_rendered}, skipped: {romm.frames_skipped}")
+    print(f"Asset cache: {romm.ui.assets.stats()}")
+    print(f"Tasks: {romm.tasks.stats()}")
+    print(f"Catalog: {romm.catalog.stats()}")
+    print("Frame times:")
+    for line in romm.profiler.report():
+        print(f"  {line}")
+    romm.tasks.shutdown()
+    romm.api.http.close()
     romm.ui.cleanup()
     romm.input.cleanup()
 
@@ -64,8 +75,12 @@ def cleanup(romm: RomM, exit_code: int):
 
 
 def main():
-    # Initialize SDL2 with video and joystick support
-    if sdl2.SDL_Init(sdl2.SDL_INIT_VIDEO | sdl2.SDL_INIT_GAMECONTROLLER) < 0:
+    # Initialize SDL2 with video and joystick support, headless runs draw
+    # their frames in memory only
+    flags = sdl2.SDL_INIT_GAMECONTROLLER
+    if os.getenv("HEADLESS", "0") != "1":
+        flags |= sdl2.SDL_INIT_VIDEO
+    if sdl2.SDL_Init(flags) < 0:
         print(f"SDL2 initialization failed: {sdl2.SDL_GetError()}")
         sys.exit(1)
 
@@ -74,10 +89,19 @@ def main():
 
     try:
         while romm.running:
-            romm.ui.draw_start()  # Render at 640x480
-            romm.update()  # Draw content
-            romm.ui.render_to_screen()  # Render to the screen
-            romm.input.clear_pressed()  # Clear pressed keys
+            if romm.needs_redraw():
+                with romm.profiler.measure("frame"):
+                    romm.ui.draw_start()  # Render at 640x480
+                    romm.update()  # Draw content
+                    if romm.profiler.overlay:
+                        romm.ui.draw_frame_times(romm.profiler.report())
+                    romm.ui.render_to_screen()  # Render to the screen
+                romm.profiler.end_frame()
+                romm.input.clear_pressed()  # Clear pressed keys
+                romm.frames_rendered += 1
+            else:
+                # Nothing changed, keep the frame on screen
+                romm.frames_skipped += 1
 
             # Add a small sleep to prevent 100% CPU usage
             sdl2.SDL_Delay(16)
@@ -0,0 +1,97 @@
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+class FrameProfiler:
+    """Rolling per-phase timings of the rendered frames.
+
+    Time spent in a phase is added up over a frame (a phase like `row_list`
+    runs several times per frame) and stored when the frame ends. The last
+    `window` frames are kept to compute p50/p95/max per phase.
+    """
+
+    _instance: Optional["FrameProfiler"] = None
+    _initialized: bool = False
+
+    window = 300
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(FrameProfiler, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        self._current: dict[str, float] = {}
+        self._samples: dict[str, deque[float]] = {}
+        # Whether the frame times are drawn on screen
+        self.overlay = False
+        self._initialized = True
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """Add the time spent in the block to `phase` for the current frame."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._current[phase] = self._current.get(phase, 0.0) + elapsed
+
+    def end_frame(self) -> None:
+        """Store the phase times of the frame that was just rendered."""
+        with self._lock:
+            for phase, elapsed in self._current.items():
+                samples = self._samples.get(phase)
+                if samples is None:
+                    samples = self._samples[phase] = deque(maxlen=self.window)
+                samples.append(elapsed)
+            self._current = {}
+
+    def summary(self) -> dict[str, tuple[float, float, float]]:
+        """Return the p50, p95 and max time in ms of each phase."""
+        with self._lock:
+            phases = {phase: sorted(samples) for phase, samples in self._samples.items()}
+        summary = {}
+        for phase, samples in phases.items():
+            last = len(samples) - 1
+            summary[phase] = (
+                samples[last // 2] * 1000,
+                samples[int(last * 0.95)] * 1000,
+                samples[last] * 1000,
+            )
+        return summary
+
+    def report(self) -> list[str]:
+        """Return one line per phase, slowest first."""
+        summary = sorted(self.summary().items(), key=lambda item: -item[1][1])
+        return [
+            f"{phase}: p50 {p50:.1f} p95 {p95:.1f} max {worst:.1f} ms"
+            for phase, (p50, p95, worst) in summary
+        ]
+
+
+def timed(phase: str) -> Callable:
+    """Decorator adding the time spent in the function to a frame phase."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with FrameProfiler().measure(phase):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,10 +1,10 @@
+import ctypes
 import os
 import threading
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import sdl2
-import sdl2.ext
 from models import Rom
 
 if os.path.exists(os.path.join(os.path.dirname(__file__), "__version__.py")):
@@ -13,6 +13,7 @@ else:
     version = "unknown"
 
 from api import API
+from catalog import Catalog, CatalogRoms
 from config import (
     BUTTON_CONFIGS,
     get_controller_layout,
@@ -22,7 +23,9 @@ from config import (
 from filesystem import Filesystem
 from glyps import glyphs
 from input import Input
-from status import Filter, Status, View
+from profiler import FrameProfiler, timed
+from status import DownloadState, Filter, Status, View
+from tasks import TaskScheduler
 from ui import (
     UserInterface,
     color_menu_bg,
@@ -37,12 +40,15 @@ class StartMenuOptions:
     ABORT_DOWNLOAD = f"{glyphs.abort} Abort downloads"
     SD_SWITCH = f"{glyphs.microsd} Switch SD card"
     TOGGLE_LAYOUT = f"{glyphs.user} Toggle button layout"
+    FRAME_TIMES = f"{glyphs.about} Show frame times"
     EXIT = f"{glyphs.exit} Exit"
 
 
 class RomM:
     running: bool = True
     spinner_speed = 0.05
+    # Longest wait for an input event in ms, bounds how long exiting takes
+    input_wait_timeout = 100
 
     def __init__(self) -> None:
         self.api = API()
@@ -50,6 +56,9 @@ class RomM:
         self.input = Input()
         self.status = Status()
         self.ui = UserInterface()
+        self.profiler = FrameProfiler()
+        self.tasks = TaskScheduler()
+        self.catalog = Catalog()
         self.updater = Update(self.ui)
 
         self.contextual_menu_options: list[Tuple[str, int, Any]] = []
@@ -58,6 +67,13 @@ class RomM:
         self.platforms_selected_position = 0
         self.collections_selected_position = 0
         self.roms_selected_position = 0
+        # Inputs roms_to_show was last computed from
+        self._roms_to_show_key: Optional[tuple[int, str, int, int]] = None
+        # List generation, ROM list version and storage version the catalog
+        # presence flags were last refreshed for, bumped version once a
+        # refresh is published
+        self._presence_checked: Optional[tuple[int, int, int]] = None
+        self._presence_version = 0
 
         self.max_n_platforms = 10
         self.max_n_collections = 10
@@ -73,6 +89,11 @@ class RomM:
         self.latest_version = None
         self.download_url = None
 
+        # Frames drawn and frames skipped because nothing changed
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        self._follow_up_frame = False
+
         # Set start menu options
         self.start_menu_options = [
             (StartMenuOptions.ABORT_DOWNLOAD, 0),
@@ -81,7 +102,8 @@ class RomM:
                 StartMenuOptions.TOGGLE_LAYOUT,
                 2 if self.fs._sd2_roms_storage_path else 1,
             ),
-            (StartMenuOptions.EXIT, 3 if self.fs._sd2_roms_storage_path else 2),
+            (StartMenuOptions.FRAME_TIMES, 3 if self.fs._sd2_roms_storage_path else 2),
+            (StartMenuOptions.EXIT, 4 if self.fs._sd2_roms_storage_path else 3),
         ]
 
     def draw_buttons(self):
@@ -135,6 +157,7 @@ class RomM:
             self.latest_version = latest_version
             self.download_url = download_url
             self.awaiting_input = True
+            self.status.mark_dirty()
 
     def _handle_update_confirmation(self):
         if self.awaiting_input:
@@ -187,6 +210,43 @@ class RomM:
                 self.status.updating.clear()
                 self.ui.draw_clear()
 
+    def _render_download_progress(self):
+        downloads = list(self.status.downloads.values())
+        if not downloads:
+            return
+
+        finished, percent, throughput, eta = self.status.download_summary()
+        active = [
+            d
+            for d in downloads
+            if d.state
+            in (DownloadState.DOWNLOADING, DownloadState.EXTRACTING, DownloadState.VERIFYING)
+        ]
+        extracting = all(d.state == DownloadState.EXTRACTING for d in active)
+        speed, speed_unit = self.api._human_readable_size(int(throughput))
+        eta_text = f"{int(eta // 60)}:{int(eta % 60):02d}" if eta is not None else "--:--"
+        verify_seconds = sum(d.verify_seconds for d in downloads)
+        verify_text = f" | Verify {verify_seconds:.1f}s" if verify_seconds else ""
+
+        if active and extracting:
+            self.ui.draw_loader(percent, color=self.controller_layout["b"]["color"])
+        else:
+            self.ui.draw_loader(percent)
+        self.ui.draw_log(
+            text_line_1=f"{finished}/{len(downloads)} | {percent:.2f}% | {speed}{speed_unit}/s | ETA {eta_text}{verify_text}",
+            text_line_2=", ".join(
+                (
+                    f"Extracting {d.rom.name} ({d.extracted_percent:.0f}%)"
+                    if d.state == DownloadState.EXTRACTING
+                    else f"Verifying {d.rom.name}"
+                    if d.state == DownloadState.VERIFYING
+                    else f"{glyphs.download} {d.rom.name}"
+                )
+                for d in active
+            ),
+            background=False,
+        )
+
     def _render_platforms_view(self):
         if self.status.updating.is_set():
             return
@@ -206,23 +266,7 @@ class RomM:
                 text_line_1=f"{self.current_spinner_status} Fetching platforms"
             )
         elif not self.status.download_rom_ready.is_set():
-            if self.status.extracting_rom and self.status.downloading_rom:
-                self.ui.draw_loader(
-                    self.status.extracted_percent,
-                    color=self.controller_layout["b"]["color"],
-                )
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.extracted_percent:.2f}% | Extracting {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
-            elif self.status.downloading_rom:
-                self.ui.draw_loader(self.status.downloaded_percent)
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
+            self._render_download_progress()
         elif not self.status.valid_host:
             self.ui.draw_log(
                 text_line_1=f"Error: Can't connect to host {self.api.host}",
@@ -264,11 +308,11 @@ class RomM:
                     self.platforms_selected_position
                 ]
                 self.status.current_view = View.ROMS
-                threading.Thread(target=self.api.fetch_roms).start()
+                self._fetch_roms()
         elif self.input.key(self.controller_layout["y"]["key"]):
             if self.status.platforms_ready.is_set():
                 self.status.platforms_ready.clear()
-                threading.Thread(target=self.api.fetch_platforms).start()
+                self.tasks.submit("fetch_platforms", self.api.fetch_platforms)
         elif self.input.key(self.controller_layout["x"]["key"]):
             self.status.current_view = View.COLLECTIONS
         elif self.input.key("START"):
@@ -313,23 +357,7 @@ class RomM:
                 text_line_1=f"{self.current_spinner_status} Fetching collections"
             )
         elif not self.status.download_rom_ready.is_set():
-            if self.status.extracting_rom and self.status.downloading_rom:
-                self.ui.draw_loader(
-                    self.status.extracted_percent,
-                    color=self.controller_layout["b"]["color"],
-                )
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.extracted_percent:.2f}% | Extracting {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
-            elif self.status.downloading_rom:
-                self.ui.draw_loader(self.status.downloaded_percent)
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
+            self._render_download_progress()
         elif not self.status.valid_host:
             self.ui.draw_log(
                 text_line_1=f"Error: Can't connect to host {self.api.host}",
@@ -375,11 +403,11 @@ class RomM:
                 else:
                     self.status.selected_collection = selected_collection
                 self.status.current_view = View.ROMS
-                threading.Thread(target=self.api.fetch_roms).start()
+                self._fetch_roms()
         elif self.input.key(self.controller_layout["y"]["key"]):
             if self.status.collections_ready.is_set():
                 self.status.collections_ready.clear()
-                threading.Thread(target=self.api.fetch_collections).start()
+                self.tasks.submit("fetch_collections", self.api.fetch_collections)
         elif self.input.key(self.controller_layout["x"]["key"]):
             self.status.current_view = View.PLATFORMS
         elif self.input.key("START"):
@@ -403,6 +431,70 @@ class RomM:
                 len(self.status.collections),
             )
 
+    def _update_roms_to_show(self):
+        """Filter the ROM list again only when the list, the filter or the
+        ROMs on the device changed, keeping the same ROM selected."""
+        key = (
+            self.status.roms_version,
+            self.status.current_filter,
+            self.fs.storage_version,
+            self._presence_version,
+        )
+        previous_key = self._roms_to_show_key
+        if key == previous_key:
+            return
+        self._roms_to_show_key = key
+
+        roms_to_show = self.status.roms_to_show
+        selected_rom = (
+            roms_to_show[self.roms_selected_position]
+            if self.roms_selected_position < len(roms_to_show)
+            else None
+        )
+
+        roms = self.status.roms
+        if self.status.current_filter == Filter.ALL:
+            roms_to_show = roms
+        elif isinstance(roms, CatalogRoms):
+            # Filtered in the catalog on presence flags, refreshed from the
+            # storage index in the background; filtered again once they are.
+            # ROMs appended while pages stream in have no flags yet, so the
+            # whole list is shown until the check covering them is done
+            presence = (roms.list_id, self.status.roms_version, self.fs.storage_version)
+            if presence != self._presence_checked:
+                self.tasks.submit(
+                    "presence:{}:{}:{}".format(*presence),
+                    self._update_presence,
+                    *presence,
+                    group="presence",
+                )
+                roms_to_show = roms
+            else:
+                roms_to_show = roms.where_present(
+                    self.status.current_filter == Filter.LOCAL
+                )
+        elif self.status.current_filter == Filter.LOCAL:
+            roms_to_show = [r for r in roms if self.fs.is_rom_in_device(r)]
+        elif self.status.current_filter == Filter.REMOTE:
+            roms_to_show = [r for r in roms if not self.fs.is_rom_in_device(r)]
+        self.status.roms_to_show = roms_to_show
+
+        # Changing the filter resets the selection, otherwise follow the ROM
+        if previous_key and previous_key[1] == self.status.current_filter:
+            if selected_rom is not None:
+                if isinstance(roms_to_show, CatalogRoms):
+                    position = roms_to_show.index_of(selected_rom.id)
+                else:
+                    position = next(
+                        (i for i, r in enumerate(roms_to_show) if r.id == selected_rom.id),
+                        None,
+                    )
+                if position is not None:
+                    self.roms_selected_position = position
+            self.roms_selected_position = max(
+                0, min(self.roms_selected_position, len(roms_to_show) - 1)
+            )
+
     def _render_roms_view(self):
         if len(self.status.roms) == 0 and self.status.roms_ready.is_set():
             header_text = "No ROMs available"
@@ -425,6 +517,7 @@ class RomM:
             header_color = self.controller_layout["a"]["color"]
             prepend_platform_slug = False
 
+        self._update_roms_to_show()
         total_pages = (
             len(self.status.roms_to_show) + self.max_n_roms - 1
         ) // self.max_n_roms
@@ -433,17 +526,6 @@ class RomM:
 
         if len(self.status.multi_selected_roms) > 0:
             header_text += f" ({len(self.status.multi_selected_roms)} selected)"
-        if self.status.current_filter == Filter.ALL:
-            self.status.roms_to_show = self.status.roms
-        elif self.status.current_filter == Filter.LOCAL:
-            self.status.roms_to_show = [
-                r for r in self.status.roms if self.fs.is_rom_in_device(r)
-            ]
-        elif self.status.current_filter == Filter.REMOTE:
-            self.status.roms_to_show = [
-                r for r in self.status.roms if not self.fs.is_rom_in_device(r)
-            ]
-
         self.ui.draw_roms_list(
             self.roms_selected_position,
             self.max_n_roms,
@@ -459,25 +541,12 @@ class RomM:
             if current_time - self.last_spinner_update >= self.spinner_speed:
                 self.last_spinner_update = current_time
                 self.current_spinner_status = next(glyphs.spinner)
-            self.ui.draw_log(text_line_1=f"{self.current_spinner_status} Fetching roms")
+            loaded = f" ({len(self.status.roms)})" if self.status.roms else ""
+            self.ui.draw_log(
+                text_line_1=f"{self.current_spinner_status} Fetching roms{loaded}"
+            )
         elif not self.status.download_rom_ready.is_set():
-            if self.status.extracting_rom and self.status.downloading_rom:
-                self.ui.draw_loader(
-                    self.status.extracted_percent,
-                    color=self.controller_layout["b"]["color"],
-                )
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.extracted_percent:.2f}% | Extracting {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
-            elif self.status.downloading_rom:
-                self.ui.draw_loader(self.status.downloaded_percent)
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
+            self._render_download_progress()
         elif not self.status.valid_host:
             self.ui.draw_log(
                 text_line_1=f"Error: Can't connect to host {self.api.host}",
@@ -552,7 +621,7 @@ class RomM:
                     )
                 self.status.download_queue = self.status.multi_selected_roms
                 self.status.abort_download.clear()
-                threading.Thread(target=self.api.download_rom).start()
+                self.tasks.submit("download_rom", self.api.download_rom)
         elif self.input.key(self.controller_layout["b"]["key"]):
             if self.status.selected_platform:
                 self.status.current_view = View.PLATFORMS
@@ -565,13 +634,16 @@ class RomM:
                 self.status.selected_virtual_collection = None
             else:
                 self.status.current_view = View.PLATFORMS
+            # Stop fetching the list that was left, nothing is loading anymore
+            self.tasks.cancel_group("roms")
+            self.status.roms_ready.set()
             self.status.reset_roms_list()
             self.roms_selected_position = 0
             self.status.multi_selected_roms = []
         elif self.input.key(self.controller_layout["y"]["key"]):
             if self.status.roms_ready.is_set():
                 self.status.roms_ready.clear()
-                threading.Thread(target=self.api.fetch_roms).start()
+                self._fetch_roms()
                 self.status.multi_selected_roms = []
         elif self.input.key(self.controller_layout["x"]["key"]):
             self.status.current_filter = next(self.status.filters)
@@ -580,7 +652,7 @@ class RomM:
             if len(self.status.multi_selected_roms) == len(self.status.roms_to_show):
                 self.status.multi_selected_roms = []
             else:
-                self.status.multi_selected_roms = self.status.roms_to_show.copy()
+                self.status.multi_selected_roms = list(self.status.roms_to_show)
         elif self.input.key(self.controller_layout["l1"]["key"]):
             if (
                 self.status.download_rom_ready.is_set()
@@ -667,7 +739,7 @@ class RomM:
         pos = [self.ui.screen_width / 3, self.ui.screen_height / 3]
         padding = 6
         width = 200
-        n_selectable_options = 4 if self.fs._sd2_roms_storage_path else 3
+        n_selectable_options = 5 if self.fs._sd2_roms_storage_path else 4
         option_height = 28
         gap = 4
         title = "Main menu"
@@ -681,6 +753,10 @@ class RomM:
             f"{glyphs.user} Layout: {next_layout.capitalize()}",
             self.start_menu_options[2][1],
         )
+        self.start_menu_options[3] = (
+            f"{glyphs.about} {'Hide' if self.profiler.overlay else 'Show'} frame times",
+            self.start_menu_options[3][1],
+        )
         self.ui.draw_menu_background(
             pos,
             width,
@@ -750,12 +826,15 @@ class RomM:
                     self._render_platforms_view()
                 self.ui.render_to_screen()
             elif selected_pos == self.start_menu_options[3][1]:
+                self.profiler.overlay = not self.profiler.overlay
+                self.status.show_start_menu = False
+            elif selected_pos == self.start_menu_options[4][1]:
                 self.running = False
                 self.status.show_start_menu = False
         elif self.input.key(self.controller_layout["b"]["key"]):
             self.status.show_start_menu = not self.status.show_start_menu
         else:
-            n_selectable_options = 4 if self.fs._sd2_roms_storage_path else 3
+            n_selectable_options = 5 if self.fs._sd2_roms_storage_path else 4
             self.start_menu_selected_position = self.input.handle_navigation(
                 self.start_menu_selected_position,
                 n_selectable_options,
@@ -770,22 +849,64 @@ class RomM:
         if self.input.key("START") and not self.status.show_start_menu:
             self.status.show_contextual_menu = not self.status.show_contextual_menu
 
+    def _update_presence(
+        self, list_id: int, roms_version: int, storage_version: int
+    ) -> None:
+        self.catalog.update_presence(list_id, self.fs.is_rom_file_in_device)
+        if self.tasks.cancelled():
+            return
+        self._presence_checked = (list_id, roms_version, storage_version)
+        self._presence_version += 1
+        self.status.mark_dirty()
+
+    def _fetch_roms(self):
+        # Fetching another list supersedes the one in progress, and a refresh
+        # restarts a fetch that may already have published its list
+        self.tasks.submit(
+            f"fetch_roms:{self.api._roms_query()}",
+            self.api.fetch_roms,
+            group="roms",
+            coalesce_running=False,
+        )
+
     def _monitor_input(self):
+        event = sdl2.SDL_Event()
         while self.running:
-            events = sdl2.ext.get_events()
-            for event in events:
-                self.input.check_event(event)
-                if event.type == sdl2.SDL_QUIT:
-                    self.running = False
+            # Sleep until an event arrives, waking up now and then to exit
+            if not sdl2.SDL_WaitEventTimeout(ctypes.byref(event), self.input_wait_timeout):
+                continue
+            self.input.check_event(event)
+            if event.type == sdl2.SDL_QUIT:
+                self.running = False
+
+    def needs_redraw(self) -> bool:
+        """Whether the next frame would differ from the one on screen."""
+        if self.input.process_events():
+            self.status.mark_dirty()
+        if self._follow_up_frame:
+            self._follow_up_frame = False
+            return True
+        if self.status.consume_dirty():
+            # Input is handled after the view is drawn, so draw once more to
+            # show what the handlers changed
+            self._follow_up_frame = True
+            return True
+        # Held keys repeat, background work animates spinners and progress
+        if self.input.has_held_keys() or self.status.is_busy():
+            return True
+        return self.ui.marquee_moved()
 
     def start(self):
+        # Show the cached catalog right away, the fetches below refresh it
+        self.api.load_cached_catalog()
         self._render_platforms_view()
         threading.Thread(target=self._monitor_input, daemon=True).start()
-        threading.Thread(target=self._check_for_updates).start()
-        threading.Thread(target=self.api.fetch_platforms).start()
-        threading.Thread(target=self.api.fetch_collections).start()
-        threading.Thread(target=self.api.fetch_me).start()
+        self.tasks.submit("check_for_updates", self._check_for_updates)
+        self.tasks.submit("fetch_platforms", self.api.fetch_platforms)
+        self.tasks.submit("fetch_collections", self.api.fetch_collections)
+        self.tasks.submit("fetch_me", self.api.fetch_me)
 
+    @timed("update")
     def update(self):
         self.ui.draw_clear()
 
@@ -803,7 +924,7 @@ class RomM:
             if self.input.key(self.controller_layout["y"]["key"]):
                 if self.status.platforms_ready.is_set():
                     self.status.platforms_ready.clear()
-                    threading.Thread(target=self.api.fetch_platforms).start()
+                    self.tasks.submit("fetch_platforms", self.api.fetch_platforms)
             self.ui.button_circle(
                 (20, 460),
                 self.controller_layout["y"]["btn"],
@@ -820,7 +941,7 @@ class RomM:
             if self.input.key(self.controller_layout["y"]["key"]):
                 if self.status.platforms_ready.is_set():
                     self.status.platforms_ready.clear()
-                    threading.Thread(target=self.api.fetch_platforms).start()
+                    self.tasks.submit("fetch_platforms", self.api.fetch_platforms)
             self.ui.button_circle(
                 (20, 460),
                 self.controller_layout["y"]["btn"],
@@ -895,3 +1016,5 @@ class RomM:
                 [storage_path, full_path]
             ) == storage_path and os.path.isfile(full_path):
                 os.remove(full_path)
+
+        self.fs.mark_rom_presence(rom, False)
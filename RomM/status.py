@@ -1,5 +1,7 @@
 import itertools
 import threading
+import time
+from collections.abc import Sequence
 from typing import Optional
 
 from models import Collection, Platform, Rom
@@ -18,8 +20,50 @@ class Filter:
     REMOTE = "remote"
 
 
+class DownloadState:
+    QUEUED = "queued"
+    DOWNLOADING = "downloading"
+    EXTRACTING = "extracting"
+    VERIFYING = "verifying"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class DownloadProgress:
+    """Progress of a single ROM of the download queue."""
+
+    def __init__(self, rom: Rom) -> None:
+        self.rom = rom
+        self.state = DownloadState.QUEUED
+        self.downloaded_bytes = 0
+        # Bytes already on disk from an interrupted download
+        self.resumed_bytes = 0
+        self.total_bytes: int = rom.fs_size_bytes or 0
+        self.extracted_percent = 0.0
+        # Time spent hashing the download to verify it
+        self.verify_seconds = 0.0
+
+
+class _StatusEvent(threading.Event):
+    """Event that marks the status dirty whenever it's set or cleared."""
+
+    def __init__(self, status: "Status") -> None:
+        super().__init__()
+        self._status = status
+
+    def set(self) -> None:
+        super().set()
+        self._status.mark_dirty()
+
+    def clear(self) -> None:
+        super().clear()
+        self._status.mark_dirty()
+
+
 class Status:
     _instance: Optional["Status"] = None
+    # Whether something changed since the last rendered frame
+    _dirty = True
 
     def __new__(cls):
         if not cls._instance:
@@ -43,18 +87,21 @@ class Status:
 
         self.platforms: list[Platform] = []
         self.collections: list[Collection] = []
-        self.roms: list[Rom] = []
-        self.roms_to_show: list[Rom] = []
+        # Bumped on every assignment of `roms`, the list is never changed in place.
+        # Fetched lists are `CatalogRoms`, paged from the local catalog
+        self.roms_version = 0
+        self._roms: Sequence[Rom] = []
+        self.roms_to_show: Sequence[Rom] = []
         self.filters = itertools.cycle([Filter.ALL, Filter.LOCAL, Filter.REMOTE])
         self.current_filter = next(self.filters)
 
-        self.platforms_ready = threading.Event()
-        self.collections_ready = threading.Event()
-        self.roms_ready = threading.Event()
-        self.download_rom_ready = threading.Event()
-        self.abort_download = threading.Event()
-        self.me_ready = threading.Event()
-        self.updating = threading.Event()
+        self.platforms_ready = _StatusEvent(self)
+        self.collections_ready = _StatusEvent(self)
+        self.roms_ready = _StatusEvent(self)
+        self.download_rom_ready = _StatusEvent(self)
+        self.abort_download = _StatusEvent(self)
+        self.me_ready = _StatusEvent(self)
+        self.updating = _StatusEvent(self)
 
         # Initialize events what won't launch at startup
         self.roms_ready.set()
@@ -63,12 +110,64 @@ class Status:
 
         self.multi_selected_roms: list[Rom] = []
         self.download_queue: list[Rom] = []
-        self.downloading_rom: Optional[Rom] = None
-        self.downloading_rom_position = 0
-        self.total_downloaded_bytes = 0
-        self.downloaded_percent = 0.0
-        self.extracting_rom = False
-        self.extracted_percent = 0.0
+        self.downloads: dict[int, DownloadProgress] = {}
+        self.download_started_at = 0.0
+
+    def __setattr__(self, name: str, value) -> None:
+        # Lists are replaced rather than changed in place, so comparing
+        # identities is enough to notice a change
+        if self.__dict__.get(name, self) is not value:
+            self.__dict__["_dirty"] = True
+        super().__setattr__(name, value)
+
+    def mark_dirty(self) -> None:
+        """Request a new frame, for changes that don't go through an attribute."""
+        self.__dict__["_dirty"] = True
+
+    def consume_dirty(self) -> bool:
+        """Return whether a new frame is needed and reset the flag."""
+        dirty = self._dirty
+        self.__dict__["_dirty"] = False
+        return dirty
+
+    def is_busy(self) -> bool:
+        """Whether background work is running that the UI shows progress for."""
+        if not (self.valid_host and self.valid_credentials):
+            return False
+        return (
+            not self.platforms_ready.is_set()
+            or not self.collections_ready.is_set()
+            or not self.roms_ready.is_set()
+            or not self.download_rom_ready.is_set()
+            or self.updating.is_set()
+        )
+
+    @property
+    def roms(self) -> Sequence[Rom]:
+        return self._roms
+
+    @roms.setter
+    def roms(self, roms: Sequence[Rom]) -> None:
+        self._roms = roms
+        self.roms_version += 1
 
     def reset_roms_list(self) -> None:
         self.roms = []
+
+    def download_summary(self) -> tuple[int, float, float, Optional[float]]:
+        """Return the finished item count, overall percent, throughput in bytes
+        per second and ETA in seconds (None until the throughput is known)."""
+        downloads = list(self.downloads.values())
+        finished = sum(
+            1 for d in downloads if d.state in (DownloadState.DONE, DownloadState.FAILED)
+        )
+        downloaded = sum(d.downloaded_bytes for d in downloads)
+        # Add 1 virtual byte to avoid division by zero
+        total = sum(d.total_bytes for d in downloads) + 1
+        percent = min(downloaded / total * 100, 100.0)
+
+        transferred = downloaded - sum(d.resumed_bytes for d in downloads)
+        elapsed = time.monotonic() - self.download_started_at
+        throughput = transferred / elapsed if elapsed > 0 else 0.0
+        eta = (total - downloaded) / throughput if throughput > 0 else None
+        return finished, percent, throughput, eta
@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class StreamCopier:
+    """Copies a readable stream into a file through a reusable buffer.
+
+    Data is read with `readinto` into a per-thread `bytearray`, so no new bytes
+    object is created per chunk. The chunk size adapts to the stream speed,
+    doubling while a chunk arrives quickly and halving when it takes too long,
+    which keeps abort checks and progress updates responsive on slow links.
+    """
+
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 4 * 1024 * 1024
+    # How long a single read should take at most
+    target_chunk_seconds = 0.25
+    # Minimum interval between two progress callbacks
+    progress_interval = 0.1
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _buffer(self) -> memoryview:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = memoryview(bytearray(self.max_chunk_size))
+            self._local.buffer = buffer
+        return buffer
+
+    def _next_chunk_size(self, chunk_size: int, n: int, elapsed: float) -> int:
+        if elapsed > self.target_chunk_seconds:
+            return max(self.min_chunk_size, chunk_size // 2)
+        if n == chunk_size and elapsed < self.target_chunk_seconds / 4:
+            return min(self.max_chunk_size, chunk_size * 2)
+        return chunk_size
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def copy(
+        self,
+        source,
+        target,
+        on_progress: Optional[Callable[[int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        hasher=None,
+    ) -> int:
+        """Copy `source` into `target` until EOF or until `should_stop` is true.
+
+        `on_progress` receives the number of bytes copied since its last call;
+        it is throttled to `progress_interval` and always called once at the end.
+        `hasher` is updated with every chunk written, in the same pass.
+        Returns the total number of bytes copied.
+        """
+        buffer = self._buffer()
+        chunk_size = self.min_chunk_size
+        copied = 0
+        unreported = 0
+        last_report = time.monotonic()
+        try:
+            while not (should_stop and should_stop()):
+                started = time.monotonic()
+                n = source.readinto(buffer[:chunk_size])
+                if not n:
+                    break
+                target.write(buffer[:n])
+                if hasher is not None:
+                    hasher.update(buffer[:n])
+                copied += n
+                unreported += n
+
+                now = time.monotonic()
+                chunk_size = self._next_chunk_size(chunk_size, n, now - started)
+                if on_progress and now - last_report >= self.progress_interval:
+                    on_progress(unreported)
+                    unreported = 0
+                    last_report = now
+        finally:
+            if on_progress and unreported:
+                on_progress(unreported)
+        return copied
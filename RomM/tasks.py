@@ -0,0 +1,211 @@
+import os
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Optional
+
+
+class Task:
+    """An operation submitted to the scheduler, shared by duplicate requests."""
+
+    def __init__(
+        self, key: str, group: Optional[str], func: Callable[..., Any], args: tuple
+    ) -> None:
+        self.key = key
+        self.group = group
+        self._func = func
+        self._args = args
+        self._cancelled = threading.Event()
+        self._started = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Skip the task if it hasn't started, or ask it to stop if it has."""
+        self._cancelled.set()
+
+    def started(self) -> bool:
+        return self._started.is_set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class TaskScheduler:
+    """Runs background operations on a fixed pool of worker threads.
+
+    Every operation has a key; submitting a key that is already queued or
+    running returns the existing task instead of starting a second one.
+    Operations whose result would be stale once they have started (e.g. a
+    refresh) pass `coalesce_running=False` to replace a running task.
+    Tasks in the same group supersede each other: submitting one cancels the
+    others, so only the latest request of a kind (e.g. the ROM list of the
+    platform on screen) keeps a worker busy. Long operations check
+    `cancelled()` between steps to stop early.
+    """
+
+    _instance: Optional["TaskScheduler"] = None
+    _initialized: bool = False
+
+    workers = max(1, int(os.getenv("TASK_WORKERS", "4")))
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(TaskScheduler, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        self._queue: queue.SimpleQueue[Optional[Task]] = queue.SimpleQueue()
+        self._in_flight: dict[str, Task] = {}
+        self._threads: list[threading.Thread] = []
+        self._local = threading.local()
+
+        # Scheduler counters
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.cancelled_tasks = 0
+        self.completed = 0
+        self.failed = 0
+        self._initialized = True
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._worker,
+                name=f"task-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _worker(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            with self._lock:
+                self.queued -= 1
+                if task.cancelled:
+                    self._finish(task)
+                    continue
+                self.running += 1
+                task._started.set()
+            self._run(task)
+
+    def _run(self, task: Task) -> None:
+        self._local.task = task
+        try:
+            task._func(*task._args)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            print(f"Task {task.key} failed:")
+            traceback.print_exc()
+        finally:
+            self._local.task = None
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self._finish(task)
+
+    def _finish(self, task: Task) -> None:
+        # A cancelled task may already have been replaced under its key
+        if self._in_flight.get(task.key) is task:
+            del self._in_flight[task.key]
+        task._done.set()
+
+    def _cancel(self, task: Task) -> None:
+        if not task.cancelled:
+            task.cancel()
+            self.cancelled_tasks += 1
+        if self._in_flight.get(task.key) is task:
+            del self._in_flight[task.key]
+
+    ###
+    # PUBLIC METHODS
+    ###
+
+    def submit(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        *args: Any,
+        group: Optional[str] = None,
+        coalesce_running: bool = True,
+    ) -> Task:
+        """Queue `func(*args)`, or return the task already queued (or running,
+        unless `coalesce_running` is False) for `key`."""
+        with self._lock:
+            task = self._in_flight.get(key)
+            if task is not None:
+                if coalesce_running or not task.started():
+                    self.coalesced += 1
+                    return task
+                # Ask the running task to stop, the new one takes its key
+                self._cancel(task)
+
+            if group is not None:
+                for other in list(self._in_flight.values()):
+                    if other.group == group:
+                        self._cancel(other)
+
+            task = Task(key, group, func, args)
+            self._in_flight[key] = task
+            self.submitted += 1
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            self._start_workers()
+        self._queue.put(task)
+        return task
+
+    def cancel_group(self, group: str) -> None:
+        """Cancel the queued and running tasks of a group."""
+        with self._lock:
+            for task in list(self._in_flight.values()):
+                if task.group == group:
+                    self._cancel(task)
+
+    def cancelled(self) -> bool:
+        """Whether the task running on the calling thread has been cancelled."""
+        task: Optional[Task] = getattr(self._local, "task", None)
+        return task is not None and task.cancelled
+
+    def stats(self) -> dict[str, int]:
+        """Return the queue depth and the task counters."""
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "running": self.running,
+                "peak_queued": self.peak_queued,
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "cancelled": self.cancelled_tasks,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self) -> None:
+        """Cancel the pending tasks and let the workers exit once idle."""
+        with self._lock:
+            for task in list(self._in_flight.values()):
+                self._cancel(task)
+            threads, self._threads = self._threads, []
+        for _thread in threads:
+            self._queue.put(None)
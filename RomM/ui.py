@@ -2,9 +2,11 @@ import ctypes
 import os
 import shutil
 import time
+from collections import OrderedDict
 from typing import Optional
 
 import sdl2
+from assets import AssetCache
 from config import (
     color_btn_a,
     color_btn_b,
@@ -13,6 +15,7 @@ from filesystem import Filesystem
 from glyps import glyphs
 from models import Collection, Platform, Rom
 from PIL import Image, ImageDraw, ImageFont, _typing
+from profiler import timed
 from status import Status
 
 FONT_FILE = {
@@ -33,6 +36,7 @@ class UserInterface:
 
     fs = Filesystem()
     status = Status()
+    assets = AssetCache()
 
     screen_width = 640
     screen_height = 480
@@ -41,12 +45,29 @@ class UserInterface:
 
     active_image: Image.Image
     active_draw: ImageDraw.ImageDraw
+    # Scroll step of the long rows in the frame on screen, None if there are none
+    _marquee_drawn_step: Optional[int] = None
+
+    # Number of pre-rendered list rows, text masks and ROM labels kept around
+    _row_cache_size = 48
+    _text_cache_size = 256
+    _rom_label_cache_size = 256
 
     def __init__(self):
         if self._initialized:
             return
-        self.window = self._create_window()
-        self.renderer = self._create_renderer()
+        # Without a screen, frames are only drawn into the frame image
+        self.headless = os.getenv("HEADLESS", "0") == "1"
+        self.window = None if self.headless else self._create_window()
+        self.renderer = None if self.headless else self._create_renderer()
+        self.texture = None if self.headless else self._create_texture()
+        self._create_frame()
+        self._row_cache: OrderedDict[
+            tuple, tuple[Optional[Image.Image], tuple[Image.Image, Image.Image]]
+        ] = OrderedDict()
+        self._text_cache: OrderedDict[tuple, tuple[Optional[Image.Image], tuple[int, int]]] = OrderedDict()
+        # ROM list labels, keyed by ROM id and the fields they are built from
+        self._rom_labels: OrderedDict[tuple, str] = OrderedDict()
         self.draw_start()
         self.opt_stretch = True
         self._initialized = True
@@ -64,12 +85,49 @@ class UserInterface:
         """Create a new blank RGBA image for drawing."""
         return Image.new("RGBA", (self.screen_width, self.screen_height), color="black")
 
+    @timed("draw_start")
     def draw_start(self):
         """Initialize drawing for a new frame."""
         # Render directly to the screen
-        sdl2.SDL_SetRenderDrawColor(self.renderer, 0, 0, 0, 255)
-        sdl2.SDL_RenderClear(self.renderer)
-        self.active_image = self.create_image()
+        if not self.headless:
+            sdl2.SDL_SetRenderDrawColor(self.renderer, 0, 0, 0, 255)
+            sdl2.SDL_RenderClear(self.renderer)
+        self._marquee_drawn_step = None
+        # Reuse the frame image, clearing it to black
+        self.active_image.paste(
+            (0, 0, 0, 255), (0, 0, self.screen_width, self.screen_height)
+        )
+
+    def _marquee_step(self) -> int:
+        """Return the scroll step of long rows, which advances twice a second."""
+        step = int(time.time() * 2)
+        self._marquee_drawn_step = step
+        return step
+
+    def marquee_moved(self) -> bool:
+        """Whether scrolling text on screen has advanced since it was drawn."""
+        step = self._marquee_drawn_step
+        return step is not None and step != int(time.time() * 2)
+
+    def _create_frame(self):
+        """Create the frame image drawn by every draw function.
+
+        Its pixels live in a ctypes buffer that is uploaded to the texture
+        as is, without an intermediate `tobytes` copy.
+        """
+        self._frame_buffer = (ctypes.c_ubyte * (self.screen_width * self.screen_height * 4))()
+        self.active_image = Image.frombuffer(
+            "RGBA",
+            (self.screen_width, self.screen_height),
+            self._frame_buffer,
+            "raw",
+            "RGBA",
+            0,
+            1,
+        )
+        # Images backed by a buffer are read-only, drawing would copy the
+        # pixels away from the buffer instead of writing to it
+        self.active_image.readonly = 0
         self.active_draw = ImageDraw.Draw(self.active_image)
 
     def _create_window(self):
@@ -100,19 +158,31 @@ class UserInterface:
         sdl2.SDL_SetHint(sdl2.SDL_HINT_RENDER_SCALE_QUALITY, b"0")
         return renderer
 
-    def render_to_screen(self):
-        # Convert PIL image to SDL2 texture at base resolution
-        rgba_data = self.active_image.tobytes()
-        surface = sdl2.SDL_CreateRGBSurfaceWithFormatFrom(
-            rgba_data,
+    def _create_texture(self):
+        texture = sdl2.SDL_CreateTexture(
+            self.renderer,
+            sdl2.SDL_PIXELFORMAT_RGBA32,
+            sdl2.SDL_TEXTUREACCESS_STREAMING,
             self.screen_width,
             self.screen_height,
-            32,
-            self.screen_width * 4,
-            sdl2.SDL_PIXELFORMAT_RGBA32,
         )
-        texture = sdl2.SDL_CreateTextureFromSurface(self.renderer, surface)
-        sdl2.SDL_FreeSurface(surface)
+
+        if not texture:
+            print(f"Failed to create texture: {sdl2.SDL_GetError()}")
+            raise RuntimeError("Failed to create texture")
+
+        return texture
+
+    @timed("render_to_screen")
+    def render_to_screen(self):
+        if self.headless:
+            # The frame stays in `active_image`
+            return
+
+        # Upload the frame buffer to the texture at base resolution
+        sdl2.SDL_UpdateTexture(
+            self.texture, None, self._frame_buffer, self.screen_width * 4
+        )
 
         # Get current window size
         window_width = ctypes.c_int()
@@ -135,13 +205,14 @@ class UserInterface:
         else:
             dst_rect = sdl2.SDL_Rect(0, 0, window_width, window_height)
 
-        sdl2.SDL_RenderCopy(self.renderer, texture, None, dst_rect)
+        sdl2.SDL_RenderCopy(self.renderer, self.texture, None, dst_rect)
         sdl2.SDL_RenderPresent(self.renderer)
-        sdl2.SDL_DestroyTexture(texture)
 
     def cleanup(self):
-        sdl2.SDL_DestroyRenderer(self.renderer)
-        sdl2.SDL_DestroyWindow(self.window)
+        if not self.headless:
+            sdl2.SDL_DestroyTexture(self.texture)
+            sdl2.SDL_DestroyRenderer(self.renderer)
+            sdl2.SDL_DestroyWindow(self.window)
         sdl2.SDL_Quit()
 
     ###
@@ -161,9 +232,48 @@ class UserInterface:
         color: str = color_text,
         **kwargs,
     ):
-        self.active_draw.text(
-            position, text, font=self.font_file[size], fill=color, **kwargs
-        )
+        position_0, position_1 = position
+        if (
+            "\n" in text
+            or kwargs.keys() - {"anchor"}
+            or position_0 != int(position_0)
+            or position_1 != int(position_1)
+        ):
+            self.active_draw.text(
+                position, text, font=self.font_file[size], fill=color, **kwargs
+            )
+            return
+
+        # Single lines are rasterized once and then pasted with the text color
+        mask, offset = self._get_text_mask(text, size, kwargs.get("anchor"))
+        if mask:
+            self.active_image.paste(
+                color, (int(position_0) + offset[0], int(position_1) + offset[1]), mask
+            )
+
+    def _get_text_mask(
+        self, text: str, size: str, anchor: Optional[str]
+    ) -> tuple[Optional[Image.Image], tuple[int, int]]:
+        """Return the coverage mask of a line of text and its offset from the anchor."""
+        key = (text, size, anchor)
+        entry = self._text_cache.get(key)
+        if entry:
+            self._text_cache.move_to_end(key)
+            return entry
+
+        font = self.font_file[size]
+        left, top, right, bottom = font.getbbox(text, anchor=anchor)
+        mask = None
+        if right > left and bottom > top:
+            mask = Image.new("L", (int(right - left), int(bottom - top)))
+            ImageDraw.Draw(mask).text(
+                (-left, -top), text, font=font, fill=255, anchor=anchor
+            )
+        entry = (mask, (int(left), int(top)))
+        self._text_cache[key] = entry
+        if len(self._text_cache) > self._text_cache_size:
+            self._text_cache.popitem(last=False)
+        return entry
 
     def draw_rectangle(
         self,
@@ -183,6 +293,7 @@ class UserInterface:
     ):
         self.active_draw.rounded_rectangle(position, radius, fill=fill, outline=outline)
 
+    @timed("row_list")
     def row_list(
         self,
         text: str,
@@ -198,40 +309,69 @@ class UserInterface:
     ):
         if fill is None:
             fill = color_btn_a if self.layout_name == "nintendo" else color_btn_b
-        try:
-            icon = Image.open(append_icon_path) if append_icon_path else None
-        except (FileNotFoundError, AttributeError):
-            icon = None
-
-        radius = 5
-        margin_left_text = 12 + (35 if icon else 0)
-        margin_top_text = 8
+        icon = self.assets.get(append_icon_path) if append_icon_path else None
 
         position_0: float = position[0]  # type: ignore
         position_1: float = position[1]  # type: ignore
 
-        self.draw_rectangle_r(
-            [position_0, position_1, position_0 + width, position_1 + height],
-            radius,
-            fill=fill if selected else color_row_bg,
-            outline=outline,
+        # Rows are rendered once and pasted as a bitmap while they don't change
+        key = (
+            text,
+            width,
+            height,
+            fill if selected else color_row_bg,
+            size,
+            color,
+            outline,
+            append_icon_path,
         )
+        entry = self._row_cache.get(key)
+        if entry and entry[0] is icon:
+            self._row_cache.move_to_end(key)
+        else:
+            entry = (icon, self._render_row(text, width, height, key[3], size, color, outline, icon))
+            self._row_cache[key] = entry
+            if len(self._row_cache) > self._row_cache_size:
+                self._row_cache.popitem(last=False)
+
+        row, shape = entry[1]
+        self.active_image.paste(row, (int(position_0), int(position_1)), mask=shape)
+
+    def _render_row(
+        self,
+        text: str,
+        width: int,
+        height: int,
+        fill: str,
+        size: str,
+        color: str,
+        outline: str | None,
+        icon: Optional[Image.Image],
+    ) -> tuple[Image.Image, Image.Image]:
+        """Render a list row, returning it with the mask of its rounded shape."""
+        radius = 5
+        margin_left_text = 12 + (35 if icon else 0)
+        margin_top_text = 8
+
+        # The rectangle includes its end coordinates
+        row = Image.new("RGBA", (width + 1, height + 1), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(row)
+        draw.rounded_rectangle([0, 0, width, height], radius, fill=fill, outline=outline)
+        # Taken before the icon is pasted, its alpha belongs to the row pixels
+        shape = row.getchannel("A")
 
         if icon:
             margin_left_icon = 10
             margin_top_icon = 5
-            self.active_image.paste(
-                icon,
-                (int(position_0 + margin_left_icon), int(position_1 + margin_top_icon)),
-                mask=icon if icon.mode == "RGBA" else None,
-            )
+            row.paste(icon, (margin_left_icon, margin_top_icon), mask=icon)
 
-        self.draw_text(
-            (position_0 + margin_left_text, position_1 + margin_top_text),
+        draw.text(
+            (margin_left_text, margin_top_text),
             text,
-            color=color,
-            size=size,
+            font=self.font_file[size],
+            fill=color,
         )
+        return row, shape
 
     def draw_circle(
         self,
@@ -363,14 +503,14 @@ class UserInterface:
             outline=None,
         )
 
+    @timed("draw_header")
     def draw_header(self, host: str, username: str):
         username = username if len(username) <= 22 else username[:19] + "..."
-        logo = Image.open(os.path.join(os.getcwd(), "resources/romm.png"))
+        logo = self.assets.get(os.path.join(os.getcwd(), "resources/romm.png"))
         pos_logo = [15, 15]
         pos_text = [55, 9]
-        self.active_image.paste(
-            logo, (pos_logo[0], pos_logo[1]), mask=logo if logo.mode == "RGBA" else None
-        )
+        if logo:
+            self.active_image.paste(logo, (pos_logo[0], pos_logo[1]), mask=logo)
 
         roms_path = self.fs.get_roms_storage_path()
         total, used, _free = shutil.disk_usage(roms_path)
@@ -388,8 +528,12 @@ class UserInterface:
             f"{glyphs.microsd} {roms_path} ({used_gb:.1f}/{total_gb:.1f} GB, {used_percentage:.1f}% used)",
         )
 
-        if self.status.profile_pic_path:
-            profile_pic = Image.open(self.status.profile_pic_path)
+        profile_pic = (
+            self.assets.get(self.status.profile_pic_path)
+            if self.status.profile_pic_path
+            else None
+        )
+        if profile_pic:
             margin_right_profile_pic = 45
             margin_top_profile_pic = 5
             pos_profile_pic = [
@@ -398,11 +542,10 @@ class UserInterface:
             ]
 
             self.active_image.paste(
-                profile_pic,
-                (pos_profile_pic[0], pos_profile_pic[1]),
-                mask=profile_pic if profile_pic.mode == "RGBA" else None,
+                profile_pic, (pos_profile_pic[0], pos_profile_pic[1]), mask=profile_pic
             )
 
+    @timed("draw_platforms_list")
     def draw_platforms_list(
         self,
         platforms_selected_position: int,
@@ -448,6 +591,7 @@ class UserInterface:
                 append_icon_path=f"{self.fs.resources_path}/{p.slug}.ico",
             )
 
+    @timed("draw_collections_list")
     def draw_collections_list(
         self,
         collections_selected_position: int,
@@ -486,7 +630,11 @@ class UserInterface:
                 row_text = row_text + " "  # Add empty space for the rotation
 
             # Calculate shift offset based on time
-            shift_offset = (int(time.time() * 2)) % len(row_text)
+            shift_offset = (
+                self._marquee_step() % len(row_text)
+                if len(row_text) > max_len_text
+                else 0
+            )
             # Shift text
             row_text = (
                 row_text[shift_offset:] + row_text[:shift_offset]
@@ -508,6 +656,34 @@ class UserInterface:
                 fill=fill,
             )
 
+    def _get_rom_label(self, rom: Rom) -> str:
+        """Return the ROM name with its languages, regions, revision and tags."""
+        # Catalog lists build new Rom objects as they page, so the key holds
+        # the fields rather than the object
+        key = (
+            rom.id,
+            rom.name,
+            *(
+                tuple(values or ())
+                for values in (rom.languages, rom.regions, rom.revision, rom.tags)
+            ),
+        )
+        label = self._rom_labels.get(key)
+        if label is not None:
+            self._rom_labels.move_to_end(key)
+            return label
+
+        label = rom.name
+        label += f" ({','.join(rom.languages)})" if rom.languages else ""
+        label += f" ({','.join(rom.regions)})" if rom.regions else ""
+        label += f" ({','.join(rom.revision)})" if rom.revision else ""
+        label += f" ({','.join(rom.tags)})" if rom.tags else ""
+        self._rom_labels[key] = label
+        if len(self._rom_labels) > self._rom_label_cache_size:
+            self._rom_labels.popitem(last=False)
+        return label
+
+    @timed("draw_roms_list")
     def draw_roms_list(
         self,
         roms_selected_position: int,
@@ -542,24 +718,22 @@ class UserInterface:
             - padding
         )
 
+        multi_selected_ids = {rom.id for rom in multi_selected_roms}
         start_idx = int(roms_selected_position / max_n_roms) * max_n_roms
         end_idx = min(start_idx + max_n_roms, len(roms))
         for i, r in enumerate(roms[start_idx:end_idx]):
             is_selected = i == (roms_selected_position % max_n_roms)
+            is_multi_selected = r.id in multi_selected_ids
             is_in_device = self.fs.is_rom_in_device(r)
             sync_flag_text = f"{glyphs.cloud_sync}" if is_in_device else ""
 
             # Build base row text
-            row_text = r.name
-            row_text += f" ({','.join(r.languages)})" if r.languages else ""
-            row_text += f" ({','.join(r.regions)})" if r.regions else ""
-            row_text += f" ({','.join(r.revision)})" if r.revision else ""
-            row_text += f" ({','.join(r.tags)})" if r.tags else ""
+            row_text = self._get_rom_label(r)
 
             # Handle text scrolling
             if len(row_text) > max_len_text:
                 row_text = row_text + " "
-                shift_offset = (int(time.time() * 2)) % len(row_text)
+                shift_offset = self._marquee_step() % len(row_text)
                 row_text = row_text[shift_offset:] + row_text[:shift_offset]
 
             # Truncate base text and append file size with padding
@@ -569,7 +743,7 @@ class UserInterface:
             row_text = f"{row_text} {size_text}"
 
             # Add checkbox
-            row_text = f"{glyphs.checkbox_selected if r in multi_selected_roms else glyphs.checkbox} {row_text}"
+            row_text = f"{glyphs.checkbox_selected if is_multi_selected else glyphs.checkbox} {row_text}"
 
             self.row_list(
                 row_text,
@@ -578,7 +752,7 @@ class UserInterface:
                 32,
                 is_selected,
                 fill=header_color,
-                outline=header_color if r in multi_selected_roms else None,
+                outline=header_color if is_multi_selected else None,
                 append_icon_path=(
                     f"{self.fs.resources_path}/{r.platform_slug}.ico"
                     if prepend_platform_slug
@@ -586,6 +760,28 @@ class UserInterface:
                 ),
             )
 
+    def draw_frame_times(self, lines: list[str]):
+        """Draw the frame time overlay in the top right corner."""
+        width = 350
+        line_height = 14
+        margin = 5
+        self.draw_rectangle(
+            [
+                self.screen_width - width - margin,
+                margin,
+                self.screen_width - margin,
+                margin * 3 + line_height * len(lines),
+            ],
+            fill=color_menu_bg,
+            outline=color_row_bg,
+        )
+        for i, line in enumerate(lines):
+            self.draw_text(
+                (self.screen_width - width, margin * 2 + i * line_height),
+                line,
+                size="sm",
+            )
+
     def draw_menu_background(
         self,
         pos: _typing.Coords,
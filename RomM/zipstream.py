@@ -0,0 +1,270 @@
+import struct
+import zlib
+from typing import Iterator, Optional
+from zipfile import BadZipFile
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+# Records that follow the last member; nothing left to extract once reached
+_END_SIGNATURES = (
+    b"PK\x01\x02",
+    b"PK\x05\x05",
+    b"PK\x05\x06",
+    b"PK\x06\x06",
+    b"PK\x06\x08",
+)
+
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DATA_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+
+_STORED = 0
+_DEFLATED = 8
+
+_ZIP64_EXTRA_ID = 0x0001
+_ZIP64_LIMIT = 0xFFFFFFFF
+
+_READ_SIZE = 64 * 1024
+
+
+class UnsupportedArchive(Exception):
+    """The archive can't be extracted without its central directory."""
+
+
+class _Source:
+    """Reads exactly sized blocks from a stream, with room to push data back."""
+
+    def __init__(self, stream) -> None:
+        self._stream = stream
+        self._pending = b""
+        self.bytes_read = 0
+
+    def read(self, size: int) -> bytes:
+        """Read up to `size` bytes, returning less only at the end of the stream."""
+        data = self._pending[:size]
+        self._pending = self._pending[size:]
+        while len(data) < size:
+            chunk = self._stream.read(size - len(data))
+            if not chunk:
+                break
+            self.bytes_read += len(chunk)
+            data += chunk
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) != size:
+            raise BadZipFile("Unexpected end of archive")
+        return data
+
+    def readinto(self, buffer) -> int:
+        if self._pending:
+            n = min(len(buffer), len(self._pending))
+            buffer[:n] = self._pending[:n]
+            self._pending = self._pending[n:]
+            return n
+        n = self._stream.readinto(buffer)
+        self.bytes_read += n
+        return n
+
+    def read_some(self, size: int) -> bytes:
+        """Read at most `size` bytes without waiting for more than one chunk."""
+        if self._pending:
+            data = self._pending[:size]
+            self._pending = self._pending[size:]
+            return data
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def unread(self, data: bytes) -> None:
+        self._pending = data + self._pending
+
+
+class ZipStreamMember:
+    """A member of a streamed archive, readable once through `readinto`."""
+
+    def __init__(
+        self,
+        source: _Source,
+        filename: str,
+        flags: int,
+        method: int,
+        crc: int,
+        compress_size: int,
+        zip64: bool,
+    ) -> None:
+        self._source = source
+        self.filename = filename
+        self._flags = flags
+        self._method = method
+        self._crc = crc
+        self._zip64 = zip64
+        self._remaining = compress_size
+        self._running_crc = 0
+        self._decompressor = zlib.decompressobj(-15) if method == _DEFLATED else None
+        self._finished = False
+
+    @property
+    def is_dir(self) -> bool:
+        return self.filename.endswith("/")
+
+    def readinto(self, buffer) -> int:
+        """Decompress member data into `buffer`, returning 0 once the member ends."""
+        if self._finished:
+            return 0
+        if self._decompressor is None:
+            n = self._source.readinto(buffer[: min(len(buffer), self._remaining)])
+            if not n and self._remaining:
+                raise BadZipFile(f"Unexpected end of archive in {self.filename}")
+            self._remaining -= n
+        else:
+            n = self._inflate_into(buffer)
+
+        if n:
+            self._running_crc = zlib.crc32(buffer[:n], self._running_crc)
+            return n
+        self._finish()
+        return 0
+
+    def skip(self) -> None:
+        """Consume the rest of the member data."""
+        buffer = memoryview(bytearray(_READ_SIZE))
+        while self.readinto(buffer):
+            pass
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _inflate_into(self, buffer) -> int:
+        decompressor = self._decompressor
+        while not decompressor.eof:
+            data = decompressor.unconsumed_tail
+            if not data:
+                # With a data descriptor the compressed size is unknown, so read
+                # until the deflate stream ends and push back what's left
+                size = _READ_SIZE
+                if not self._flags & _FLAG_DATA_DESCRIPTOR:
+                    size = min(size, self._remaining)
+                data = self._source.read_some(size) if size else b""
+                if not data:
+                    raise BadZipFile(f"Unexpected end of archive in {self.filename}")
+                if not self._flags & _FLAG_DATA_DESCRIPTOR:
+                    self._remaining -= len(data)
+            try:
+                output = decompressor.decompress(data, len(buffer))
+            except zlib.error as e:
+                raise BadZipFile(f"Corrupt data in {self.filename}: {e}") from e
+            if output:
+                buffer[: len(output)] = output
+                return len(output)
+        # Called once per member, `_finish` stops any further reads
+        self._source.unread(decompressor.unused_data)
+        return 0
+
+    def _finish(self) -> None:
+        self._finished = True
+        crc = self._crc
+        if self._flags & _FLAG_DATA_DESCRIPTOR:
+            crc = self._read_data_descriptor()
+        if crc != self._running_crc:
+            raise BadZipFile(f"Bad CRC-32 for file {self.filename}")
+
+    def _read_data_descriptor(self) -> int:
+        signature = self._source.read_exact(4)
+        if signature != _DATA_DESCRIPTOR_SIGNATURE:
+            # The signature is optional, this was already the CRC
+            self._source.unread(signature)
+        crc, = struct.unpack("<I", self._source.read_exact(4))
+        self._source.read_exact(16 if self._zip64 else 8)
+        return crc
+
+
+class ZipStreamReader:
+    """Iterates over the members of a ZIP archive read front to back.
+
+    Members are decoded from their local file headers, so extraction can start
+    before the whole archive has been received. Only stored and deflated,
+    unencrypted members are supported; `UnsupportedArchive` is raised for
+    anything that needs the central directory at the end of the archive.
+    """
+
+    def __init__(self, stream) -> None:
+        self._source = _Source(stream)
+        self._current: Optional[ZipStreamMember] = None
+
+    @property
+    def bytes_read(self) -> int:
+        """Number of archive bytes consumed from the stream."""
+        return self._source.bytes_read
+
+    def __iter__(self) -> Iterator[ZipStreamMember]:
+        while True:
+            if self._current is not None:
+                self._current.skip()
+                self._current = None
+
+            signature = self._source.read(4)
+            if not signature or signature in _END_SIGNATURES:
+                return
+            if signature != _LOCAL_HEADER_SIGNATURE:
+                raise UnsupportedArchive("Unexpected record in archive")
+
+            self._current = self._read_member(signature)
+            yield self._current
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _read_member(self, signature: bytes) -> ZipStreamMember:
+        header = signature + self._source.read_exact(_LOCAL_HEADER.size - 4)
+        (
+            _signature,
+            _version,
+            flags,
+            method,
+            _time,
+            _date,
+            crc,
+            compress_size,
+            _file_size,
+            filename_length,
+            extra_length,
+        ) = _LOCAL_HEADER.unpack(header)
+        raw_filename = self._source.read_exact(filename_length)
+        extra = self._source.read_exact(extra_length)
+        filename = raw_filename.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+
+        zip64 = False
+        for field_id, data in self._extra_fields(extra):
+            if field_id == _ZIP64_EXTRA_ID:
+                zip64 = True
+                if compress_size == _ZIP64_LIMIT and len(data) >= 16:
+                    _size, compress_size = struct.unpack("<QQ", data[:16])
+
+        if flags & _FLAG_ENCRYPTED:
+            raise UnsupportedArchive(f"{filename} is encrypted")
+        if method not in (_STORED, _DEFLATED):
+            raise UnsupportedArchive(f"{filename} uses compression method {method}")
+        if (
+            method == _STORED
+            and flags & _FLAG_DATA_DESCRIPTOR
+            and not compress_size
+            and not filename.endswith("/")
+        ):
+            raise UnsupportedArchive(f"Size of stored file {filename} is unknown")
+
+        return ZipStreamMember(
+            self._source, filename, flags, method, crc, compress_size, zip64
+        )
+
+    @staticmethod
+    def _extra_fields(extra: bytes) -> Iterator[tuple[int, bytes]]:
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, size = struct.unpack_from("<HH", extra, offset)
+            yield field_id, extra[offset + 4 : offset + 4 + size]
+            offset += 4 + size
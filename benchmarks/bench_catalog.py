@@ -0,0 +1,142 @@
+"""Benchmark of the local ROM catalog on a large library.
+
+Stores a synthetic library in the SQLite catalog the way the ROM list fetch
+does, then compares the memory held by the paged `CatalogRoms` list with a
+plain list of the same ROMs and times the queries the views and filters run:
+
+    python benchmarks/bench_catalog.py [--roms 50000] [--platforms 20]
+"""
+
+# trunk-ignore-all(ruff/E402)
+
+import argparse
+import gc
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from harness import cleanup_app, prepare_app
+from mock_server import MockLibrary
+
+work_path = prepare_app()
+
+from api import API
+from catalog import Catalog, list_key
+from status import View
+
+# ROMs per page, as the largest ROM list pages the app requests
+PAGE_SIZE = 1000
+# Every how many ROMs one is flagged as on the device
+LOCAL_EVERY = 7
+
+
+def timed(func: Callable[[], Any], repeat: int = 20) -> float:
+    """Return the median duration of `func` in ms."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def traced_bytes(build: Callable[[], Any]) -> tuple[Any, int]:
+    """Return what `build` returns and the memory it still holds."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--roms", type=int, default=50000)
+    parser.add_argument("--platforms", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    library = MockLibrary(args.roms, args.platforms, rom_size=1024)
+    regions = ["USA", "Europe", "Japan", "World"]
+    languages = ["En", "Fr", "De", "Ja", "Es"]
+    rng = random.Random(args.seed)
+    for rom in library.roms:
+        rom["regions"] = rng.sample(regions, rng.randint(1, 2))
+        rom["languages"] = rng.sample(languages, rng.randint(1, 3))
+
+    api = API()
+    catalog = Catalog()
+    try:
+        # Every ROM in one list, as a collection holding the whole library
+        started = time.perf_counter()
+        list_id = catalog.new_list(list_key(View.COLLECTIONS, 1))
+        for offset in range(0, len(library.roms), PAGE_SIZE):
+            page = library.roms[offset : offset + PAGE_SIZE]
+            catalog.append_roms(list_id, (api._build_rom(rom) for rom in page))
+        store_seconds = time.perf_counter() - started
+
+        plain, plain_bytes = traced_bytes(
+            lambda: [api._build_rom(rom) for rom in library.roms]
+        )
+        del plain
+
+        def page_through() -> Any:
+            roms = catalog.list_roms(list_id)
+            for start in range(0, len(roms), 10):
+                roms[start : start + 10]
+            return roms
+
+        paged, paged_bytes = traced_bytes(page_through)
+
+        local = {rom["fs_name"] for rom in library.roms[::LOCAL_EVERY]}
+        started = time.perf_counter()
+        catalog.update_presence(list_id, lambda _slug, fs_name, _multi: fs_name in local)
+        presence_seconds = time.perf_counter() - started
+
+        last_rom = paged[len(paged) - 1]
+        platform_id = library.platforms[-1]["id"]
+        queries = {
+            "list length": lambda: len(catalog.list_roms(list_id)),
+            "list page (middle)": lambda: catalog.list_roms(list_id)[
+                len(paged) // 2 : len(paged) // 2 + 10
+            ],
+            "list page (last)": lambda: catalog.list_roms(list_id)[-10:],
+            "local filter length": lambda: len(
+                catalog.list_roms(list_id).where_present(True)
+            ),
+            "local filter page": lambda: catalog.list_roms(list_id).where_present(True)[
+                100:110
+            ],
+            "selected ROM position": lambda: catalog.list_roms(list_id).index_of(
+                last_rom.id
+            ),
+            "platform, first page": lambda: catalog.find_roms(platform_id=platform_id)[:10],
+            "region count": lambda: len(catalog.find_roms(region="japan")),
+            "region + language page": lambda: catalog.find_roms(
+                region="europe", language="fr"
+            )[:10],
+            "name prefix count": lambda: len(catalog.find_roms(name="synthetic game 01")),
+            "local ROMs, by name": lambda: catalog.find_roms(present=True)[:10],
+        }
+        timings = {name: timed(query) for name, query in queries.items()}
+    finally:
+        cleanup_app(work_path)
+
+    print(f"Library: {len(library.roms)} ROMs on {len(library.platforms)} platforms")
+    print(f"{'store':<28} {store_seconds * 1000:>10.1f} ms")
+    print(f"{'presence update':<28} {presence_seconds * 1000:>10.1f} ms")
+    print(f"{'list of Rom':<28} {plain_bytes / 1024**2:>10.1f} MiB held")
+    print(f"{'catalog list, paged through':<28} {paged_bytes / 1024**2:>10.1f} MiB held")
+    for name, ms in timings.items():
+        print(f"{name:<28} {ms:>10.2f} ms")
+    print(f"Catalog: {catalog.stats()}")
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
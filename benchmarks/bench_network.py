@@ -0,0 +1,246 @@
+"""End-to-end network benchmark of the RomM app against the mock server.
+
+Starts `mock_server` in the background and measures, through the app's own
+`API`, the time to the first platform list, the ROM list fetch time (cold,
+cached, and cached after a few ROMs were edited or removed on the server) and
+the download throughput:
+
+    python benchmarks/bench_network.py [--roms 10000] [--latency-ms 50]
+        [--bandwidth 2000000] [--error-rate 0.01]
+"""
+
+# trunk-ignore-all(ruff/E402)
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, Optional
+from urllib.error import HTTPError, URLError
+
+from harness import cleanup_app, prepare_app
+from mock_server import DEFAULT_FEATURES, MockLibrary, start_server
+
+work_path = prepare_app(USERNAME="bench", PASSWORD="bench")
+
+from api import API
+from status import Status
+
+# Longest wait for a list to show up before a run counts as failed
+TIMEOUT = 120.0
+
+
+class Timings:
+    """Durations of the runs of one measurement, and how many failed."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.seconds: list[float] = []
+        self.failed = 0
+
+    def run(self, func: Callable[[], Optional[float]]) -> None:
+        try:
+            elapsed = func()
+        except (HTTPError, URLError, OSError) as e:
+            print(f"{self.name} failed: {e}")
+            elapsed = None
+        if elapsed is None:
+            self.failed += 1
+        else:
+            self.seconds.append(elapsed)
+
+    def report(self) -> str:
+        runs = f"{len(self.seconds)} runs" + (f", {self.failed} failed" if self.failed else "")
+        if not self.seconds:
+            return f"{self.name:<28} {'-':>10}     ({runs})"
+        median = statistics.median(self.seconds) * 1000
+        worst = max(self.seconds) * 1000
+        return f"{self.name:<28} {median:>10.1f} ms  max {worst:.1f} ms ({runs})"
+
+
+def forget_session(api: API) -> None:
+    """Drop the cached catalog and pooled connections, as on a fresh start."""
+    shutil.rmtree(api.cache.cache_path, ignore_errors=True)
+    os.makedirs(api.cache.cache_path, exist_ok=True)
+    api.http.close()
+
+
+def first_platform_list(api: API, status: Status) -> Optional[float]:
+    """Fetch the catalog the way `RomM.start` does, timing the platform list."""
+    status.platforms_ready.clear()
+    started = time.perf_counter()
+    api.load_cached_catalog()
+    threads = [
+        threading.Thread(target=api.fetch_platforms),
+        threading.Thread(target=api.fetch_collections),
+        threading.Thread(target=api.fetch_me),
+    ]
+    for thread in threads:
+        thread.start()
+    ready = status.platforms_ready.wait(TIMEOUT)
+    elapsed = time.perf_counter() - started
+    for thread in threads:
+        thread.join()
+    return elapsed if ready and status.platforms else None
+
+
+def rom_list(api: API, status: Status, first_page: Timings) -> Optional[float]:
+    """Fetch the ROMs of the first platform, also timing the first page shown."""
+    status.roms = []
+    status.roms_ready.clear()
+    done = threading.Event()
+
+    def watch() -> None:
+        while not done.is_set():
+            if status.roms:
+                first_page.seconds.append(time.perf_counter() - started)
+                return
+            time.sleep(0.001)
+
+    started = time.perf_counter()
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    try:
+        api.fetch_roms()
+    finally:
+        done.set()
+        watcher.join()
+    elapsed = time.perf_counter() - started
+    return elapsed if status.roms_ready.is_set() and status.roms else None
+
+
+def download(api: API, status: Status, n_roms: int) -> tuple[float, int, int]:
+    """Download the first ROMs of the list, returning the time, bytes and ROM count."""
+    queue = status.roms[:n_roms]
+    status.download_queue = list(queue)
+    status.download_rom_ready.clear()
+    status.abort_download.clear()
+    started = time.perf_counter()
+    api.download_rom()
+    elapsed = time.perf_counter() - started
+
+    downloaded = 0
+    total = 0
+    for rom in queue:
+        path = os.path.join(api.file_system.get_platforms_storage_path(rom.platform_slug), rom.fs_name)
+        if os.path.isfile(path):
+            downloaded += 1
+            total += os.path.getsize(path)
+            os.remove(path)
+    return elapsed, total, downloaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--roms", type=int, default=1000)
+    parser.add_argument("--platforms", type=int, default=10)
+    parser.add_argument("--rom-size", type=int, default=8 * 1024 * 1024, help="bytes")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes/s, 0 for no cap")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--downloads", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--edits", type=int, default=5, help="ROMs updated and removed before a resync"
+    )
+    parser.add_argument(
+        "--features",
+        default=",".join(sorted(DEFAULT_FEATURES)),
+        help="optional server features (platform_ids, fields, updated_after, gzip), comma separated",
+    )
+    args = parser.parse_args()
+
+    library = MockLibrary(args.roms, args.platforms, args.rom_size)
+    server = start_server(
+        library,
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        features=frozenset(filter(None, args.features.split(","))),
+    )
+    os.environ["HOST"] = server.url
+
+    status = Status()
+    api = API()
+    # Platforms are only listed when their ROMs folder exists; every other one
+    # is left out so that collections hold ROMs the app has to drop
+    for platform in library.platforms[::2]:
+        os.makedirs(api.file_system.get_platforms_storage_path(platform["slug"]), exist_ok=True)
+
+    platforms_cold = Timings("first platform list (cold)")
+    platforms_warm = Timings("first platform list (cached)")
+    first_page = Timings("ROM list first page (cold)")
+    roms_cold = Timings("ROM list complete (cold)")
+    roms_warm = Timings("ROM list (cached)")
+    roms_edited = Timings("ROM list (cached, edited)")
+    collection_cold = Timings("collection ROM list (cold)")
+    try:
+        for _ in range(args.repeat):
+            forget_session(api)
+            platforms_cold.run(lambda: first_platform_list(api, status))
+            platforms_warm.run(lambda: first_platform_list(api, status))
+            if not status.platforms:
+                continue
+            status.selected_platform = status.platforms[0]
+            roms_cold.run(lambda: rom_list(api, status, first_page))
+            roms_warm.run(lambda: rom_list(api, status, Timings("")))
+            library.touch_roms(args.edits)
+            library.remove_roms(args.edits)
+            roms_edited.run(lambda: rom_list(api, status, Timings("")))
+            if status.collections:
+                status.selected_platform = None
+                status.selected_collection = status.collections[0]
+                collection_cold.run(lambda: rom_list(api, status, Timings("")))
+                status.selected_collection = None
+                status.selected_platform = status.platforms[0]
+
+        throughput = "-"
+        if status.roms:
+            elapsed, total, downloaded = download(api, status, args.downloads)
+            throughput = (
+                f"{total / elapsed / 1024**2:.1f} MiB/s "
+                f"({downloaded}/{args.downloads} ROMs, {total / 1024**2:.1f} MiB in {elapsed:.2f}s)"
+            )
+    finally:
+        api.http.close()
+        server.shutdown()
+        server.server_close()
+        cleanup_app(work_path)
+
+    bandwidth = f"{args.bandwidth / 1024**2:.1f} MiB/s" if args.bandwidth else "unlimited"
+    print(
+        f"Library: {len(library.roms)} ROMs on {len(library.platforms)} platforms, "
+        f"latency {args.latency_ms:g} ms, bandwidth {bandwidth}, "
+        f"error rate {args.error_rate:.1%}, features {args.features or 'none'}"
+    )
+    for timings in (
+        platforms_cold,
+        platforms_warm,
+        first_page,
+        roms_cold,
+        roms_warm,
+        roms_edited,
+        collection_cold,
+    ):
+        print(timings.report())
+    print(f"{'download throughput':<28} {throughput}")
+    print(f"Server: {server.stats()}")
+    print(f"HTTP pool: {api.http.stats()}")
+    print("JSON transfers:")
+    for endpoint, counts in sorted(api.http.transfer_stats().items()):
+        wire, decoded = counts["wire"], counts["decoded"]
+        ratio = f"{wire / decoded:.0%}" if decoded else "-"
+        print(
+            f"  {endpoint:<28} {wire / 1024:>10.1f} KiB on the wire, "
+            f"{decoded / 1024:.1f} KiB decoded ({ratio})"
+        )
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
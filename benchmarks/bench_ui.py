@@ -0,0 +1,269 @@
+"""Rendering benchmark of the RomM app, run without a screen or controller.
+
+Drives `RomM.update` through scripted scenarios over synthetic libraries and
+reports the frame rate and the memory allocated per frame:
+
+    python benchmarks/bench_ui.py [--sizes 100,1000,10000] [--frames 300]
+
+Each library is shown both from a plain list and from the catalog, paged
+through `CatalogRoms` as the app shows fetched ROM lists.
+
+Frames are drawn in headless mode (see HEADLESS in env.template) from a
+temporary working directory, so nothing is written to the app folder.
+Allocations are the ones tracemalloc sees, Python objects rather than the
+pixel buffers Pillow allocates on its own.
+"""
+
+# trunk-ignore-all(ruff/E402)
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from collections.abc import Sequence
+from typing import Callable
+
+from harness import cleanup_app, prepare_app
+
+work_path = prepare_app()
+
+import sdl2
+from catalog import CatalogRoms, list_key
+from models import Platform, Rom
+from romm import RomM
+from status import DownloadProgress, DownloadState, Filter, View
+
+ROMS_PER_PLATFORM = 100
+# Share of the synthetic ROMs present on the storage, seen by the filters
+LOCAL_EVERY = 3
+
+Scenario = Callable[[RomM, int], None]
+
+
+def make_library(n_roms: int) -> tuple[list[Platform], list[Rom]]:
+    n_platforms = max(1, n_roms // ROMS_PER_PLATFORM)
+    platforms = [
+        Platform(
+            id=i,
+            display_name=f"Platform {i} with a rather long display name",
+            slug=f"platform-{i}",
+            rom_count=ROMS_PER_PLATFORM,
+        )
+        for i in range(n_platforms)
+    ]
+    roms = []
+    for i in range(n_roms):
+        platform = platforms[i % n_platforms]
+        name = f"Synthetic Game {i:05d} - The Long Subtitle (USA, Europe) (Rev {i % 3})"
+        roms.append(
+            Rom(
+                id=i,
+                platform_id=platform.id,
+                platform_slug=platform.slug,
+                fs_name=f"{name}.zip",
+                fs_name_no_tags=f"Synthetic Game {i:05d}",
+                fs_name_no_ext=name,
+                fs_extension="zip",
+                fs_size=(i % 700 + 1, "MB"),
+                fs_size_bytes=(i % 700 + 1) * 1024 * 1024,
+                name=name,
+                slug=f"synthetic-game-{i}",
+                summary="",
+                youtube_video_id="",
+                path_cover_small="",
+                path_cover_large="",
+                is_identified=True,
+                revision="",
+                regions=["USA", "Europe"],
+                languages=["En"],
+                tags=[],
+                crc_hash="",
+                md5_hash="",
+                sha1_hash="",
+                has_simple_single_file=True,
+                has_nested_single_file=False,
+                has_multiple_files=False,
+                merged_screenshots=[],
+                genres=[],
+                franchises=[],
+                collections=[],
+                companies=[],
+                game_modes=[],
+                age_ratings=[],
+                first_release_date=None,
+                average_rating=None,
+            )
+        )
+    return platforms, roms
+
+
+def catalog_roms(romm: RomM, roms: list[Rom]) -> CatalogRoms:
+    """Store `roms` as a ROM list of the catalog and return it."""
+    list_id = romm.catalog.new_list(list_key(View.PLATFORMS, len(roms)))
+    romm.catalog.append_roms(list_id, roms)
+    return romm.catalog.list_roms(list_id)
+
+
+def store_local_roms(romm: RomM, roms: list[Rom]) -> None:
+    for rom in roms[::LOCAL_EVERY]:
+        storage_path = romm.fs.get_platforms_storage_path(rom.platform_slug)
+        os.makedirs(storage_path, exist_ok=True)
+        open(os.path.join(storage_path, rom.fs_name), "w").close()
+
+
+def press(romm: RomM, key: str) -> None:
+    """Queue a press and release of `key` as the controller would."""
+    buttons = {name: button for button, name in romm.input._key_mapping.items()}
+    for event_type in (sdl2.SDL_CONTROLLERBUTTONDOWN, sdl2.SDL_CONTROLLERBUTTONUP):
+        event = sdl2.SDL_Event()
+        event.type = event_type
+        event.cbutton.button = buttons[key]
+        event.common.timestamp = sdl2.SDL_GetTicks()
+        romm.input.check_event(event)
+
+
+def reset(romm: RomM, platforms: list[Platform], roms: Sequence[Rom]) -> None:
+    status = romm.status
+    status.show_start_menu = False
+    status.show_contextual_menu = False
+    status.platforms = platforms
+    status.platforms_ready.set()
+    status.roms_ready.set()
+    status.download_rom_ready.set()
+    status.me_ready.set()
+    status.downloads = {}
+    status.multi_selected_roms = []
+    while status.current_filter != Filter.ALL:
+        status.current_filter = next(status.filters)
+    status.selected_platform = platforms[0]
+    status.roms = roms
+    romm.platforms_selected_position = 0
+    romm.roms_selected_position = 0
+
+
+def scroll_platforms(romm: RomM, frame: int) -> None:
+    romm.status.current_view = View.PLATFORMS
+    press(romm, "DY+")
+
+
+def page_roms(romm: RomM, frame: int) -> None:
+    romm.status.current_view = View.ROMS
+    # Page forward through the whole list, then back
+    pages = (len(romm.status.roms) + romm.max_n_roms - 1) // romm.max_n_roms
+    forward = (frame // max(1, pages - 1)) % 2 == 0
+    press(romm, "DX+" if forward else "DX-")
+
+
+def toggle_filters(romm: RomM, frame: int) -> None:
+    romm.status.current_view = View.ROMS
+    press(romm, romm.controller_layout["x"]["key"])
+
+
+def download_overlay(romm: RomM, frame: int) -> None:
+    status = romm.status
+    status.current_view = View.ROMS
+    if not status.downloads:
+        status.download_started_at = time.time()
+        for rom in status.roms[:4]:
+            download = DownloadProgress(rom)
+            download.state = DownloadState.DOWNLOADING
+            status.downloads[rom.id] = download
+        status.download_rom_ready.clear()
+    for download in status.downloads.values():
+        download.downloaded_bytes = min(
+            download.total_bytes, download.downloaded_bytes + 256 * 1024
+        )
+    press(romm, "DY+")
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "scroll_platforms": scroll_platforms,
+    "page_roms": page_roms,
+    "toggle_filters": toggle_filters,
+    "download_overlay": download_overlay,
+}
+
+
+def render_frame(romm: RomM, scenario: Scenario, frame: int) -> None:
+    """Run one iteration of the main loop, always drawing the frame."""
+    scenario(romm, frame)
+    romm.input.process_events()
+    with romm.profiler.measure("frame"):
+        romm.ui.draw_start()
+        romm.update()
+        romm.ui.render_to_screen()
+    romm.profiler.end_frame()
+    romm.input.clear_pressed()
+
+
+def run(romm: RomM, scenario: Scenario, frames: int) -> tuple[float, float, float]:
+    """Return the frames per second, and the average KiB allocated and kept per frame."""
+    # Warm the caches up, a real session draws the same screens over and over
+    for frame in range(10):
+        render_frame(romm, scenario, frame)
+
+    started = time.perf_counter()
+    for frame in range(frames):
+        render_frame(romm, scenario, frame)
+    fps = frames / (time.perf_counter() - started)
+
+    # Tracing slows drawing down, allocations are measured in a second pass
+    allocated = kept = 0
+    tracemalloc.start()
+    for frame in range(frames):
+        before, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        render_frame(romm, scenario, frame)
+        current, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+        kept += current - before
+    tracemalloc.stop()
+    return fps, allocated / frames / 1024, kept / frames / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--sources", default="list,catalog")
+    args = parser.parse_args()
+
+    if sdl2.SDL_Init(sdl2.SDL_INIT_GAMECONTROLLER) < 0:
+        print(f"SDL2 initialization failed: {sdl2.SDL_GetError()}")
+        sys.exit(1)
+
+    romm = RomM()
+    romm.api.host = "http://romm.local"
+    romm.api.username = "bench"
+
+    print(
+        f"{'scenario':<18} {'source':<8} {'roms':>6} {'fps':>8} {'ms/frame':>9} "
+        f"{'alloc KiB/frame':>16} {'kept KiB/frame':>15}"
+    )
+    try:
+        for size in (int(size) for size in args.sizes.split(",")):
+            platforms, roms = make_library(size)
+            store_local_roms(romm, roms)
+            for source in args.sources.split(","):
+                shown = catalog_roms(romm, roms) if source == "catalog" else roms
+                for name in args.scenarios.split(","):
+                    reset(romm, platforms, shown)
+                    fps, allocated, kept = run(romm, SCENARIOS[name], args.frames)
+                    print(
+                        f"{name:<18} {source:<8} {size:>6} {fps:>8.1f} "
+                        f"{1000 / fps:>9.2f} {allocated:>16.1f} {kept:>15.1f}"
+                    )
+    finally:
+        romm.running = False
+        romm.ui.cleanup()
+        cleanup_app(work_path)
+
+    print("Frame times:")
+    for line in romm.profiler.report():
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Runs the app modules from a throwaway working directory.
+
+The app reads its fonts, resources, cache and storage paths relative to the
+working directory when its modules are imported, so `prepare_app` has to run
+before anything from the RomM folder is imported.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+app_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "RomM"))
+
+
+def prepare_app(**env: str) -> str:
+    """Set up a working directory for the app and return its path.
+
+    Frames are drawn headless and ROMs are stored in the working directory;
+    `env` sets any other environment variable the app reads.
+    """
+    work_path = tempfile.mkdtemp(prefix="romm-bench-")
+    os.makedirs(os.path.join(work_path, "resources"))
+    os.makedirs(os.path.join(work_path, "roms"))
+    os.symlink(os.path.join(app_path, "fonts"), os.path.join(work_path, "fonts"))
+    shutil.copy(
+        os.path.join(app_path, "resources", "romm.png"),
+        os.path.join(work_path, "resources", "romm.png"),
+    )
+    os.chdir(work_path)
+    os.environ["HEADLESS"] = "1"
+    os.environ["ROMS_STORAGE_PATH"] = os.path.join(work_path, "roms")
+    os.environ.update(env)
+    sys.path.insert(0, app_path)
+    return work_path
+
+
+def cleanup_app(work_path: str) -> None:
+    shutil.rmtree(work_path, ignore_errors=True)
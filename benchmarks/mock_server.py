@@ -0,0 +1,483 @@
+"""Local stand-in for a RomM server, serving a synthetic library.
+
+Implements the endpoints the app uses: platforms, collections, virtual
+collections, paged ROM lists, ROM content (with Range requests), platform
+icons, avatars and users/me. Latency, bandwidth and error rate can be set to
+reproduce slow or flaky links:
+
+    python benchmarks/mock_server.py --port 8080 --roms 10000 --latency-ms 50
+
+Point HOST in the app's .env at it; any username and password are accepted.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from PIL import Image
+
+# Optional server behaviours: the `platform_ids`, `fields` and `updated_after`
+# ROM query parameters, and gzip compressed JSON responses
+DEFAULT_FEATURES = frozenset(("platform_ids", "fields", "updated_after", "gzip"))
+ROM_QUERY_FEATURES = ("platform_ids", "fields", "updated_after")
+
+_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Slugs the app knows how to map to a ROMs folder
+PLATFORM_SLUGS = [
+    "gb",
+    "gbc",
+    "gba",
+    "nes",
+    "snes",
+    "n64",
+    "nds",
+    "psx",
+    "genesis",
+    "sms",
+    "gamegear",
+    "pce",
+    "ngp",
+    "wonderswan",
+    "atari2600",
+    "arcade",
+]
+
+# Content of every ROM is this block repeated, so any byte range is cheap to serve
+_CONTENT_BLOCK = bytes(range(256)) * 256
+_WRITE_SIZE = len(_CONTENT_BLOCK)
+
+
+class MockLibrary:
+    """A deterministic synthetic library of platforms, collections and ROMs."""
+
+    def __init__(
+        self, n_roms: int = 1000, n_platforms: int = 10, rom_size: int = 1024 * 1024
+    ) -> None:
+        n_platforms = max(1, min(n_platforms, n_roms or 1))
+        self.platforms = [
+            {
+                "id": i + 1,
+                "slug": self._platform_slug(i),
+                "display_name": f"Platform {i + 1}",
+                "rom_count": 0,
+            }
+            for i in range(n_platforms)
+        ]
+        self.roms: list[dict[str, Any]] = []
+        for i in range(n_roms):
+            platform = self.platforms[i % n_platforms]
+            platform["rom_count"] += 1
+            self.roms.append(self._make_rom(i, platform, rom_size))
+        self.roms_by_id = {rom["id"]: rom for rom in self.roms}
+
+        n_collections = max(1, n_platforms // 2)
+        self.collections = [
+            {
+                "id": i + 1,
+                "name": f"Collection {i + 1}",
+                "rom_ids": [rom["id"] for rom in self.roms[i :: n_collections * 3]],
+            }
+            for i in range(n_collections)
+        ]
+        self.virtual_collections = [
+            {
+                "id": f"recent-{i + 1}",
+                "name": f"Virtual collection {i + 1}",
+                "rom_ids": [rom["id"] for rom in self.roms[i :: n_collections * 5]],
+            }
+            for i in range(n_collections)
+        ]
+        for collection in self.collections + self.virtual_collections:
+            collection["rom_count"] = len(collection["rom_ids"])
+
+        self.icon = self._encode_image("ICO", (32, 32), "#3d6b39")
+        self.avatar = self._encode_image("PNG", (64, 64), "#383838")
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+    @staticmethod
+    def _platform_slug(index: int) -> str:
+        slug = PLATFORM_SLUGS[index % len(PLATFORM_SLUGS)]
+        round_ = index // len(PLATFORM_SLUGS)
+        return slug if not round_ else f"{slug}-{round_}"
+
+    @staticmethod
+    def _make_rom(index: int, platform: dict[str, Any], rom_size: int) -> dict[str, Any]:
+        name = f"Synthetic Game {index:05d} (USA)"
+        return {
+            "id": index + 1,
+            "platform_id": platform["id"],
+            "platform_slug": platform["slug"],
+            "fs_name": f"{name}.bin",
+            "fs_name_no_tags": f"Synthetic Game {index:05d}",
+            "fs_name_no_ext": name,
+            "fs_extension": "bin",
+            "fs_size_bytes": rom_size,
+            "name": name,
+            "slug": f"synthetic-game-{index:05d}",
+            "summary": "A game that only exists in benchmarks.",
+            "youtube_video_id": None,
+            "path_cover_small": None,
+            "path_cover_large": None,
+            "is_identified": True,
+            "revision": "",
+            "regions": ["USA"],
+            "languages": ["En"],
+            "tags": [],
+            "crc_hash": None,
+            "md5_hash": None,
+            "sha1_hash": None,
+            "has_simple_single_file": True,
+            "has_nested_single_file": False,
+            "has_multiple_files": False,
+            "merged_screenshots": [],
+            "genres": [],
+            "franchises": [],
+            "collections": [],
+            "companies": [],
+            "game_modes": [],
+            "age_ratings": [],
+            "first_release_date": None,
+            "average_rating": None,
+            "updated_at": (_EPOCH + timedelta(seconds=index)).isoformat(),
+        }
+
+    @staticmethod
+    def _encode_image(fmt: str, size: tuple[int, int], color: str) -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGBA", size, color).save(buffer, format=fmt)
+        return buffer.getvalue()
+
+    def touch_roms(self, count: int) -> None:
+        """Mark the first `count` ROMs as updated now."""
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        for rom in self.roms[:count]:
+            rom["updated_at"] = now
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+    def remove_roms(self, count: int) -> None:
+        """Delete the last `count` ROMs from the library."""
+        removed = {rom["id"] for rom in self.roms[len(self.roms) - count :]}
+        self.roms = [rom for rom in self.roms if rom["id"] not in removed]
+        for rom_id in removed:
+            rom = self.roms_by_id.pop(rom_id)
+            next(p for p in self.platforms if p["id"] == rom["platform_id"])["rom_count"] -= 1
+        for collection in self.collections + self.virtual_collections:
+            collection["rom_ids"] = [id for id in collection["rom_ids"] if id not in removed]
+            collection["rom_count"] = len(collection["rom_ids"])
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+    def query_roms(self, query: dict[str, list[str]]) -> list[dict[str, Any]]:
+        """Return the ROMs matching the list filters of a /api/roms query."""
+        roms = self.roms
+        if "platform_id" in query:
+            platform_id = int(query["platform_id"][0])
+            roms = [rom for rom in roms if rom["platform_id"] == platform_id]
+        if "platform_ids" in query:
+            # Accepted repeated or comma separated
+            platform_ids = {
+                int(id) for value in query["platform_ids"] for id in value.split(",")
+            }
+            roms = [rom for rom in roms if rom["platform_id"] in platform_ids]
+        for key, collections in (
+            ("collection_id", self.collections),
+            ("virtual_collection_id", self.virtual_collections),
+        ):
+            if key in query:
+                wanted = query[key][0]
+                ids = next(
+                    (set(c["rom_ids"]) for c in collections if str(c["id"]) == wanted),
+                    set(),
+                )
+                roms = [rom for rom in roms if rom["id"] in ids]
+        if "updated_after" in query:
+            updated_after = datetime.fromisoformat(query["updated_after"][0])
+            roms = [
+                rom
+                for rom in roms
+                if datetime.fromisoformat(rom["updated_at"]) > updated_after
+            ]
+
+        order_by = query.get("order_by", ["name"])[0]
+        descending = query.get("order_dir", ["asc"])[0] == "desc"
+        return sorted(roms, key=lambda rom: rom.get(order_by) or "", reverse=descending)
+
+
+class MockRomMServer(ThreadingHTTPServer):
+    """Serves a `MockLibrary`, with simulated latency, bandwidth and errors.
+
+    `latency` is added before every response, `bandwidth` caps each response
+    in bytes per second (0 for no cap) and `error_rate` is the share of
+    requests answered with a 500. `features` lists the optional ROM query
+    parameters served (`platform_ids`, `fields`, `updated_after`), which older
+    servers ignore,
+    and whether JSON is gzip compressed for clients accepting it (`gzip`).
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        library: MockLibrary,
+        latency: float = 0.0,
+        bandwidth: int = 0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        features: frozenset[str] = DEFAULT_FEATURES,
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.library = library
+        self.features = features
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # Request counters
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def count_sent(self, n: int) -> None:
+        with self._lock:
+            self.bytes_sent += n
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockRomMServer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.should_fail():
+            self._send_empty(500)
+            return
+
+        parts = urlsplit(self.path)
+        path = unquote(parts.path).rstrip("/")
+        query = parse_qs(parts.query)
+        library = self.server.library
+
+        if path == "/api/platforms":
+            self._send_json(library.platforms)
+        elif path == "/api/collections":
+            self._send_json(library.collections)
+        elif path == "/api/collections/virtual":
+            self._send_json(library.virtual_collections)
+        elif path == "/api/roms":
+            self._send_roms_page(query)
+        elif path.startswith("/api/roms/") and "/content/" in path:
+            self._send_content(path)
+        elif path == "/api/users/me":
+            self._send_json(
+                {"id": 1, "username": "bench", "role": "admin", "avatar_path": "users/1/avatar.png"}
+            )
+        elif path.startswith("/assets/platforms/"):
+            self._send_body(library.icon, "image/x-icon")
+        elif path.startswith("/assets/romm/assets/"):
+            self._send_body(library.avatar, "image/png")
+        else:
+            self._send_empty(404)
+
+    ###
+    # PRIVATE METHODS
+    ###
+
+    def _send_roms_page(self, query: dict[str, list[str]]) -> None:
+        query = {
+            key: value
+            for key, value in query.items()
+            if key not in ROM_QUERY_FEATURES or key in self.server.features
+        }
+        roms = self.server.library.query_roms(query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", [str(len(roms))])[0])
+        items = roms[offset : offset + limit]
+        if "fields" in query:
+            fields = set(query["fields"][0].split(","))
+            items = [{k: v for k, v in rom.items() if k in fields} for rom in items]
+        self._send_json(
+            {
+                "items": items,
+                "total": len(roms),
+                "limit": limit,
+                "offset": offset,
+            }
+        )
+
+    def _send_content(self, path: str) -> None:
+        rom_id = int(path.split("/")[3])
+        rom = self.server.library.roms_by_id.get(rom_id)
+        if not rom:
+            self._send_empty(404)
+            return
+
+        size = rom["fs_size_bytes"]
+        etag = f'"{rom_id}-{size}"'
+        start = 0
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+            start = int(range_header[len("bytes=") :].split("-")[0] or 0)
+            if start >= size:
+                self._send_empty(416, {"Content-Range": f"bytes */{size}"})
+                return
+
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.end_headers()
+
+        offset = start
+        while offset < size:
+            block_offset = offset % _WRITE_SIZE
+            chunk = _CONTENT_BLOCK[block_offset : block_offset + size - offset]
+            self._write(chunk)
+            offset += len(chunk)
+
+    def _send_json(self, payload: Any) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        etag = f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send_empty(304, {"ETag": etag})
+            return
+        headers = {"ETag": etag, "Last-Modified": self.server.library.last_modified}
+        if "gzip" in self.server.features and self._accepts_gzip():
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        self._send_body(body, "application/json", headers)
+
+    def _accepts_gzip(self) -> bool:
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = coding.strip().partition(";")
+            if name.strip().lower() in ("gzip", "x-gzip", "*"):
+                return params.replace(" ", "") != "q=0"
+        return False
+
+    def _send_body(
+        self, body: bytes, content_type: str, headers: Optional[dict[str, str]] = None
+    ) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for offset in range(0, len(body), _WRITE_SIZE):
+            self._write(body[offset : offset + _WRITE_SIZE])
+
+    def _send_empty(self, code: int, headers: Optional[dict[str, str]] = None) -> None:
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _write(self, data: bytes) -> None:
+        """Write part of the body, pacing it to the configured bandwidth."""
+        started = time.monotonic()
+        self.wfile.write(data)
+        self.server.count_sent(len(data))
+        if self.server.bandwidth:
+            pause = len(data) / self.server.bandwidth - (time.monotonic() - started)
+            if pause > 0:
+                time.sleep(pause)
+
+
+def start_server(
+    library: MockLibrary,
+    port: int = 0,
+    latency: float = 0.0,
+    bandwidth: int = 0,
+    error_rate: float = 0.0,
+    seed: Optional[int] = None,
+    features: frozenset[str] = DEFAULT_FEATURES,
+) -> MockRomMServer:
+    """Serve the library from a background thread, on a free port by default."""
+    server = MockRomMServer(
+        ("127.0.0.1", port), library, latency, bandwidth, error_rate, seed, features
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--roms", type=int, default=1000)
+    parser.add_argument("--platforms", type=int, default=10)
+    parser.add_argument("--rom-size", type=int, default=1024 * 1024, help="bytes")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes/s, 0 for no cap")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--features",
+        default=",".join(sorted(DEFAULT_FEATURES)),
+        help="optional features to support (platform_ids, fields, updated_after, gzip), comma separated",
+    )
+    args = parser.parse_args()
+
+    library = MockLibrary(args.roms, args.platforms, args.rom_size)
+    server = MockRomMServer(
+        ("127.0.0.1", args.port),
+        library,
+        args.latency_ms / 1000,
+        args.bandwidth,
+        args.error_rate,
+        args.seed,
+        frozenset(filter(None, args.features.split(","))),
+    )
+    print(f"Serving {len(library.roms)} ROMs on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import shutil
+import tempfile
+
+app_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "RomM"))
+work_path = tempfile.mkdtemp(prefix="romm-tests-")
+
+
+def pytest_sessionstart(session):
+    # The app reads its cache, catalog and storage paths relative to the
+    # working directory when its modules are imported, so the tests run from
+    # a throwaway one set up before any of them is collected
+    os.makedirs(os.path.join(work_path, "resources"))
+    os.makedirs(os.path.join(work_path, "roms"))
+    os.symlink(os.path.join(app_path, "fonts"), os.path.join(work_path, "fonts"))
+    os.chdir(work_path)
+    os.environ["HEADLESS"] = "1"
+    os.environ["ROMS_STORAGE_PATH"] = os.path.join(work_path, "roms")
+
+
+def pytest_sessionfinish(session):
+    shutil.rmtree(work_path, ignore_errors=True)
@@ -0,0 +1,33 @@
+import os
+
+from assets import AssetCache
+from PIL import Image
+
+
+def test_invalidate_picks_up_a_file_written_after_a_miss(tmp_path):
+    cache = AssetCache()
+    path = str(tmp_path / "gb.ico")
+    assert cache.get(path) is None
+
+    Image.new("RGB", (30, 30), "red").save(path, format="ICO")
+    # The miss is trusted for a while, the writer has to invalidate it
+    assert cache.get(path) is None
+    cache.invalidate(path)
+
+    image = cache.get(path)
+    assert image is not None
+    assert image.mode == "RGBA"
+
+
+def test_cached_images_are_reused_until_the_file_changes(tmp_path):
+    cache = AssetCache()
+    path = str(tmp_path / "logo.png")
+    Image.new("RGB", (10, 10), "blue").save(path)
+
+    first = cache.get(path)
+    assert cache.get(path) is first
+
+    Image.new("RGB", (20, 20), "blue").save(path)
+    os.utime(path, ns=(0, 1))
+    cache.invalidate(path)
+    assert cache.get(path).size == (20, 20)
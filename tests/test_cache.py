@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from api import API
+from cache import CatalogCache
+
+PLATFORMS = [{"id": 1, "slug": "gba", "rom_count": 3}]
+ETAG = '"platforms-1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # If-None-Match header of each request
+    validators: list = []
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        Handler.validators.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps(PLATFORMS).encode()
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = CatalogCache()
+    monkeypatch.setattr(cache, "cache_path", str(tmp_path))
+    return cache
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_unchanged_responses_are_revalidated(cache, server_url):
+    api = API()
+    url = f"{server_url}/api/platforms"
+    Handler.validators = []
+
+    assert api._fetch_catalog_json(url, timeout=10) == (PLATFORMS, True)
+    assert api._fetch_catalog_json(url, timeout=10) == (PLATFORMS, False)
+    assert Handler.validators == [None, ETAG]
+    assert cache.conditional_headers(cache.get(api._cache_key(url))) == {
+        "If-None-Match": ETAG
+    }
+
+
+def test_least_recently_used_entries_are_pruned(cache, monkeypatch):
+    monkeypatch.setattr(cache, "max_entries", 2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    os.utime(cache._entry_path("a"), ns=(1, 1))
+    os.utime(cache._entry_path("b"), ns=(2, 2))
+    # Reading an entry makes it the most recently used
+    assert cache.get("a")["data"] == [1]
+
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_entries_are_pruned_to_the_size_cap(cache, monkeypatch):
+    cache.put("small", "x")
+    os.utime(cache._entry_path("small"), ns=(1, 1))
+    monkeypatch.setattr(cache, "max_bytes", 1000)
+
+    cache.put("large", "x" * 900)
+
+    assert cache.get("small") is None
+    # The entry just written is kept even if it is over the cap alone
+    cache.put("larger", "x" * 2000)
+    assert cache.get("larger") is not None
+
+
+def test_item_lists_are_replaced_on_commit_only(cache):
+    with cache.items_writer("roms") as writer:
+        writer.write([{"id": 1}, {"id": 2}])
+        writer.commit(total=2, high_water_mark="m1")
+    with cache.items_writer("roms") as writer:
+        writer.write([{"id": 3}])
+
+    items = cache.get_items("roms")
+    assert list(items) == [{"id": 1}, {"id": 2}]
+    assert items.valid and items.fields["total"] == 2
+    assert items.fields["high_water_mark"] == "m1"
+    assert cache.get_items("other") is None
+    assert not [name for name in os.listdir(cache.cache_path) if name.endswith(".tmp")]
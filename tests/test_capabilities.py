@@ -0,0 +1,47 @@
+from urllib.error import URLError
+
+import pytest
+from api import API
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = API()
+    api._platform_rom_counts = {1: 10}
+    probes = []
+
+    def probe_capabilities() -> set[str]:
+        probes.append(1)
+        if api.host == "unreachable":
+            raise URLError("unreachable")
+        return {"fields"}
+
+    monkeypatch.setattr(api, "_probe_capabilities", probe_capabilities)
+    api.probes = probes
+    return api
+
+
+def test_failed_probe_is_not_repeated_on_every_request(api, monkeypatch):
+    api.host = "unreachable"
+    assert api._server_capabilities() == set()
+    assert api._server_capabilities() == set()
+    assert len(api.probes) == 1
+
+    # Retried once the back-off has passed
+    api.host = "reachable"
+    monkeypatch.setattr(api, "_capabilities_retry_at", 0.0)
+    assert api._server_capabilities() == {"fields"}
+    assert api._server_capabilities() == {"fields"}
+    assert len(api.probes) == 2
+
+
+def test_failed_probe_is_retried_once_the_platforms_are_fetched(api, monkeypatch):
+    api.host = "unreachable"
+    assert api._server_capabilities() == set()
+
+    api.host = "reachable"
+    monkeypatch.setattr(api, "_fetch_catalog_json", lambda url, timeout: ([], True))
+    api.fetch_platforms()
+    api._platform_rom_counts = {1: 10}
+    assert api._server_capabilities() == {"fields"}
+    assert len(api.probes) == 2
@@ -0,0 +1,98 @@
+import gc
+
+import pytest
+from catalog import Catalog, list_key
+from models import Rom
+
+
+def make_rom(id: int, name: str, **fields) -> Rom:
+    values = {field: None for field in Rom._fields}
+    values.update(
+        id=id,
+        platform_id=1,
+        platform_slug="gba",
+        name=name,
+        fs_name=f"{name}.gba",
+        has_multiple_files=False,
+        fs_size=(1, "MB"),
+        regions=[],
+        languages=[],
+    )
+    values.update(fields)
+    return Rom(**values)
+
+
+@pytest.fixture
+def catalog():
+    return Catalog()
+
+
+def test_lists_are_read_back_in_the_order_they_were_added(catalog):
+    list_id = catalog.new_list(list_key("platforms", 901))
+    catalog.append_roms(list_id, [make_rom(9013, "Zelda"), make_rom(9011, "Advance Wars")])
+    catalog.append_roms(list_id, [make_rom(9012, "Metroid")])
+
+    roms = catalog.list_roms(list_id)
+    assert [rom.name for rom in roms] == ["Zelda", "Advance Wars", "Metroid"]
+    assert roms.index_of(9012) == 2
+    assert roms[-1].fs_name == "Metroid.gba"
+
+
+def test_older_generations_are_kept_while_they_are_read(catalog):
+    key = list_key("platforms", 902)
+    first = catalog.new_list(key)
+    catalog.append_roms(first, [make_rom(9021, "Castlevania")])
+    roms = catalog.list_roms(first)
+
+    second = catalog.new_list(key)
+    catalog.append_roms(second, [make_rom(9022, "Golden Sun")])
+    assert [rom.name for rom in roms] == ["Castlevania"]
+
+    # Dropped by the next generation once nothing reads it
+    published = catalog.list_roms(second)
+    del roms
+    gc.collect()
+    catalog.new_list(key)
+    catalog.append_roms(first, [make_rom(9023, "Kirby")])
+    assert len(catalog.list_roms(first)) == 0
+    assert [rom.name for rom in published] == ["Golden Sun"]
+
+
+def test_find_roms_matches_name_prefix_region_and_language(catalog):
+    list_id = catalog.new_list(list_key("platforms", 903))
+    catalog.append_roms(
+        list_id,
+        [
+            make_rom(9031, "Qbert Deluxe", regions=["USA"], languages=["En"]),
+            make_rom(9032, "qbert", regions=["Europe"], languages=["En", "Fr"]),
+            make_rom(9033, "Quake", platform_id=2, regions=["USA"]),
+        ],
+    )
+
+    assert [rom.id for rom in catalog.find_roms(name="QBERT")] == [9032, 9031]
+    assert [rom.id for rom in catalog.find_roms(name="q", region="usa")] == [9031, 9033]
+    assert [rom.id for rom in catalog.find_roms(name="q", language="fr")] == [9032]
+    assert [rom.id for rom in catalog.find_roms(name="q", platform_id=2)] == [9033]
+
+
+def test_presence_flags_filter_a_list(catalog):
+    list_id = catalog.new_list(list_key("platforms", 904))
+    catalog.append_roms(
+        list_id, [make_rom(9041, "Mother 3"), make_rom(9042, "Wario Land")]
+    )
+    roms = catalog.list_roms(list_id)
+    on_device = {"Wario Land.gba"}
+
+    def is_present(platform_slug: str, fs_name: str, multi: bool) -> bool:
+        assert platform_slug == "gba" and not multi
+        return fs_name in on_device
+
+    assert catalog.update_presence(list_id, is_present) == 1
+    assert [rom.id for rom in roms.where_present(True)] == [9042]
+    assert [rom.id for rom in roms.where_present(False)] == [9041]
+    assert catalog.update_presence(list_id, is_present) == 0
+
+    on_device.clear()
+    assert catalog.update_presence(list_id, is_present) == 1
+    assert len(roms.where_present(True)) == 0
+    assert [rom.id for rom in catalog.find_roms(name="Wario", present=False)] == [9042]
@@ -0,0 +1,135 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from api import API, IncompleteDownload
+from models import Rom
+from status import DownloadProgress, DownloadState, Status
+
+CONTENT = bytes(range(256)) * 400
+ETAG = '"v1"'
+# Bytes sent before the connection is dropped, for the truncated responses
+SENT_BEFORE_DROP = 5000
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Number of responses still to cut short
+    truncate = 0
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == ETAG:
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        else:
+            self.send_response(200)
+        body = CONTENT[start:]
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if Handler.truncate:
+            Handler.truncate -= 1
+            self.wfile.write(body[:SENT_BEFORE_DROP])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope="module")
+def api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    api = API()
+    api.host = f"http://127.0.0.1:{server.server_address[1]}"
+    Status().abort_download.clear()
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+def make_rom(fs_name: str) -> Rom:
+    fields = {field: None for field in Rom._fields}
+    fields.update(
+        id=1,
+        platform_slug="gb",
+        fs_name=fs_name,
+        name=fs_name,
+        fs_size_bytes=len(CONTENT),
+        has_multiple_files=False,
+    )
+    return Rom(**fields)
+
+
+def rom_path(api: API, rom: Rom) -> str:
+    return os.path.join(api.file_system.get_platforms_storage_path("gb"), rom.fs_name)
+
+
+def test_short_read_keeps_the_partial_file(api):
+    rom = make_rom("short.gb")
+    Handler.truncate = 1
+
+    with pytest.raises(IncompleteDownload):
+        api._download_single_rom(rom, DownloadProgress(rom))
+
+    assert not os.path.exists(rom_path(api, rom))
+    with open(f"{rom_path(api, rom)}.part", "rb") as f:
+        assert f.read() == CONTENT[:SENT_BEFORE_DROP]
+
+    progress = DownloadProgress(rom)
+    api._download_single_rom(rom, progress)
+
+    assert progress.resumed_bytes == SENT_BEFORE_DROP
+    assert progress.state == DownloadState.DONE
+    with open(rom_path(api, rom), "rb") as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(f"{rom_path(api, rom)}.part")
+
+
+def test_queued_download_resumes_after_a_dropped_connection(api):
+    rom = make_rom("dropped.gb")
+    api.status.downloads = {rom.id: DownloadProgress(rom)}
+    Handler.truncate = 1
+
+    assert api._download_queued_rom(rom) is None
+
+    progress = api.status.downloads[rom.id]
+    assert progress.state == DownloadState.DONE
+    assert progress.resumed_bytes == SENT_BEFORE_DROP
+    with open(rom_path(api, rom), "rb") as f:
+        assert f.read() == CONTENT
+
+
+def test_queued_download_fails_when_the_connection_keeps_dropping(api):
+    rom = make_rom("failing.gb")
+    api.status.downloads = {rom.id: DownloadProgress(rom)}
+    Handler.truncate = 2
+
+    assert api._download_queued_rom(rom) == "error"
+
+    assert api.status.downloads[rom.id].state == DownloadState.FAILED
+    assert not os.path.exists(rom_path(api, rom))
+    assert os.path.exists(f"{rom_path(api, rom)}.part")
+
+
+def test_download_status_is_reset_after_an_unexpected_error(api, monkeypatch):
+    rom = make_rom("unexpected.gb")
+    api.status.download_queue = [rom]
+    api.status.download_rom_ready.clear()
+
+    def fail(_rom):
+        raise RuntimeError("unexpected")
+
+    monkeypatch.setattr(api, "_download_queued_rom", fail)
+    with pytest.raises(RuntimeError):
+        api.download_rom()
+
+    assert api.status.download_rom_ready.is_set()
+    assert api.status.download_queue == []
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+from filesystem import Filesystem
+from models import Rom
+
+
+def make_rom(platform_slug: str, fs_name: str, has_multiple_files: bool = False) -> Rom:
+    fields = {field: None for field in Rom._fields}
+    fields.update(
+        id=1,
+        platform_slug=platform_slug,
+        fs_name=fs_name,
+        has_multiple_files=has_multiple_files,
+    )
+    return Rom(**fields)
+
+
+@pytest.fixture
+def fs(monkeypatch):
+    fs = Filesystem()
+    # Every lookup checks the directory mtime again
+    monkeypatch.setattr(fs, "_listing_revalidate_seconds", 0)
+    return fs
+
+
+def storage_path(fs: Filesystem, platform_slug: str) -> str:
+    path = fs.get_platforms_storage_path(platform_slug)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def touch(path: str) -> None:
+    open(path, "w").close()
+    # Directories written within the same tick keep their mtime
+    st = os.stat(os.path.dirname(path))
+    os.utime(os.path.dirname(path), ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_index_follows_the_directory(fs):
+    path = storage_path(fs, "presence-index")
+    rom = make_rom("presence-index", "Game (USA).gb")
+    assert not fs.is_rom_in_device(rom)
+
+    version = fs.storage_version
+    touch(os.path.join(path, rom.fs_name))
+
+    assert fs.is_rom_in_device(rom)
+    assert fs.storage_version > version
+
+
+def test_multi_file_roms_are_found_by_their_playlist(fs):
+    path = storage_path(fs, "presence-multi")
+    touch(os.path.join(path, "Disc Game.m3u"))
+
+    assert fs.is_rom_file_in_device("presence-multi", "Disc Game", True)
+    assert not fs.is_rom_file_in_device("presence-multi", "Disc Game", False)
+
+
+def test_names_differing_in_case_are_checked_on_disk(fs, monkeypatch):
+    path = storage_path(fs, "presence-case")
+    touch(os.path.join(path, "ZELDA.GB"))
+    rom = make_rom("presence-case", "Zelda.gb")
+
+    # Case-sensitive storage tells the names apart
+    assert not fs.is_rom_in_device(rom)
+
+    # FAT and exFAT cards resolve either name to the same file
+    on_disk = {os.path.join(path, "ZELDA.GB").casefold()}
+    monkeypatch.setattr(os.path, "exists", lambda p: p.casefold() in on_disk)
+    assert fs.is_rom_in_device(rom)
+
+
+def test_downloads_and_removals_are_recorded_without_a_rescan(fs, monkeypatch):
+    storage_path(fs, "presence-mark")
+    rom = make_rom("presence-mark", "Tetris.gb")
+    assert not fs.is_rom_in_device(rom)
+    monkeypatch.setattr(fs, "_listing_revalidate_seconds", 3600)
+
+    version = fs.storage_version
+    fs.mark_rom_presence(rom, True)
+    assert fs.is_rom_in_device(rom)
+    fs.mark_rom_presence(rom, False)
+    assert not fs.is_rom_in_device(rom)
+    assert fs.storage_version == version + 2
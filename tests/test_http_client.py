@@ -0,0 +1,150 @@
+import gzip
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import URLError
+from urllib.request import Request
+
+import pytest
+from http_client import HttpClient
+
+CONTENT = bytes(range(256)) * 4000
+ETAG = '"v1"'
+ROMS = json.dumps({"items": [{"id": i, "name": f"Game {i}"} for i in range(500)]}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path == "/content/rom.bin":
+            self._send_content()
+        elif self.path.startswith("/api/roms"):
+            self._send_roms()
+        else:
+            self.send_error(404)
+
+    def _send(self, status: int, body: bytes, headers: dict[str, str]) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_content(self) -> None:
+        range_header = self.headers.get("Range")
+        # The range only applies while the file still matches the validator
+        if range_header and self.headers.get("If-Range") == ETAG:
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+            self._send(
+                206,
+                CONTENT[start:],
+                {
+                    "ETag": ETAG,
+                    "Content-Range": f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}",
+                },
+            )
+        else:
+            self._send(200, CONTENT, {"ETag": ETAG})
+
+    def _send_roms(self) -> None:
+        encoding = self.headers.get("Accept-Encoding", "")
+        if "gzip" in encoding:
+            self._send(200, gzip.compress(ROMS), {"Content-Encoding": "gzip"})
+        elif "deflate" in encoding:
+            self._send(200, zlib.compress(ROMS), {"Content-Encoding": "deflate"})
+        else:
+            self._send(200, ROMS, {})
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def read_in_chunks(response, size: int = 1000) -> bytes:
+    data = bytearray()
+    while chunk := response.read(size):
+        data += chunk
+    return bytes(data)
+
+
+def test_resumes_download_when_validator_matches(server_url):
+    client = HttpClient()
+    offset = 12345
+    request = Request(
+        f"{server_url}/content/rom.bin",
+        headers={"Range": f"bytes={offset}-", "If-Range": ETAG},
+    )
+
+    response = client.urlopen(request, timeout=10)
+
+    assert response.status == 206
+    assert response.getheader("Content-Range").startswith(f"bytes {offset}-")
+    assert read_in_chunks(response) == CONTENT[offset:]
+
+
+def test_restarts_download_when_file_changed(server_url):
+    client = HttpClient()
+    request = Request(
+        f"{server_url}/content/rom.bin",
+        headers={"Range": "bytes=12345-", "If-Range": '"v0"'},
+    )
+
+    response = client.urlopen(request, timeout=10)
+
+    assert response.status == 200
+    assert read_in_chunks(response) == CONTENT
+
+
+def test_reuses_connection_once_body_is_read(server_url):
+    client = HttpClient()
+    client.urlopen(Request(f"{server_url}/content/rom.bin"), timeout=10).read()
+    hits = client.stats()["hits"]
+
+    response = client.urlopen(Request(f"{server_url}/content/rom.bin"), timeout=10)
+
+    assert response.read() == CONTENT
+    assert client.stats()["hits"] == hits + 1
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+def test_decodes_compressed_responses(server_url, encoding):
+    client = HttpClient()
+    before = client.transfer_stats().get("/api/roms/{id}", {"wire": 0, "decoded": 0})
+    request = Request(f"{server_url}/api/roms/7", headers={"Accept-Encoding": encoding})
+
+    response = client.urlopen(request, timeout=10)
+
+    assert read_in_chunks(response, 100) == ROMS
+    # Counted per endpoint, with the ROM ID folded
+    after = client.transfer_stats()["/api/roms/{id}"]
+    assert after["decoded"] - before["decoded"] == len(ROMS)
+    assert 0 < after["wire"] - before["wire"] < len(ROMS)
+
+
+def test_gives_up_waiting_for_a_connection_after_the_timeout(server_url):
+    client = HttpClient()
+    url = f"{server_url}/content/rom.bin"
+    # Responses left unread hold on to their connection
+    held = [
+        client.urlopen(Request(url), timeout=10)
+        for _ in range(client.max_connections_per_host)
+    ]
+
+    with pytest.raises(URLError, match="No connection"):
+        client.urlopen(Request(url), timeout=0.2)
+
+    for response in held:
+        response.read()
+    assert client.urlopen(Request(url), timeout=10).read() == CONTENT
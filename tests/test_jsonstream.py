@@ -0,0 +1,73 @@
+import io
+import json
+
+import jsonstream
+import pytest
+from jsonstream import JsonItemStream
+
+ITEMS = [
+    {"id": i, "name": "Gämé ✓ " * (i % 4), "tags": [1, {"a": None}], "size": 1.5e3, "ok": True}
+    for i in range(40)
+]
+
+
+class ChunkedStream(io.BytesIO):
+    """Hands out at most `chunk_size` bytes per read, like a network response."""
+
+    def __init__(self, data: bytes, chunk_size: int) -> None:
+        super().__init__(data)
+        self._chunk_size = chunk_size
+
+    def read(self, size: int = -1) -> bytes:
+        return super().read(self._chunk_size if size < 0 else min(size, self._chunk_size))
+
+
+@pytest.fixture(params=[1, 2, 3, 7, 64])
+def chunk_size(request, monkeypatch):
+    # Chunks small enough to split keys, numbers, strings and UTF-8 sequences
+    monkeypatch.setattr(jsonstream, "_READ_SIZE", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("indent", [None, 1])
+def test_decodes_items_and_fields_split_across_chunks(chunk_size, indent):
+    payload = {"total": 123456, "items": ITEMS, "limit": 50, "offset": -12.5e-3}
+    body = f" {json.dumps(payload, indent=indent)}\n".encode()
+    stream = JsonItemStream(ChunkedStream(body, chunk_size))
+
+    assert list(stream) == ITEMS
+    assert stream.fields == {"total": 123456, "limit": 50, "offset": -12.5e-3}
+    assert not stream.is_list
+    assert stream.bytes_read == len(body)
+
+
+def test_decodes_bare_arrays(chunk_size):
+    body = json.dumps(ITEMS).encode()
+    stream = JsonItemStream(ChunkedStream(body, chunk_size))
+
+    assert list(stream) == ITEMS
+    assert stream.is_list
+
+
+@pytest.mark.parametrize(
+    "payload, items, fields",
+    [
+        ({}, [], {}),
+        ([], [], {}),
+        ({"items": []}, [], {}),
+        ({"other": {"items": [1]}, "items": [{"z": 1}]}, [{"z": 1}], {"other": {"items": [1]}}),
+    ],
+)
+def test_decodes_edge_cases(chunk_size, payload, items, fields):
+    stream = JsonItemStream(ChunkedStream(json.dumps(payload).encode(), chunk_size))
+
+    assert list(stream) == items
+    assert stream.fields == fields
+
+
+@pytest.mark.parametrize(
+    "body", [b'{"items":[{"a":1}', b'{"items":[1,,2]}', b"", b'{"total": 1']
+)
+def test_rejects_malformed_payloads(chunk_size, body):
+    with pytest.raises(ValueError):
+        list(JsonItemStream(ChunkedStream(body, chunk_size)))
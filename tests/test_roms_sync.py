@@ -0,0 +1,53 @@
+from api import API
+
+
+def rom(id: int, name: str, **fields) -> dict:
+    return {"id": id, "name": name, **fields}
+
+
+def merge(cached: list[dict], changed: list[dict], ids=None) -> list[tuple[int, str]]:
+    changed_by_id = {item["id"]: item for item in changed}
+    in_place = API._roms_updated_in_place(cached, changed_by_id)
+    return [
+        (item["id"], item["name"])
+        for item in API._merge_roms(cached, changed_by_id, in_place, ids)
+    ]
+
+
+def test_updated_roms_keep_the_servers_order():
+    # Sorted by a collation that ignores punctuation, unlike str.lower()
+    cached = [rom(1, "Ace"), rom(2, "A-Train"), rom(3, "Bomberman")]
+    changed = [rom(2, "A-Train", updated_at="b"), rom(1, "Ace", updated_at="b")]
+
+    assert merge(cached, changed) == [(1, "Ace"), (2, "A-Train"), (3, "Bomberman")]
+
+
+def test_new_and_renamed_roms_are_inserted_by_name():
+    cached = [rom(1, "Ace"), rom(2, "A-Train"), rom(3, "Bomberman"), rom(4, "Zoo")]
+    changed = [rom(5, "Castlevania"), rom(4, "Alleyway")]
+
+    assert merge(cached, changed) == [
+        (1, "Ace"),
+        (2, "A-Train"),
+        (4, "Alleyway"),
+        (3, "Bomberman"),
+        (5, "Castlevania"),
+    ]
+
+
+def test_roms_missing_from_the_ids_are_dropped():
+    cached = [rom(1, "Ace"), rom(2, "Bomberman"), rom(3, "Contra")]
+    changed = [rom(2, "Bomberman"), rom(4, "Donkey Kong")]
+
+    assert merge(cached, changed, ids={1, 2, 4}) == [
+        (1, "Ace"),
+        (2, "Bomberman"),
+        (4, "Donkey Kong"),
+    ]
+
+
+def test_sync_asks_again_for_the_roms_just_before_the_mark():
+    since = API._roms_sync_since("2025-03-01T12:00:30.250000+00:00")
+
+    assert since == "2025-03-01T11:59:30.250000+00:00"
+    assert API._roms_sync_since("not a date") == "not a date"
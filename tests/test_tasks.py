@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+from tasks import TaskScheduler
+
+
+@pytest.fixture
+def scheduler():
+    return TaskScheduler()
+
+
+def block(scheduler: TaskScheduler, release: threading.Event, n: int) -> list:
+    """Occupy `n` workers until `release` is set."""
+    tasks = [
+        scheduler.submit(f"block:{id(release)}:{i}", release.wait, 10) for i in range(n)
+    ]
+    for task in tasks:
+        assert task._started.wait(5)
+    return tasks
+
+
+def test_duplicate_requests_share_one_task(scheduler):
+    release = threading.Event()
+    runs = []
+
+    def fetch() -> None:
+        runs.append(1)
+        release.wait(5)
+
+    first = scheduler.submit("test:coalesce", fetch)
+    assert first._started.wait(5)
+    # Queued or running, the same key returns the same task
+    assert scheduler.submit("test:coalesce", fetch) is first
+    release.set()
+    assert first.wait(5)
+    assert runs == [1]
+
+
+def test_refresh_replaces_the_running_task(scheduler):
+    release = threading.Event()
+    seen_cancelled = []
+
+    def fetch(n: int) -> None:
+        release.wait(5)
+        seen_cancelled.append((n, scheduler.cancelled()))
+
+    first = scheduler.submit("test:refresh", fetch, 1, coalesce_running=False)
+    assert first._started.wait(5)
+    second = scheduler.submit("test:refresh", fetch, 2, coalesce_running=False)
+    assert second is not first and first.cancelled
+    release.set()
+    assert first.wait(5) and second.wait(5)
+    assert sorted(seen_cancelled) == [(1, True), (2, False)]
+
+
+def test_latest_task_of_a_group_supersedes_the_others(scheduler):
+    stopped = threading.Event()
+
+    def fetch_list() -> None:
+        while not scheduler.cancelled():
+            stopped.wait(0.01)
+        stopped.set()
+
+    first = scheduler.submit("test:list:1", fetch_list, group="test-list")
+    assert first._started.wait(5)
+    second = scheduler.submit("test:list:2", lambda: None, group="test-list")
+    assert stopped.wait(5)
+    assert first.cancelled and not second.cancelled
+    assert second.wait(5)
+
+
+def test_cancelled_queued_tasks_never_run(scheduler):
+    release = threading.Event()
+    runs = []
+    blockers = block(scheduler, release, scheduler.workers)
+    try:
+        queued = scheduler.submit("test:queued", runs.append, 1, group="test-queued")
+        assert not queued.started()
+        scheduler.cancel_group("test-queued")
+    finally:
+        release.set()
+    assert queued.wait(5)
+    assert all(task.wait(5) for task in blockers)
+    assert runs == [] and not queued.started()
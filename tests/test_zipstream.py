@@ -0,0 +1,124 @@
+import io
+import struct
+import zipfile
+
+import pytest
+from zipstream import UnsupportedArchive, ZipStreamReader
+
+DATA = bytes(range(256)) * 400
+
+
+class ChunkedStream(io.RawIOBase):
+    """Hands out at most `chunk_size` bytes per read, like a network response."""
+
+    def __init__(self, data: bytes, chunk_size: int = 7) -> None:
+        self._data = io.BytesIO(data)
+        self._chunk_size = chunk_size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._data.read(min(len(buffer), self._chunk_size))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class UnseekableStream(io.RawIOBase):
+    """Write-only target, which makes zipfile use data descriptors."""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.data += data
+        return len(data)
+
+
+def extract(archive: bytes, chunk_size: int = 7) -> dict[str, bytes]:
+    members = {}
+    buffer = memoryview(bytearray(1000))
+    for member in ZipStreamReader(ChunkedStream(archive, chunk_size)):
+        content = bytearray()
+        while n := member.readinto(buffer):
+            content += buffer[:n]
+        members[member.filename] = bytes(content)
+    return members
+
+
+def make_archive(compression: int, **open_kwargs) -> bytes:
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=compression) as archive:
+        for name, content in (("disc1.bin", DATA), ("sub/disc2.bin", DATA[::-1])):
+            with archive.open(name, "w", **open_kwargs) as f:
+                f.write(content)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_extracts_members(compression):
+    members = extract(make_archive(compression))
+    assert members == {"disc1.bin": DATA, "sub/disc2.bin": DATA[::-1]}
+
+
+def test_extracts_deflated_members_with_data_descriptor():
+    output = UnseekableStream()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("disc1.bin", DATA)
+        archive.writestr("empty.bin", b"")
+    assert zipfile.ZipFile(io.BytesIO(bytes(output.data))).infolist()[0].flag_bits & 0x8
+
+    for chunk_size in (1, 7, 64 * 1024):
+        assert extract(bytes(output.data), chunk_size) == {
+            "disc1.bin": DATA,
+            "empty.bin": b"",
+        }
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_extracts_zip64_members(compression):
+    archive = make_archive(compression, force_zip64=True)
+    # The local header of the first member carries the zip64 extra field
+    filename_length, extra_length = struct.unpack("<HH", archive[26:30])
+    assert archive[30 + filename_length : 32 + filename_length] == b"\x01\x00"
+    assert extra_length
+
+    members = extract(archive)
+    assert members == {"disc1.bin": DATA, "sub/disc2.bin": DATA[::-1]}
+
+
+def test_skips_unread_members():
+    reader = ZipStreamReader(ChunkedStream(make_archive(zipfile.ZIP_STORED)))
+    assert [member.filename for member in reader] == ["disc1.bin", "sub/disc2.bin"]
+    assert reader.bytes_read > 2 * len(DATA)
+
+
+def test_rejects_stored_members_of_unknown_size():
+    output = UnseekableStream()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr("disc1.bin", DATA)
+
+    with pytest.raises(UnsupportedArchive):
+        extract(bytes(output.data))
+
+
+def test_detects_corrupted_members():
+    archive = bytearray(make_archive(zipfile.ZIP_STORED))
+    archive[archive.index(DATA[:64]) + 10] ^= 0xFF
+
+    with pytest.raises(zipfile.BadZipFile):
+        extract(bytes(archive))
+
+
+def test_reports_corrupt_deflate_streams_as_bad_archives():
+    archive = bytearray(make_archive(zipfile.ZIP_DEFLATED))
+    # Past the local header of the first member, into its deflate stream
+    filename_length, extra_length = struct.unpack("<HH", archive[26:30])
+    data_start = 30 + filename_length + extra_length
+    archive[data_start : data_start + 8] = b"\xff" * 8
+
+    with pytest.raises(zipfile.BadZipFile):
+        extract(bytes(archive))